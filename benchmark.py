@@ -0,0 +1,177 @@
+"""Offline benchmark of the investigation pipeline against local stub services.
+
+Starts ``stub_services`` on 127.0.0.1, points every collector at it, then runs
+``run_investigation`` end to end (collection, scoring, timeline, persistence,
+PDF) per target type, once sequentially ("single") and once through a thread
+pool ("bulk"). Reports throughput and p50/p95/p99 latency; with ``--baseline``
+it flags scenarios whose p95 regressed beyond ``--tolerance``.
+
+Cases are written to a temporary directory, never to ./reports.
+``--fresh-collectors`` builds new collectors for every investigation, to
+measure what the process-wide collectors (collectors.py) save.
+
+Usage:
+    python benchmark.py -n 50 -c 8 --latency-ms 30 --json bench.json
+    python benchmark.py --baseline bench.json          # exit 1 on regression
+    python benchmark.py -t ip,email,username --connect-ms 60 --fresh-collectors
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from stub_services import StubServices, StubConfig
+
+TARGET_TYPES = ('ip', 'email', 'phone', 'username', 'photo', 'ddos')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, wall_seconds):
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'throughput_per_s': round(len(ordered) / wall_seconds, 2) if wall_seconds else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+class Benchmark:
+    def __init__(self, stubs, iterations=20, concurrency=8, target_types=TARGET_TYPES, fresh_collectors=False):
+        self.stubs = stubs
+        self.fresh_collectors = fresh_collectors
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.target_types = target_types
+        self.pipeline = None
+
+    def target(self, target_type, i):
+        return {
+            'ip': f'198.51.100.{i % 250 + 1}',
+            'email': f'user{i}@stub.example',
+            'phone': f'+1415555{i % 10000:04d}',
+            'username': f'user{i}',
+            'photo': self.stubs.image_url(f'img{i}'),
+            'ddos': f'192.0.2.{i % 250 + 1}',
+        }[target_type]
+
+    def _timed(self, target_type, i):
+        start = time.perf_counter()
+        self.pipeline.run_investigation(target_type, self.target(target_type, i), 'Benchmark')
+        return time.perf_counter() - start
+
+    def run_single(self, target_type):
+        start = time.perf_counter()
+        latencies = [self._timed(target_type, i) for i in range(self.iterations)]
+        return summarize(latencies, time.perf_counter() - start)
+
+    def run_bulk(self, target_type):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as ex:
+            latencies = list(ex.map(lambda i: self._timed(target_type, i), range(self.iterations)))
+        return summarize(latencies, time.perf_counter() - start)
+
+    def run(self):
+        # Collectors read their endpoints at import time, so import the pipeline
+        # only after the stub environment is in place.
+        os.environ.update(self.stubs.env())
+        import main as pipeline
+        import metrics
+        import collectors
+        collectors.REUSE = not self.fresh_collectors
+        self.pipeline = pipeline
+        results = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for target_type in self.target_types:
+                results[f'{target_type}/single'] = self.run_single(target_type)
+                results[f'{target_type}/bulk'] = self.run_bulk(target_type)
+        errors = {}
+        for (name, labels), value in metrics.snapshot().items():
+            if name == metrics.COLLECTOR_CALLS.name and labels[2] != 'success':
+                errors['/'.join(labels)] = value
+        return {'scenarios': results, 'collector_failures': errors}
+
+
+def compare(current, baseline, tolerance):
+    """Scenarios whose p95 grew by more than ``tolerance`` relative to the baseline."""
+    regressions = []
+    for name, stats in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if old and old['p95_ms'] and stats['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append((name, old['p95_ms'], stats['p95_ms']))
+    return regressions
+
+
+def print_report(report):
+    print(f"{'scenario':<18}{'n':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in report['scenarios'].items():
+        print(f"{name:<18}{s['count']:>6}{s['throughput_per_s']:>10}{s['p50_ms']:>10}"
+              f"{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+    for source, count in sorted(report['collector_failures'].items()):
+        print(f'[bench] collector failures {source}: {count}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark IntelTrace investigations against local stubs')
+    parser.add_argument('-n', '--iterations', type=int, default=20, help='Investigations per scenario')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Threads for bulk scenarios')
+    parser.add_argument('-t', '--types', default=','.join(TARGET_TYPES), help='Comma-separated target types')
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--connect-ms', type=float, default=0.0,
+                        help='Stub delay per new connection (models DNS + TCP/TLS setup)')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rps', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--fresh-collectors', action='store_true',
+                        help='Build new collectors (and connections) for every investigation')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Previous --json output to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 growth (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rps, args.seed,
+                        args.connect_ms)
+    stubs = StubServices(config).start()
+    workdir = tempfile.mkdtemp(prefix='inteltrace-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        types = tuple(t for t in args.types.split(',') if t)
+        report = Benchmark(stubs, args.iterations, args.concurrency, types, args.fresh_collectors).run()
+    finally:
+        os.chdir(cwd)
+        stubs.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report['config'] = vars(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print(f'[bench] REGRESSION {name}: p95 {old} ms -> {new} ms')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
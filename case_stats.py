@@ -0,0 +1,299 @@
+"""Materialised dashboard statistics, maintained incrementally as cases are saved.
+
+``IntelDB.save_case`` appends a one-line summary of each case (type, target,
+investigator, day, reputation score, result and event counts) to
+``reports/_index/case_stats.jsonl``; ``CaseStats`` folds those lines into
+counters held in memory, so the dashboard reads totals, per-type /
+per-investigator / per-day counts, a score histogram and the most recent
+cases without opening any report. Re-saving a case replaces its earlier
+summary rather than counting it twice, and other processes' appends are
+picked up by reading only the new bytes of the log.
+The same summaries back the paginated case list (``page``).
+
+Usage:
+    python case_stats.py show
+    python case_stats.py check      # compare the stats with the stored cases
+    python case_stats.py rebuild    # rewrite the log from the stored cases
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from itertools import islice
+from collections import Counter, deque
+from datetime import datetime
+import shared_files
+
+RECENT_SIZE = 50
+SCORE_BIN = 10
+SUMMARY_KEYS = ('case_id', 'target_type', 'target', 'investigator', 'day', 'score', 'results', 'events')
+
+
+def _score_bin(score):
+    try:
+        return min(int(score) // SCORE_BIN * SCORE_BIN, 100 - SCORE_BIN)
+    except (TypeError, ValueError):
+        return 0
+
+
+def summarize(case):
+    """The fields of a case the dashboard needs."""
+    timeline = case.get('timeline') or []
+    first = timeline[0].get('time') if timeline and isinstance(timeline[0], dict) else None
+    return {
+        'case_id': case.get('case_id'),
+        'target_type': case.get('target_type', 'unknown'),
+        'target': case.get('target'),
+        'investigator': case.get('investigator') or 'unknown',
+        'day': str(first or datetime.utcnow().isoformat())[:10],
+        'score': (case.get('reputation') or {}).get('score', 0),
+        'results': len(case.get('results') or ()),
+        'events': len(timeline),
+    }
+
+
+class CaseStats:
+    """In-memory counters replayed from an append-only summary log."""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.log_path = os.path.join(index_dir, 'case_stats.jsonl')
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._offset = 0
+        self._inode = None
+        self._reset()
+
+    @classmethod
+    def for_dir(cls, index_dir):
+        """Return the process-wide stats for an index directory."""
+        path = os.path.abspath(index_dir)
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(index_dir)
+            return cls._instances[path]
+
+    def _reset(self):
+        self.cases = {}
+        self.by_type = Counter()
+        self.by_investigator = Counter()
+        self.by_day = Counter()
+        self.scores = Counter()
+        self.recent = deque(maxlen=RECENT_SIZE)
+
+    def _count(self, summary, sign):
+        for counter, key in ((self.by_type, summary['target_type']),
+                             (self.by_investigator, summary['investigator']),
+                             (self.by_day, summary['day']),
+                             (self.scores, _score_bin(summary['score']))):
+            counter[key] += sign
+            if counter[key] <= 0:
+                del counter[key]
+
+    def _apply(self, entry):
+        case_id = entry.get('case_id')
+        old = self.cases.get(case_id)
+        if entry.get('op') == 'score':
+            # Rescored in place: only the score moves, the case keeps its place in ``recent``
+            if old is None:
+                return
+            summary = dict(old, score=entry.get('score', 0))
+        else:
+            summary = {key: entry.get(key) for key in SUMMARY_KEYS}
+        if old is not None:
+            self._count(old, -1)
+        self._count(summary, 1)
+        if entry.get('op') == 'score':
+            self.cases[case_id] = summary
+            for i, item in enumerate(self.recent):
+                if item['case_id'] == case_id:
+                    self.recent[i] = summary
+        else:
+            # Keep ``cases`` in save order so paging newest-first is a reversed walk
+            self.cases.pop(case_id, None)
+            self.cases[case_id] = summary
+            if old is not None and old in self.recent:
+                self.recent.remove(old)
+            self.recent.append(summary)
+
+    def refresh(self):
+        """Apply log lines appended since the last read (possibly by other processes)."""
+        with self._lock:
+            current = shared_files.identity(self.log_path)
+            if current is None:
+                return
+            inode, size = current
+            if inode != self._inode or size < self._offset:
+                # Log was rebuilt (replaced) underneath us
+                self._reset()
+                self._offset = 0
+                self._inode = inode
+            if size == self._offset:
+                return
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._offset)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break
+                    self._offset += len(raw)
+                    try:
+                        self._apply(json.loads(raw))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+    def _append(self, entry):
+        with self._lock:
+            shared_files.append(self.log_path, json.dumps(entry) + '\n')
+            self.refresh()
+
+    def add_case(self, case):
+        self._append(summarize(case))
+
+    def rescored(self, case_id, score):
+        """Record a new reputation score for an already counted case."""
+        self._append({'op': 'score', 'case_id': case_id, 'score': score})
+
+    def snapshot(self, recent=10):
+        """Dashboard statistics; cost does not depend on the number of cases."""
+        self.refresh()
+        with self._lock:
+            return {
+                'total_cases': len(self.cases),
+                'target_types': dict(self.by_type),
+                'investigators': dict(self.by_investigator),
+                'cases_per_day': dict(sorted(self.by_day.items())),
+                'score_histogram': {f'{low}-{low + SCORE_BIN - 1 if low + SCORE_BIN < 100 else 100}': count
+                                    for low, count in sorted(self.scores.items())},
+                'recent_cases': [{'case_id': s['case_id'], 'target_type': s['target_type'], 'target': s['target'],
+                                  'investigator': s['investigator'], 'reputation': {'score': s['score']}}
+                                 for s in list(self.recent)[::-1][:recent]],
+            }
+
+    def page(self, offset=0, limit=50, query=None, target_type=None):
+        """(total matching, summaries[offset:offset + limit]) newest first.
+
+        ``query`` is a case-insensitive substring of the case id, target or
+        investigator. Unfiltered pages stop walking once the page is full.
+        """
+        self.refresh()
+        query = (query or '').strip().lower()
+        with self._lock:
+            newest_first = reversed(self.cases.values())
+            if not query and not target_type:
+                total = len(self.cases)
+                items = list(islice(newest_first, offset, offset + limit))
+            else:
+                matching = [s for s in newest_first
+                            if (not target_type or s['target_type'] == target_type)
+                            and (not query or query in f"{s['case_id']} {s['target']} {s['investigator']}".lower())]
+                total = len(matching)
+                items = matching[offset:offset + limit]
+        return total, [dict(s) for s in items]
+
+    @staticmethod
+    def _stored_summaries(reports_dir):
+        """Summary of every readable case, oldest first.
+
+        Only (mtime, path) pairs are sorted; cases are then loaded one at a
+        time, so memory follows the number of cases, not the archive's size.
+        """
+        paths = []
+        with os.scandir(reports_dir) as entries:
+            for entry in entries:
+                if not (entry.name.endswith('.json') and entry.is_file()):
+                    continue
+                try:
+                    paths.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        paths.sort()
+        for _, path in paths:
+            try:
+                with open(path, 'r') as f:
+                    case = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(case, dict) and 'case_id' in case:
+                yield summarize(case)
+
+    def rebuild(self, reports_dir):
+        """Rewrite the log from every stored case (oldest first) and reload it."""
+        with shared_files.locked(self.log_path):
+            return self._rebuild(reports_dir)
+
+    def ensure(self, reports_dir):
+        """Build the log from the archive if there is none yet; returns the case count, or None if it existed.
+
+        With several workers starting on a fresh archive, one builds it and
+        the others wait for it and read the result.
+        """
+        if os.path.exists(self.log_path):
+            return None
+        with shared_files.locked(self.log_path):
+            if os.path.exists(self.log_path):
+                self.refresh()
+                return None
+            return self._rebuild(reports_dir)
+
+    def _rebuild(self, reports_dir):
+        tmp_path = shared_files.tmp_path(self.log_path)
+        count = 0
+        with self._lock, shared_files.appends_blocked(self.log_path):
+            with open(tmp_path, 'w') as out:
+                for summary in self._stored_summaries(reports_dir):
+                    out.write(json.dumps(summary) + '\n')
+                    count += 1
+            os.replace(tmp_path, self.log_path)
+            self._reset()
+            self._offset = 0
+            self.refresh()
+        return count
+
+    def check(self, reports_dir):
+        """Differences between the materialised stats and a full scan; empty if consistent."""
+        expected = {summary['case_id']: summary for summary in self._stored_summaries(reports_dir)}
+        self.refresh()
+        problems = []
+        with self._lock:
+            for case_id in sorted(set(expected) - set(self.cases)):
+                problems.append(f'{case_id}: stored but not counted')
+            for case_id in sorted(set(self.cases) - set(expected)):
+                problems.append(f'{case_id}: counted but not stored')
+            for case_id in sorted(set(expected) & set(self.cases)):
+                old, new = self.cases[case_id], expected[case_id]
+                for key in ('target_type', 'investigator', 'score'):
+                    if old[key] != new[key]:
+                        problems.append(f'{case_id}: {key} is {old[key]!r} in stats, {new[key]!r} in case')
+        return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or rebuild the materialised dashboard statistics')
+    parser.add_argument('--reports-dir', default='reports')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('show', help='Print the current statistics')
+    sub.add_parser('check', help='Compare the statistics with the stored cases (exit 1 on mismatch)')
+    sub.add_parser('rebuild', help='Rewrite the statistics log from the stored cases')
+    args = parser.parse_args()
+
+    stats = CaseStats.for_dir(os.path.join(args.reports_dir, '_index'))
+    if args.command == 'show':
+        print(json.dumps(stats.snapshot(), indent=2))
+    elif args.command == 'rebuild':
+        print(f'[stats] Rebuilt from {stats.rebuild(args.reports_dir)} cases')
+    else:
+        problems = stats.check(args.reports_dir)
+        for problem in problems[:50]:
+            print(f'[stats] {problem}')
+        if problems:
+            print(f'[stats] {len(problems)} mismatch(es); run "python case_stats.py rebuild"')
+            sys.exit(1)
+        print('[stats] Consistent with stored cases')
+
+
+if __name__ == '__main__':
+    main()
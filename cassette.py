@@ -0,0 +1,290 @@
+"""Record-and-replay cassettes for collector traffic.
+
+In ``record`` mode every request made through a collector session is sent for
+real and its response (status, headers, body, final URL, elapsed time) is
+captured; WHOIS lookups and the DDoS target's DNS resolution are captured
+the same way. The cassette is a gzipped
+JSON-lines file. In ``replay`` mode nothing leaves the machine: responses are
+served from the cassette (repeats of the same request cycle through the
+recorded answers) with the original timing scaled by ``speed`` (1.0 = original,
+0.1 = ten times faster, 0 = no delay). Requests missing from the cassette fail
+as connection errors, so replays are strictly offline.
+
+Enable for a process with ``INTELTRACE_CASSETTE=path`` and
+``INTELTRACE_CASSETTE_MODE=record|replay`` (``INTELTRACE_CASSETTE_SPEED``
+optional), or call ``use()`` before collectors are constructed.
+
+Re-run stored investigations:
+    python cassette.py record  traffic.jsonl.gz --from-reports reports
+    python cassette.py replay  traffic.jsonl.gz --from-reports reports --speed 0 --profile replay.prof
+"""
+import os
+import io
+import json
+import gzip
+import time
+import atexit
+import base64
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+from collections import defaultdict
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+KEPT_HEADERS = ('content-type', 'location', 'retry-after', 'etag', 'last-modified')
+
+
+def request_key(method, url, body=None):
+    key = f'{method.upper()} {url}'
+    if body:
+        if isinstance(body, str):
+            body = body.encode()
+        key += ' ' + hashlib.sha1(body).hexdigest()[:12]
+    return key
+
+
+class Cassette:
+    def __init__(self, path, mode='replay', speed=0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f'Unknown cassette mode: {mode}')
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.entries = []
+        self.hits = 0
+        self.misses = 0
+        self._by_key = defaultdict(list)
+        self._cursor = defaultdict(int)
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, 'rt') as f:
+            for line in f:
+                entry = json.loads(line)
+                self.entries.append(entry)
+                self._by_key[entry['k']].append(entry)
+
+    def save(self):
+        if self.mode != 'record':
+            return
+        with self._lock:
+            entries = list(self.entries)
+        tmp_path = self.path + '.tmp'
+        with gzip.open(tmp_path, 'wt') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(',', ':'), default=str) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def record(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+
+    def lookup(self, key):
+        """Next recorded entry for a key (cycling through repeats), or None."""
+        with self._lock:
+            found = self._by_key.get(key)
+            if not found:
+                self.misses += 1
+                return None
+            self.hits += 1
+            index = self._cursor[key]
+            self._cursor[key] = index + 1
+            entry = found[index % len(found)]
+        if self.speed:
+            time.sleep(entry.get('e', 0) / 1000.0 * self.speed)
+        return entry
+
+    def call(self, kind, query, fn):
+        """Record or replay a non-HTTP lookup (e.g. WHOIS) whose result is JSON-serialisable."""
+        key = f'{kind.upper()} {query}'
+        if self.mode == 'replay':
+            entry = self.lookup(key)
+            if entry is None:
+                raise ConnectionError(f'cassette miss: {key}')
+            return entry['v']
+        start = time.perf_counter()
+        value = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.record({'k': key, 'v': json.loads(json.dumps(value, default=str)), 'e': round(elapsed, 3)})
+        return value
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter recording to or replaying from a cassette."""
+
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if self.cassette.mode == 'replay':
+            entry = self.cassette.lookup(key)
+            if entry is None:
+                raise requests.ConnectionError(f'cassette miss: {key}', request=request)
+            return self._build_response(request, entry)
+        response = super().send(request, **kwargs)
+        self.cassette.record({
+            'k': key,
+            's': response.status_code,
+            'r': response.reason,
+            'u': response.url,
+            'h': {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            'b': base64.b64encode(response.content).decode(),
+            'e': round(response.elapsed.total_seconds() * 1000, 3),
+        })
+        return response
+
+    def _build_response(self, request, entry):
+        response = requests.Response()
+        response.status_code = entry['s']
+        response.reason = entry.get('r')
+        response.url = entry.get('u') or request.url
+        response.headers = CaseInsensitiveDict(entry.get('h', {}))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(entry['b'])
+        response._content_consumed = True
+        response.raw = io.BytesIO(response._content)
+        response.request = request
+        response.connection = self
+        return response
+
+
+ACTIVE = None
+
+
+def use(path, mode='replay', speed=0.0):
+    """Activate a cassette for collectors constructed from now on."""
+    global ACTIVE
+    ACTIVE = Cassette(path, mode, speed)
+    if mode == 'record':
+        atexit.register(ACTIVE.save)
+    return ACTIVE
+
+
+def mount(session):
+    """Route a collector session through the active cassette, if any."""
+    if ACTIVE is not None:
+        adapter = CassetteAdapter(ACTIVE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+
+def call(kind, query, fn):
+    """Run a non-HTTP lookup through the active cassette, if any."""
+    if ACTIVE is None:
+        return fn()
+    return ACTIVE.call(kind, query, fn)
+
+
+if os.getenv('INTELTRACE_CASSETTE'):
+    use(os.environ['INTELTRACE_CASSETTE'],
+        os.getenv('INTELTRACE_CASSETTE_MODE', 'replay'),
+        float(os.getenv('INTELTRACE_CASSETTE_SPEED', '0')))
+
+
+def _is_localhost(target):
+    return target in ('localhost', '::1') or target.startswith('127.')
+
+
+def targets_from_reports(reports_dir, limit=None):
+    """Yield (target_type, target) from stored cases, skipping localhost stress tests."""
+    count = 0
+    with os.scandir(reports_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, 'r') as f:
+                    case = json.load(f)
+            except (OSError, ValueError):
+                continue
+            target_type, target = case.get('target_type'), str(case.get('target', ''))
+            if not target_type or not target or (target_type == 'ddos' and _is_localhost(target)):
+                continue
+            yield target_type, target
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def _local_target(target_type, target):
+    # Photo uploads are stored relative to the working directory (``uploads/...``)
+    if target_type == 'photo' and not target.startswith(('http://', 'https://')):
+        return os.path.abspath(target)
+    return target
+
+
+def rerun(targets, profile_path=None):
+    """Run investigations quietly in a scratch directory; return per-run latencies."""
+    import main as pipeline
+    # Resolved before leaving the working directory, which relative photo paths are relative to
+    targets = [(target_type, _local_target(target_type, target)) for target_type, target in targets]
+    workdir = tempfile.mkdtemp(prefix='inteltrace-replay-')
+    cwd = os.getcwd()
+    latencies = []
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if profiler:
+                profiler.enable()
+            for target_type, target in targets:
+                start = time.perf_counter()
+                pipeline.run_investigation(target_type, target, 'Replay')
+                latencies.append(time.perf_counter() - start)
+            if profiler:
+                profiler.disable()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    if profiler:
+        profiler.dump_stats(profile_path)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record or replay collector traffic for stored investigations')
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('cassette', help='Cassette file (gzipped JSON lines)')
+    parser.add_argument('--from-reports', default='reports', help='Re-run the targets of these stored cases')
+    parser.add_argument('--limit', type=int, default=None, help='Maximum investigations to run')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='Replay timing factor: 1 = original, 0.1 = 10x faster, 0 = no delay')
+    parser.add_argument('--profile', help='Write cProfile stats of the replay to this file')
+    args = parser.parse_args()
+
+    active = use(os.path.abspath(args.cassette), args.mode, args.speed)
+    import main as _pipeline  # noqa: F401  (import cost kept out of the timings)
+    targets = list(targets_from_reports(args.from_reports, args.limit))
+    print(f'[cassette] {args.mode}: {len(targets)} investigations from {args.from_reports}')
+    started = time.perf_counter()
+    latencies = rerun(targets, args.profile and os.path.abspath(args.profile))
+    elapsed = time.perf_counter() - started
+    if args.mode == 'record':
+        active.save()
+        print(f'[cassette] Recorded {len(active.entries)} interactions to {args.cassette}')
+    else:
+        print(f'[cassette] Replay hits {active.hits}, misses {active.misses}')
+    if latencies:
+        print(f'[cassette] {len(latencies)} investigations in {elapsed:.2f}s '
+              f'({len(latencies) / elapsed:.1f}/s, mean {sum(latencies) / len(latencies) * 1000:.1f} ms)')
+    if args.profile:
+        import pstats
+        pstats.Stats(args.profile).sort_stats('cumulative').print_stats(25)
+
+
+if __name__ == '__main__':
+    main()
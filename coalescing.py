@@ -0,0 +1,104 @@
+"""Single-flight deduplication of concurrent collections.
+
+When the same target is investigated several times at once (two analysts,
+or a bulk job and the UI), only the first request runs the collectors; the
+others wait for it and reuse its results. The target is normalised first,
+so ``8.8.8.8``/``008.008.008.008``, ``Alice@Example.com``/``alice@example.com``
+or ``@Alice``/``alice`` count as the same lookup. Each request still gets its
+own case, with its own scoring, timeline and report; cases built from
+another case's collection name it as ``evidence_case``.
+
+Only requests that overlap in time are merged, nothing is cached
+afterwards, and deduplication is per process (each UI worker has its own).
+``INVESTIGATION_COALESCE=0`` turns it off.
+"""
+import os
+import re
+import ipaddress
+import threading
+import phonenumbers
+
+ENABLED = os.getenv('INVESTIGATION_COALESCE', '1') != '0'
+
+
+def _ip_or_host(value):
+    value = value.strip()
+    try:
+        return ipaddress.ip_address(value).compressed
+    except ValueError:
+        pass
+    # ip_address rejects leading zeros; 008.008.008.008 is still 8.8.8.8
+    parts = value.split('.')
+    if len(parts) == 4 and all(p.isdigit() for p in parts):
+        try:
+            return ipaddress.ip_address('.'.join(str(int(p)) for p in parts)).compressed
+        except ValueError:
+            pass
+    return value.lower().rstrip('.')
+
+
+def _phone(value):
+    try:
+        return phonenumbers.format_number(phonenumbers.parse(value, None), phonenumbers.PhoneNumberFormat.E164)
+    except Exception:
+        return re.sub(r'[^\d+]', '', value)
+
+
+NORMALIZERS = {
+    'ip': _ip_or_host,
+    'ddos': _ip_or_host,
+    'email': lambda value: value.strip().lower(),
+    'phone': _phone,
+    'username': lambda value: value.strip().lstrip('@').lower(),
+}
+
+
+def normalize_target(target_type, value):
+    """Canonical form of a target, used to recognise duplicate lookups."""
+    normalize = NORMALIZERS.get(target_type, lambda v: v.strip())
+    return normalize(str(value))
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """(fn's result, True if this caller ran it). Exceptions reach every waiting caller."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result'], False
+        try:
+            call['result'] = fn()
+            return call['result'], True
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+inflight = SingleFlight()
+
+
+def collect_once(target_type, target_value, fn):
+    """Run ``fn`` unless the same target is already being collected; returns (result, leader)."""
+    if not ENABLED:
+        return fn(), True
+    return inflight.do((target_type, normalize_target(target_type, target_value)), fn)
@@ -0,0 +1,178 @@
+"""Process-wide collector instances shared by every investigation.
+
+``get(target_type)`` builds each collector the first time it is needed and
+then hands out the same instance, so its ``requests`` sessions keep their
+connection pools (DNS lookups, TCP and TLS handshakes) across investigations
+instead of paying for them on every scan. Sessions get a pool of
+``COLLECTOR_POOL_SIZE`` connections per host, enough for the username
+checks and bulk jobs running side by side, and do not keep cookies, so one
+investigation never sends another's cookies. ``COLLECTOR_REUSE=0`` builds
+a fresh collector per investigation instead.
+
+``warm_up`` can open those connections before the first investigation: it
+sends a ``HEAD /`` to every host the collectors query for each target (IP
+info, breach lookups, social platforms). Serving processes do this at
+startup when ``COLLECTOR_WARM_UP=1``. Activating a cassette (``cassette.use``) drops the instances, since their sessions are
+routed through the cassette that was active when they were built.
+
+Usage:
+    python collectors.py warm           # connect to every known host and print timings
+    python collectors.py warm -t ip,email
+"""
+import os
+import time
+import argparse
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import cassette
+import dns_cache
+from ip_intel import IPIntel
+from email_intel import EmailIntel
+from phone_intel import PhoneIntel
+from username_intel import UsernameIntel
+from photo_intel import PhotoIntel
+from ddos_intel import DDOSIntel
+
+REUSE = os.getenv('COLLECTOR_REUSE', '1') != '0'
+POOL_SIZE = int(os.getenv('COLLECTOR_POOL_SIZE', '32'))
+WARM_UP = os.getenv('COLLECTOR_WARM_UP', '0') == '1'
+WARM_TIMEOUT = float(os.getenv('COLLECTOR_WARM_TIMEOUT', '5'))
+
+FACTORIES = {
+    'ip': IPIntel,
+    'email': EmailIntel,
+    'phone': PhoneIntel,
+    'username': UsernameIntel,
+    'photo': PhotoIntel,
+    'ddos': DDOSIntel,
+}
+
+# URLs each collector fetches on every investigation; photo URLs come from the user
+KNOWN_URLS = {
+    'ip': lambda c: [c.ipinfo_url],
+    'email': lambda c: [c.hibp_url],
+    'username': lambda c: list(c.platforms.values()),
+}
+
+_instances = {}
+_lock = threading.Lock()
+_cassette = None
+
+# Collector sessions look hosts up through the process-wide DNS cache
+dns_cache.install()
+
+
+def sessions(collector):
+    """The ``requests`` sessions a collector holds."""
+    return [value for value in vars(collector).values() if isinstance(value, requests.Session)]
+
+
+def _pooled(collector):
+    for session in sessions(collector):
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if cassette.ACTIVE is None:
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+    return collector
+
+
+def get(target_type):
+    """The process-wide collector for a target type (KeyError if unknown)."""
+    global _cassette
+    factory = FACTORIES[target_type]
+    if not REUSE:
+        return _pooled(factory())
+    with _lock:
+        if cassette.ACTIVE is not _cassette:
+            _instances.clear()
+            _cassette = cassette.ACTIVE
+        collector = _instances.get(target_type)
+        if collector is None:
+            collector = _instances[target_type] = _pooled(factory())
+        return collector
+
+
+def reset():
+    """Drop every instance (and its connections); the next ``get`` builds new ones."""
+    with _lock:
+        dropped = list(_instances.values())
+        _instances.clear()
+    for collector in dropped:
+        for session in sessions(collector):
+            session.close()
+
+
+def hosts(target_type, collector):
+    """{origin (scheme://host[:port]): URLs fetched there} for every target.
+
+    The username checks run in parallel, so a stub serving every platform
+    from one origin needs that many connections.
+    """
+    origins = {}
+    for url in KNOWN_URLS.get(target_type, lambda c: [])(collector):
+        parts = urlsplit(url)
+        if parts.scheme in ('http', 'https') and parts.netloc:
+            origin = f'{parts.scheme}://{parts.netloc}'
+            origins[origin] = min(POOL_SIZE, origins.get(origin, 0) + 1)
+    return origins
+
+
+def _connect(session, origin):
+    start = time.perf_counter()
+    try:
+        session.head(origin + '/', timeout=WARM_TIMEOUT, allow_redirects=False)
+        return round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        return f'failed: {type(e).__name__}'
+
+
+def warm_up(target_types=None, connect=True):
+    """Build the collectors and, with ``connect``, open pooled connections to their hosts.
+
+    Returns {target_type: {origin: slowest connect ms, or an error}}.
+    Nothing is sent while a cassette is active.
+    """
+    target_types = target_types or list(FACTORIES)
+    built = {target_type: get(target_type) for target_type in target_types}
+    timings = {target_type: {} for target_type in target_types}
+    if not connect or cassette.ACTIVE is not None:
+        return timings
+    jobs = [(target_type, session, origin) for target_type, collector in built.items()
+            for session in sessions(collector)[:1]
+            for origin, connections in hosts(target_type, collector).items() for _ in range(connections)]
+    if not jobs:
+        return timings
+    # Concurrent requests to one origin each check out (and keep) their own pooled connection
+    with ThreadPoolExecutor(max_workers=min(32, len(jobs))) as ex:
+        futures = [(target_type, origin, ex.submit(_connect, session, origin)) for target_type, session, origin in jobs]
+        results = {}
+        for target_type, origin, future in futures:
+            results.setdefault((target_type, origin), []).append(future.result())
+    for (target_type, origin), values in results.items():
+        errors = [v for v in values if isinstance(v, str)]
+        timings[target_type][origin] = errors[0] if errors else max(values)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the collectors and pre-connect to their hosts')
+    sub = parser.add_subparsers(dest='command', required=True)
+    warm = sub.add_parser('warm', help='Connect to every configured host and print the timings')
+    warm.add_argument('-t', '--types', default=','.join(FACTORIES), help='Comma-separated target types')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = warm_up([t for t in args.types.split(',') if t])
+    for target_type, origins in timings.items():
+        for origin, result in origins.items():
+            print(f'[collectors] {target_type:<9} {origin:<40} {result}' + (' ms' if not isinstance(result, str) else ''))
+    print(f'[collectors] Warm-up took {round((time.perf_counter() - start) * 1000, 1)} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,135 @@
 import os
 import json
 import glob
+import threading
+from entity_graph import EntityGraph
+from timeline_builder import TimelineIndex
+from case_stats import CaseStats
+import timeseries
+import records
 
 
 class IntelDB:
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide instance for the current reports directory (used per request by the UI)."""
+        key = os.path.abspath('reports')
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls()
+            return cls._shared[key]
+
     def __init__(self):
         self.reports_dir = 'reports'
         os.makedirs(self.reports_dir, exist_ok=True)
+        self.graph = EntityGraph.for_dir(os.path.join(self.reports_dir, '_index'))
+        self.timeline = TimelineIndex(os.path.join(self.reports_dir, '_timeline'))
+        self.stats = CaseStats.for_dir(os.path.join(self.reports_dir, '_index'))
+        # First run against an existing archive: index it and materialise its stats once
+        # (one worker builds, the others wait)
+        self.graph.ensure(self.reports_dir)
+        self.timeline.ensure(self.reports_dir)
+        self.stats.ensure(self.reports_dir)
         print('[db] Using JSON file storage')
 
     def save_case(self, case):
         case_id = case['case_id']
         json_path = os.path.join(self.reports_dir, f"{case_id}.json")
-        with open(json_path, 'w') as f:
+        # Write then rename, so readers in other threads or workers never see a partial case
+        tmp_path = f'{json_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
             json.dump(case, f, indent=2)
+        os.replace(tmp_path, json_path)
+        self.graph.add_case(case)
+        self.timeline.add_case(case)
+        self.stats.add_case(case)
         print('[db] Saved to JSON file')
 
+    def case_path(self, case_id):
+        return os.path.join(self.reports_dir, f"{case_id}.json")
+
     def get_case(self, case_id):
-        json_path = os.path.join(self.reports_dir, f"{case_id}.json")
+        json_path = self.case_path(case_id)
         if os.path.exists(json_path):
             with open(json_path, 'r') as f:
-                return json.load(f)
+                return records.upgrade(json.load(f))
         return None
 
+    def get_cases(self, case_ids):
+        """{case_id: case} for the ids that exist; ids that are not plain file names are skipped."""
+        found = {}
+        for case_id in case_ids:
+            case_id = str(case_id)
+            if not case_id or case_id.startswith('.') or os.path.basename(case_id) != case_id:
+                continue
+            case = self.get_case(case_id)
+            if case is not None:
+                found[case_id] = case
+        return found
+
     def list_cases(self):
         """List all cases from JSON files."""
         cases = []
         json_files = glob.glob(os.path.join(self.reports_dir, '*.json'))
         for json_path in json_files:
             with open(json_path, 'r') as f:
-                cases.append(json.load(f))
+                cases.append(records.upgrade(json.load(f)))
         
         return sorted(cases, key=lambda x: x.get('case_id', ''), reverse=True)
+
+    def store_size(self):
+        """Number of stored cases and their total size in bytes."""
+        count = size = 0
+        with os.scandir(self.reports_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    count += 1
+                    size += entry.stat().st_size
+        return count, size
+
+    def case_page(self, offset=0, limit=50, query=None, target_type=None):
+        """(total, case summaries) for one page of the archive, newest first."""
+        return self.stats.page(offset, limit, query, target_type)
+
+    def result_page(self, case_id, offset=0, limit=50):
+        """(total, items) for one page of a case's results, or None if the case is missing.
+
+        List results are paged as they are; dict results (IP, email, phone
+        cases) become one ``{'section', 'data'}`` item per key.
+        """
+        case = self.get_case(case_id)
+        if case is None:
+            return None
+        results = case.get('results')
+        if isinstance(results, dict):
+            items = [{'section': key, 'data': value} for key, value in results.items()]
+        elif isinstance(results, list):
+            items = results
+        else:
+            items = [] if results is None else [{'section': 'result', 'data': results}]
+        return len(items), items[offset:offset + limit]
+
+    def dashboard_stats(self, recent=10):
+        """Materialised dashboard counters (see case_stats.py)."""
+        return self.stats.snapshot(recent)
+
+    def related_cases(self, case_id):
+        """Cases sharing entities (IPs, emails, usernames, hashes...) with a case."""
+        return self.graph.related_cases(case_id)
+
+    def entity_neighbourhood(self, node, k=2):
+        """k-hop neighbourhood of a case id or ``kind:value`` entity key."""
+        return self.graph.neighbourhood(node, k)
+
+    def merged_timeline(self, since=None, until=None, target=None, entity=None, limit=None):
+        """Events across cases in a time window, optionally for a target or entity."""
+        case_ids = self.graph.cases_for(entity) if entity else None
+        return self.timeline.query(since=since, until=until, target=target, case_ids=case_ids, limit=limit)
+
+    def traffic_series(self, case_id):
+        """Decoded traffic time series of a case (cached), or None."""
+        json_path = os.path.join(self.reports_dir, f"{case_id}.json")
+        return timeseries.decoded(json_path, lambda: self.get_case(case_id))
@@ -8,25 +8,62 @@ system might report.
 
 Includes localhost-only stress testing capabilities for load testing local apps.
 """
+import os
 import socket
 import random
 from datetime import datetime, timedelta
 from stress_simulator import LocalhostStressSimulator
+from stress_scenarios import DEFAULT_SCENARIO, load_scenario, run_scenario
+from timeline_builder import step
+import timeseries
+import dns_cache
+import cassette
+from records import (TargetInfo, TrafficAnalysis, AttackVectors, SourceAnalysis, ProtocolAnalysis, ImpactAssessment,
+                     BotnetAnalysis, MitigationRecommendations, HistoricalAnalysis, CostEstimation)
+
+
+ATTACK_VECTORS = [
+    'SYN Flood', 'UDP Amplification', 'HTTP Flood', 'DNS Amplification',
+    'NTP Amplification', 'ICMP Flood', 'Slowloris', 'ACK Flood',
+    'Ping of Death', 'Smurf Attack', 'Fragmentation Attack', 'Volumetric Attack'
+]
+MITIGATION_SERVICES = [
+    'Cloudflare DDoS Protection', 'AWS Shield', 'Akamai Prolexic',
+    'Imperva DDoS Protection', 'Arbor Networks', 'F5 Silverline'
+]
+PROTOCOLS = ('TCP', 'UDP', 'ICMP', 'Other')
+SEVERITY_LEVELS = ['Critical', 'High', 'Medium']
+BOTNETS = ['Mirai', 'Bashlite', 'Gafgyt', 'Hoaxcalls', 'Unknown']
+LEVELS = ['Low', 'Medium', 'High']
+SIM_SEED = os.getenv('DDOS_SIM_SEED')
+SERIES_SECONDS = int(os.getenv('DDOS_SERIES_SECONDS', '10800'))
+
+
+def split_percentages(weights):
+    """Integer percentages proportional to ``weights`` that sum to exactly 100."""
+    total = float(sum(weights))
+    raw = [w * 100.0 / total for w in weights]
+    shares = [int(r) for r in raw]
+    by_remainder = sorted(range(len(raw)), key=lambda i: raw[i] - shares[i], reverse=True)
+    for i in by_remainder[:100 - sum(shares)]:
+        shares[i] += 1
+    return shares
 
 
 class DDOSIntel:
-    def __init__(self):
-        self.attack_vectors = [
-            'SYN Flood', 'UDP Amplification', 'HTTP Flood', 'DNS Amplification',
-            'NTP Amplification', 'ICMP Flood', 'Slowloris', 'ACK Flood',
-            'Ping of Death', 'Smurf Attack', 'Fragmentation Attack', 'Volumetric Attack'
-        ]
-        self.mitigation_services = [
-            'Cloudflare DDoS Protection', 'AWS Shield', 'Akamai Prolexic',
-            'Imperva DDoS Protection', 'Arbor Networks', 'F5 Silverline'
-        ]
-
-    def collect(self, target):
+    def __init__(self, scenario_path=None, seed=None):
+        self.scenario_path = scenario_path or os.getenv('STRESS_SCENARIO', DEFAULT_SCENARIO)
+        self.seed = seed if seed is not None else SIM_SEED
+        self.attack_vectors = list(ATTACK_VECTORS)
+        self.mitigation_services = list(MITIGATION_SERVICES)
+
+    def rng_for(self, target):
+        """Random generator for one report: fixed per (seed, target) when seeded."""
+        if self.seed is None:
+            return random.Random()
+        return random.Random(f'{self.seed}:{target}')
+
+    def collect(self, target, now=None):
         """Return comprehensive simulated DDoS analysis data.
 
         This is a safe, read-only simulation for educational purposes.
@@ -34,15 +71,18 @@ class DDOSIntel:
         
         Special case: If target is 127.0.0.1, offers localhost stress testing.
         
+        With a seed (constructor or DDOS_SIM_SEED) the same target and ``now``
+        always produce the same report.
+        
         Args:
             target: IP address or domain to analyze
+            now: Report time (defaults to the current UTC time)
             
         Returns:
             list: Simulated analysis results with detailed metrics
         """
         print(f"[ddos_intel] Starting simulated DDoS analysis for: {target}")
-        now = datetime.utcnow()
-        results = []
+        now = now or datetime.utcnow()
 
         # Check if this is localhost - offer stress testing
         simulator = LocalhostStressSimulator()
@@ -51,113 +91,184 @@ class DDOSIntel:
             return self._perform_localhost_stress_test(target)
 
         # Determine target type (non-localhost)
-        is_ip, resolved_ip = self._resolve_target(target)
+        with step('ddos', 'resolve'):
+            is_ip, resolved_ip = self._resolve_target(target)
         
+        results = self.simulate(target, is_ip, resolved_ip, self.rng_for(target), now)
+
+        print(f"[ddos_intel] Analysis complete. Generated {len(results)} data points")
+        return results
+
+    def simulate(self, target, is_ip, resolved_ip, rng, now):
+        """Build the simulated analysis from ``rng`` (deterministic for a seeded rng)."""
+        drawn = self.draw(rng)
+        results = self.layout(target, is_ip, resolved_ip, now, drawn)
+        if SERIES_SECONDS > 0:
+            results.append(self.traffic_timeseries(drawn, rng.getrandbits(32), now))
+        return results
+
+    def traffic_timeseries(self, v, seed, now, seconds=None):
+        """Per-second traffic for the ``seconds`` before ``now``, ending mid-attack.
+
+        Stored compactly (see ``timeseries``); charts fetch it downsampled
+        from /api/reports/<case_id>/series.
+        """
+        from ddos_synth import traffic_series
+        seconds = seconds or SERIES_SECONDS
+        series = traffic_series(seconds, seed, v['baseline_rps'], v['peak_rps'],
+                                attack_start=seconds * 2 // 3, attack_seconds=seconds // 3)
+        return timeseries.series_result(
+            now - timedelta(seconds=seconds), 1,
+            {'rps': (series['rps'], 'u4'),
+             'bandwidth_mbps': (series['bandwidth_mbps'], 'f4'),
+             'protocol_mix': (series['protocol_mix'], 'u1')},
+            protocols=list(PROTOCOLS))
+
+    def draw(self, rng):
+        """Draw every simulated figure of one report.
+
+        Figures are kept mutually consistent: baseline <= current <= peak RPS,
+        protocol shares sum to 100%, the secondary vector never outweighs the
+        primary and per-category source IPs never exceed the unique count.
+        ``ddos_synth.draw_many`` produces the same fields with NumPy.
+        """
+        primary_packets = rng.randint(50000, 500000)
+        primary_gbps = rng.randint(5, 50)
+        tor, cloud, proxy = rng.randint(5, 50), rng.randint(100, 1000), rng.randint(500, 5000)
+        current_rps = rng.randint(8000, 25000)
+        return {
+            'baseline_rps': rng.randint(500, 2000),
+            'current_rps': current_rps,
+            'peak_rps': rng.randint(max(30000, current_rps), 100000),
+            'vectors': rng.sample(self.attack_vectors, k=rng.randint(2, 4)),
+            'primary_packets': primary_packets,
+            'primary_gbps': primary_gbps,
+            'secondary_packets': rng.randint(10000, min(100000, primary_packets)),
+            'secondary_gbps': rng.randint(1, min(10, primary_gbps)),
+            'unique_ips': rng.randint(max(5000, tor + cloud + proxy), 50000),
+            'asn_count': rng.randint(50, 200),
+            'tor_exits': tor,
+            'cloud_ips': cloud,
+            'proxy_ips': proxy,
+            'protocol_shares': split_percentages([rng.randint(40, 70), rng.randint(20, 40),
+                                                  rng.randint(5, 15), rng.randint(1, 5)]),
+            'malformed': rng.randint(1000, 10000),
+            'fragmented': rng.randint(500, 5000),
+            'severity': rng.choice(SEVERITY_LEVELS),
+            'downtime_min': rng.randint(0, 120),
+            'cpu': rng.randint(70, 99),
+            'memory': rng.randint(60, 95),
+            'bandwidth': rng.randint(80, 100),
+            'queue': rng.randint(10000, 100000),
+            'dropped': rng.randint(50000, 500000),
+            'botnet': rng.choice(BOTNETS),
+            'user_agents': rng.randint(5, 50),
+            'sophistication': rng.choice(LEVELS),
+            'mitigation': rng.sample(self.mitigation_services, k=2),
+            'mitigation_min': rng.randint(5, 30),
+            'history': [(days, rng.randint(10, 240), rng.randint(10000, 80000), rng.choice(self.attack_vectors))
+                        for days in sorted(rng.randint(1, 30) for _ in range(5))],
+            'costs': [rng.randint(500, 5000), rng.randint(1000, 50000),
+                      rng.randint(200, 2000), rng.randint(500, 5000)],
+            'reputation': rng.choice(LEVELS),
+            'customers': rng.randint(100, 10000),
+        }
+
+    def layout(self, target, is_ip, resolved_ip, now, v):
+        """Arrange drawn figures ``v`` into the case result list."""
+        results = []
+
         # 1. Target Information
-        results.append({
-            'type': 'target_info',
-            'target': target,
-            'is_ip': is_ip,
-            'resolved_ip': resolved_ip if resolved_ip else target,
-            'analysis_type': 'DDoS Vulnerability & Pattern Analysis',
-            'timestamp': now.isoformat() + 'Z',
-            'status': 'simulation_mode'
-        })
+        results.append(TargetInfo(
+            target=target,
+            is_ip=is_ip,
+            resolved_ip=resolved_ip if resolved_ip else target,
+            analysis_type='DDoS Vulnerability & Pattern Analysis',
+            timestamp=now.isoformat() + 'Z',
+            status='simulation_mode'
+        ))
 
         # 2. Simulated Traffic Patterns
-        results.append({
-            'type': 'traffic_analysis',
-            'baseline_rps': random.randint(500, 2000),
-            'current_rps': random.randint(8000, 25000),
-            'peak_rps': random.randint(30000, 100000),
-            'traffic_spike_detected': True,
-            'spike_percentage': random.randint(1200, 5000),
-            'unusual_patterns': [
+        results.append(TrafficAnalysis(
+            baseline_rps=v['baseline_rps'],
+            current_rps=v['current_rps'],
+            peak_rps=v['peak_rps'],
+            traffic_spike_detected=True,
+            spike_percentage=round((v['current_rps'] - v['baseline_rps']) * 100 / v['baseline_rps']),
+            unusual_patterns=[
                 'High SYN packet rate detected',
                 'Multiple source IPs with identical packet patterns',
                 'Abnormal geographic distribution of requests',
                 'Sudden spike in connection attempts'
             ]
-        })
+        ))
 
         # 3. Attack Vector Analysis
-        detected_vectors = random.sample(self.attack_vectors, k=random.randint(2, 4))
-        results.append({
-            'type': 'attack_vectors',
-            'detected_vectors': detected_vectors,
-            'primary_vector': detected_vectors[0],
-            'vector_details': [
+        detected_vectors = v['vectors']
+        results.append(AttackVectors(
+            detected_vectors=detected_vectors,
+            primary_vector=detected_vectors[0],
+            vector_details=[
                 {
                     'vector': detected_vectors[0],
                     'severity': 'high',
-                    'packet_count': random.randint(50000, 500000),
-                    'bandwidth_consumed': f'{random.randint(5, 50)} Gbps'
+                    'packet_count': v['primary_packets'],
+                    'bandwidth_consumed': f"{v['primary_gbps']} Gbps"
                 },
                 {
                     'vector': detected_vectors[1] if len(detected_vectors) > 1 else 'Generic',
                     'severity': 'medium',
-                    'packet_count': random.randint(10000, 100000),
-                    'bandwidth_consumed': f'{random.randint(1, 10)} Gbps'
+                    'packet_count': v['secondary_packets'],
+                    'bandwidth_consumed': f"{v['secondary_gbps']} Gbps"
                 }
             ]
-        })
+        ))
 
         # 4. Source IP Analysis
-        results.append({
-            'type': 'source_analysis',
-            'unique_source_ips': random.randint(5000, 50000),
-            'botnet_indicators': True,
-            'top_source_countries': ['US', 'CN', 'RU', 'BR', 'IN'],
-            'suspicious_asn_count': random.randint(50, 200),
-            'tor_exit_nodes_detected': random.randint(5, 50),
-            'cloud_provider_ips': random.randint(100, 1000),
-            'residential_proxy_ips': random.randint(500, 5000)
-        })
+        results.append(SourceAnalysis(
+            unique_source_ips=v['unique_ips'],
+            botnet_indicators=True,
+            top_source_countries=['US', 'CN', 'RU', 'BR', 'IN'],
+            suspicious_asn_count=v['asn_count'],
+            tor_exit_nodes_detected=v['tor_exits'],
+            cloud_provider_ips=v['cloud_ips'],
+            residential_proxy_ips=v['proxy_ips']
+        ))
 
         # 5. Protocol Analysis
-        results.append({
-            'type': 'protocol_analysis',
-            'protocols': {
-                'TCP': f'{random.randint(40, 70)}%',
-                'UDP': f'{random.randint(20, 40)}%',
-                'ICMP': f'{random.randint(5, 15)}%',
-                'Other': f'{random.randint(1, 5)}%'
-            },
-            'malformed_packets': random.randint(1000, 10000),
-            'fragmented_packets': random.randint(500, 5000)
-        })
+        results.append(ProtocolAnalysis(
+            protocols={name: f'{share}%' for name, share in zip(PROTOCOLS, v['protocol_shares'])},
+            malformed_packets=v['malformed'],
+            fragmented_packets=v['fragmented']
+        ))
 
         # 6. Infrastructure Impact Assessment
-        results.append({
-            'type': 'impact_assessment',
-            'severity_level': random.choice(['Critical', 'High', 'Medium']),
-            'estimated_downtime': f'{random.randint(0, 120)} minutes',
-            'affected_services': ['HTTP/HTTPS', 'DNS', 'SSH', 'Database'],
-            'cpu_usage': f'{random.randint(70, 99)}%',
-            'memory_usage': f'{random.randint(60, 95)}%',
-            'bandwidth_utilization': f'{random.randint(80, 100)}%',
-            'connection_queue_size': random.randint(10000, 100000),
-            'dropped_packets': random.randint(50000, 500000)
-        })
+        results.append(ImpactAssessment(
+            severity_level=v['severity'],
+            estimated_downtime=f"{v['downtime_min']} minutes",
+            affected_services=['HTTP/HTTPS', 'DNS', 'SSH', 'Database'],
+            cpu_usage=f"{v['cpu']}%",
+            memory_usage=f"{v['memory']}%",
+            bandwidth_utilization=f"{v['bandwidth']}%",
+            connection_queue_size=v['queue'],
+            dropped_packets=v['dropped']
+        ))
 
         # 7. Botnet Fingerprinting
-        results.append({
-            'type': 'botnet_analysis',
-            'botnet_detected': True,
-            'suspected_botnet': random.choice(['Mirai', 'Bashlite', 'Gafgyt', 'Hoaxcalls', 'Unknown']),
-            'bot_characteristics': {
-                'user_agents': random.randint(5, 50),
+        results.append(BotnetAnalysis(
+            botnet_detected=True,
+            suspected_botnet=v['botnet'],
+            bot_characteristics={
+                'user_agents': v['user_agents'],
                 'attack_patterns': 'Coordinated timing',
                 'command_and_control': 'Multiple C2 servers detected',
-                'bot_sophistication': random.choice(['Low', 'Medium', 'High'])
+                'bot_sophistication': v['sophistication']
             }
-        })
+        ))
 
         # 8. Mitigation Recommendations
-        mitigation_active = random.sample(self.mitigation_services, k=2)
-        results.append({
-            'type': 'mitigation_recommendations',
-            'immediate_actions': [
+        results.append(MitigationRecommendations(
+            immediate_actions=[
                 'Enable rate limiting on all public endpoints',
                 'Activate upstream ISP DDoS mitigation',
                 'Deploy Web Application Firewall (WAF)',
@@ -166,50 +277,44 @@ class DDOSIntel:
                 'Scale infrastructure horizontally',
                 'Contact DDoS mitigation service provider'
             ],
-            'recommended_services': mitigation_active,
-            'firewall_rules': [
+            recommended_services=v['mitigation'],
+            firewall_rules=[
                 'Block suspicious ASNs',
                 'Rate limit per source IP',
                 'Drop malformed packets',
                 'Implement SYN cookies'
             ],
-            'estimated_mitigation_time': f'{random.randint(5, 30)} minutes'
-        })
+            estimated_mitigation_time=f"{v['mitigation_min']} minutes"
+        ))
 
         # 9. Historical Pattern Analysis
-        attack_history = []
-        for i in range(5):
-            past_date = now - timedelta(days=random.randint(1, 30))
-            attack_history.append({
-                'date': past_date.strftime('%Y-%m-%d'),
-                'duration': f'{random.randint(10, 240)} minutes',
-                'peak_rps': random.randint(10000, 80000),
-                'vector': random.choice(self.attack_vectors)
-            })
+        attack_history = [{
+            'date': (now - timedelta(days=days_ago)).strftime('%Y-%m-%d'),
+            'duration': f'{minutes} minutes',
+            'peak_rps': peak,
+            'vector': vector
+        } for days_ago, minutes, peak, vector in v['history']]
         
-        results.append({
-            'type': 'historical_analysis',
-            'previous_attacks': len(attack_history),
-            'attack_history': attack_history,
-            'pattern': 'Increasing frequency and intensity',
-            'likely_targeted': True
-        })
+        results.append(HistoricalAnalysis(
+            previous_attacks=len(attack_history),
+            attack_history=attack_history,
+            pattern='Increasing frequency and intensity',
+            likely_targeted=True
+        ))
 
         # 10. Cost & Damage Estimation
-        results.append({
-            'type': 'cost_estimation',
-            'estimated_costs': {
-                'bandwidth_overage': f'${random.randint(500, 5000)}',
-                'service_downtime': f'${random.randint(1000, 50000)}',
-                'mitigation_services': f'${random.randint(200, 2000)}',
-                'incident_response': f'${random.randint(500, 5000)}',
-                'total_estimated': f'${random.randint(2200, 62000)}'
+        bandwidth, downtime, mitigation, response = v['costs']
+        results.append(CostEstimation(
+            estimated_costs={
+                'bandwidth_overage': f'${bandwidth}',
+                'service_downtime': f'${downtime}',
+                'mitigation_services': f'${mitigation}',
+                'incident_response': f'${response}',
+                'total_estimated': f'${bandwidth + downtime + mitigation + response}'
             },
-            'reputation_impact': random.choice(['Low', 'Medium', 'High']),
-            'customer_impact': f'{random.randint(100, 10000)} users affected'
-        })
-
-        print(f"[ddos_intel] Analysis complete. Generated {len(results)} data points")
+            reputation_impact=v['reputation'],
+            customer_impact=f"{v['customers']} users affected"
+        ))
         return results
 
     def _resolve_target(self, target):
@@ -219,147 +324,38 @@ class DDOSIntel:
             return True, target
         except socket.error:
             try:
-                resolved = socket.gethostbyname(target)
-                return False, resolved
+                # Recorded (failures as None) and replayed like HTTP, so replays stay offline
+                return False, cassette.call('dns', target, lambda: self._lookup(target))
             except socket.error:
                 return False, None
 
+    @staticmethod
+    def _lookup(target):
+        try:
+            return dns_cache.gethostbyname(target)
+        except socket.error:
+            return None
+
     def _perform_localhost_stress_test(self, target):
         """Perform actual stress tests on localhost for load testing.
         
+        The phases come from the scenario file (see ``stress_scenarios``).
+        
         Args:
             target: Must be 127.0.0.1 or localhost
             
         Returns:
             list: Results from multiple stress test scenarios
         """
-        results = []
-        simulator = LocalhostStressSimulator()
+        scenario = load_scenario(self.scenario_path)
         
         print("[ddos_intel] ═══════════════════════════════════════════════════")
         print("[ddos_intel] LOCALHOST STRESS TEST - Educational/Load Testing")
         print("[ddos_intel] Target: 127.0.0.1 (localhost only)")
+        print(f"[ddos_intel] Scenario: {scenario['name']} ({len(scenario['phases'])} phases)")
         print("[ddos_intel] ═══════════════════════════════════════════════════")
         
-        # Test configuration
-        test_port = 5000  # Flask default port
-        test_duration = 5  # Short tests
-        
-        results.append({
-            'type': 'stress_test_info',
-            'target': target,
-            'scope': 'localhost_only',
-            'purpose': 'Load testing and traffic pattern simulation',
-            'test_port': test_port,
-            'disclaimer': 'Tests restricted to 127.0.0.1 for safety'
-        })
-        
-        # Test 1: SYN Flood Simulation
-        print(f"\n[ddos_intel] Test 1/5: SYN Flood Pattern")
-        try:
-            syn_report = simulator.simulate_syn_flood(
-                port=test_port, 
-                duration=test_duration, 
-                rate=50
-            )
-            results.append(syn_report)
-        except Exception as e:
-            results.append({
-                'type': 'stress_test_error',
-                'test': 'SYN Flood',
-                'error': str(e)
-            })
-        
-        # Reset stats
-        simulator.stats = {
-            'packets_sent': 0,
-            'connections_made': 0,
-            'errors': 0,
-            'start_time': None,
-            'end_time': None
-        }
-        
-        # Test 2: UDP Flood Simulation
-        print(f"\n[ddos_intel] Test 2/5: UDP Flood Pattern")
-        try:
-            udp_report = simulator.simulate_udp_flood(
-                port=test_port, 
-                duration=test_duration, 
-                packet_size=512,
-                rate=100
-            )
-            results.append(udp_report)
-        except Exception as e:
-            results.append({
-                'type': 'stress_test_error',
-                'test': 'UDP Flood',
-                'error': str(e)
-            })
-        
-        # Reset stats
-        simulator.stats = {
-            'packets_sent': 0,
-            'connections_made': 0,
-            'errors': 0,
-            'start_time': None,
-            'end_time': None
-        }
-        
-        # Test 3: HTTP Flood Simulation
-        print(f"\n[ddos_intel] Test 3/5: HTTP Flood Pattern")
-        try:
-            http_report = simulator.simulate_http_flood(
-                port=test_port,
-                duration=test_duration,
-                rate=30
-            )
-            results.append(http_report)
-        except Exception as e:
-            results.append({
-                'type': 'stress_test_error',
-                'test': 'HTTP Flood',
-                'error': str(e)
-            })
-        
-        # Reset stats
-        simulator.stats = {
-            'packets_sent': 0,
-            'connections_made': 0,
-            'errors': 0,
-            'start_time': None,
-            'end_time': None
-        }
-        
-        # Test 4: Slowloris Simulation
-        print(f"\n[ddos_intel] Test 4/5: Slowloris Pattern")
-        try:
-            slowloris_report = simulator.simulate_slowloris(
-                port=test_port,
-                duration=test_duration,
-                connections=20
-            )
-            results.append(slowloris_report)
-        except Exception as e:
-            results.append({
-                'type': 'stress_test_error',
-                'test': 'Slowloris',
-                'error': str(e)
-            })
-        
-        # Summary
-        results.append({
-            'type': 'stress_test_summary',
-            'total_tests_run': 4,
-            'target': '127.0.0.1',
-            'total_duration': f'{test_duration * 4} seconds',
-            'recommendations': [
-                'Monitor application performance during load',
-                'Check connection pooling and timeout settings',
-                'Verify rate limiting is working correctly',
-                'Review server resource usage (CPU, memory, connections)',
-                'Test with production-like traffic patterns'
-            ]
-        })
+        results = run_scenario(scenario, target)
         
         print("\n[ddos_intel] ═══════════════════════════════════════════════════")
         print("[ddos_intel] Stress tests complete!")
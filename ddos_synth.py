@@ -0,0 +1,199 @@
+"""Bulk synthesis of simulated DDoS data with NumPy, for UI and demo datasets.
+
+``draw_many`` draws the figures of N reports as whole arrays (one vectorised
+call per field instead of dozens of ``random`` calls per report) under the
+same consistency rules as ``DDOSIntel.draw``; reports are then laid out by
+``DDOSIntel.layout`` so they look exactly like scan results.
+``traffic_series`` builds long per-second traffic series (RPS, bandwidth,
+protocol mix) as arrays. Everything is deterministic for a given seed.
+
+Usage:
+    python ddos_synth.py reports -n 10000 --seed 1 --out simulated.jsonl
+    python ddos_synth.py series --seconds 86400 --seed 1 --out traffic.csv
+"""
+import json
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+import records
+from ddos_intel import (DDOSIntel, ATTACK_VECTORS, MITIGATION_SERVICES, PROTOCOLS,
+                        SEVERITY_LEVELS, BOTNETS, LEVELS)
+
+CHUNK = 4096  # reports per generator, see draw_many
+
+
+def split_percentages_array(weights):
+    """Row-wise integer percentages of an (n, k) weight array, each row summing to 100."""
+    weights = np.asarray(weights, dtype=np.float64)
+    raw = weights * 100.0 / weights.sum(axis=1, keepdims=True)
+    shares = np.floor(raw).astype(np.int64)
+    missing = 100 - shares.sum(axis=1)
+    # Hand the missing points to the largest remainders, as split_percentages does
+    order = np.argsort(-(raw - shares), axis=1, kind='stable')
+    ranks = np.argsort(order, axis=1, kind='stable')
+    shares += ranks < missing[:, None]
+    return shares
+
+
+def _between(rng, low, high, n):
+    """Uniform integers in [low, high] inclusive; bounds may be arrays."""
+    return rng.integers(low, np.asarray(high) + 1, size=n)
+
+
+def _pick(rng, options, n):
+    return np.asarray(options, dtype=object)[rng.integers(0, len(options), size=n)]
+
+
+def _sample_rows(rng, options, n, k):
+    """k distinct options per row (first k of a per-row permutation)."""
+    order = rng.permuted(np.tile(np.arange(len(options)), (n, 1)), axis=1)[:, :k]
+    return np.asarray(options, dtype=object)[order]
+
+
+def draw_many(n, seed=0):
+    """Figures of ``n`` reports (list of dicts shaped like ``DDOSIntel.draw``).
+
+    Reports are drawn in fixed-size chunks with one generator per chunk, so
+    report i is the same for a given seed however many are requested.
+    """
+    drawn = []
+    for chunk, start in enumerate(range(0, n, CHUNK)):
+        block = _draw_block(np.random.default_rng([seed, chunk]), CHUNK)
+        drawn.extend(block[:n - start])
+    return drawn
+
+
+def _draw_block(rng, n):
+    primary_packets = _between(rng, 50000, 500000, n)
+    primary_gbps = _between(rng, 5, 50, n)
+    tor, cloud, proxy = _between(rng, 5, 50, n), _between(rng, 100, 1000, n), _between(rng, 500, 5000, n)
+    current = _between(rng, 8000, 25000, n)
+    shares = split_percentages_array(np.column_stack([
+        _between(rng, 40, 70, n), _between(rng, 20, 40, n), _between(rng, 5, 15, n), _between(rng, 1, 5, n)]))
+    vector_count = _between(rng, 2, 4, n)
+    vectors = _sample_rows(rng, ATTACK_VECTORS, n, 4)
+    days = np.sort(_between(rng, 1, 30, (n, 5)), axis=1)
+    costs = np.column_stack([_between(rng, 500, 5000, n), _between(rng, 1000, 50000, n),
+                             _between(rng, 200, 2000, n), _between(rng, 500, 5000, n)])
+    columns = {
+        'baseline_rps': _between(rng, 500, 2000, n),
+        'current_rps': current,
+        'peak_rps': _between(rng, np.maximum(30000, current), 100000, n),
+        'primary_packets': primary_packets,
+        'primary_gbps': primary_gbps,
+        'secondary_packets': _between(rng, 10000, np.minimum(100000, primary_packets), n),
+        'secondary_gbps': _between(rng, 1, np.minimum(10, primary_gbps), n),
+        'unique_ips': _between(rng, np.maximum(5000, tor + cloud + proxy), 50000, n),
+        'asn_count': _between(rng, 50, 200, n),
+        'tor_exits': tor,
+        'cloud_ips': cloud,
+        'proxy_ips': proxy,
+        'malformed': _between(rng, 1000, 10000, n),
+        'fragmented': _between(rng, 500, 5000, n),
+        'severity': _pick(rng, SEVERITY_LEVELS, n),
+        'downtime_min': _between(rng, 0, 120, n),
+        'cpu': _between(rng, 70, 99, n),
+        'memory': _between(rng, 60, 95, n),
+        'bandwidth': _between(rng, 80, 100, n),
+        'queue': _between(rng, 10000, 100000, n),
+        'dropped': _between(rng, 50000, 500000, n),
+        'botnet': _pick(rng, BOTNETS, n),
+        'user_agents': _between(rng, 5, 50, n),
+        'sophistication': _pick(rng, LEVELS, n),
+        'mitigation_min': _between(rng, 5, 30, n),
+        'reputation': _pick(rng, LEVELS, n),
+        'customers': _between(rng, 100, 10000, n),
+    }
+    mitigation = _sample_rows(rng, MITIGATION_SERVICES, n, 2).tolist()
+    history = list(zip(days.tolist(), _between(rng, 10, 240, (n, 5)).tolist(),
+                       _between(rng, 10000, 80000, (n, 5)).tolist(), _pick(rng, ATTACK_VECTORS, (n, 5)).tolist()))
+    # One conversion per column back to Python scalars, then one dict per report
+    names = list(columns)
+    rows = zip(*(columns[name].tolist() for name in names))
+    vectors, vector_count = vectors.tolist(), vector_count.tolist()
+    shares, costs = shares.tolist(), costs.tolist()
+    drawn = []
+    for i, row in enumerate(rows):
+        v = dict(zip(names, row))
+        v['vectors'] = vectors[i][:vector_count[i]]
+        v['protocol_shares'] = shares[i]
+        v['mitigation'] = mitigation[i]
+        v['history'] = list(zip(*history[i]))
+        v['costs'] = costs[i]
+        drawn.append(v)
+    return drawn
+
+
+def generate_reports(n, seed=0, now=None, targets=None):
+    """``n`` simulated (target, records) pairs; targets default to documentation IPs."""
+    now = now or datetime.utcnow()
+    targets = targets or [f'198.51.100.{i % 254 + 1}' if i < 254 else f'sim-{i}.example' for i in range(n)]
+    layout = DDOSIntel().layout
+    return [(target, layout(target, True, target, now, v)) for target, v in zip(targets, draw_many(n, seed))]
+
+
+def traffic_series(seconds, seed=0, baseline_rps=1000, peak_rps=50000, attack_start=None, attack_seconds=None):
+    """Per-second traffic around one attack window, as NumPy arrays.
+
+    Returns ``{'rps': int64[seconds], 'bandwidth_mbps': float32[seconds],
+    'protocol_mix': int8[seconds, 4]}``; the mix columns follow ``PROTOCOLS``
+    and each row sums to 100.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds, dtype=np.float64)
+    attack_start = seconds // 3 if attack_start is None else attack_start
+    attack_seconds = max(1, seconds // 4 if attack_seconds is None else attack_seconds)
+    # Daily cycle plus noise for normal traffic
+    base = baseline_rps * (1.0 + 0.3 * np.sin(2 * np.pi * t / 86400.0)) * rng.lognormal(0.0, 0.1, seconds)
+    # Attack intensity: fast ramp up, plateau, slower decay (0..1)
+    rel = (t - attack_start) / attack_seconds
+    shape = np.clip(np.minimum(rel * 10.0, 1.0), 0.0, 1.0) * np.where(rel > 1.0, np.exp(-(rel - 1.0) * 5.0), 1.0)
+    shape[rel < 0] = 0.0
+    attack = (peak_rps - baseline_rps) * shape * rng.uniform(0.85, 1.0, seconds)
+    rps = np.maximum(0, np.rint(base + attack)).astype(np.int64)
+    packet_bytes = rng.normal(800.0, 120.0, seconds).clip(64, 1500)
+    bandwidth = (rps * packet_bytes * 8 / 1e6).astype(np.float32)
+    normal_mix = np.array([70.0, 25.0, 4.0, 1.0])
+    attack_mix = np.array([45.0, 40.0, 13.0, 2.0])
+    weights = normal_mix + (attack_mix - normal_mix) * shape[:, None]
+    weights = weights * rng.uniform(0.9, 1.1, (seconds, len(PROTOCOLS)))
+    mix = split_percentages_array(weights).astype(np.int8)
+    return {'rps': rps, 'bandwidth_mbps': bandwidth, 'protocol_mix': mix}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate simulated DDoS datasets')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rep = sub.add_parser('reports', help='N simulated DDoS reports as JSON lines')
+    rep.add_argument('-n', type=int, default=1000)
+    rep.add_argument('--seed', type=int, default=0)
+    rep.add_argument('--out', default='simulated_ddos.jsonl')
+    ser = sub.add_parser('series', help='Per-second traffic series as CSV')
+    ser.add_argument('--seconds', type=int, default=3600)
+    ser.add_argument('--seed', type=int, default=0)
+    ser.add_argument('--baseline-rps', type=int, default=1000)
+    ser.add_argument('--peak-rps', type=int, default=50000)
+    ser.add_argument('--out', default='traffic_series.csv')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == 'reports':
+        with open(args.out, 'w') as f:
+            for target, results in generate_reports(args.n, args.seed):
+                f.write(json.dumps({'target_type': 'ddos', 'target': target, 'results': records.dump(results),
+                                     'results_version': records.VERSION}) + '\n')
+        count = args.n
+    else:
+        series = traffic_series(args.seconds, args.seed, args.baseline_rps, args.peak_rps)
+        table = np.column_stack([np.arange(args.seconds), series['rps'], series['bandwidth_mbps'],
+                                 series['protocol_mix']])
+        header = 'second,rps,bandwidth_mbps,' + ','.join(p.lower() + '_pct' for p in PROTOCOLS)
+        np.savetxt(args.out, table, delimiter=',', header=header, comments='',
+                   fmt=['%d', '%d', '%.2f'] + ['%d'] * len(PROTOCOLS))
+        count = args.seconds
+    print(f'[ddos_synth] Wrote {count} {args.command} to {args.out} in {time.perf_counter() - started:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
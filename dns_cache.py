@@ -0,0 +1,274 @@
+"""Process-wide DNS resolution cache.
+
+Every HTTP collector request, the DDoS target resolution and the localhost
+stress-test validation used to resolve hostnames from scratch.
+``DNSCache`` keeps answers for their TTL. With dnspython installed that is
+the record TTL, capped at ``DNS_CACHE_MAX_TTL``; otherwise it is
+``DNS_CACHE_TTL``, because the system resolver does not report TTLs.
+Names that do not exist are remembered for ``DNS_NEGATIVE_TTL`` seconds.
+Concurrent lookups of the same name wait for one resolver call instead of
+each making their own (``coalesced`` in the statistics).
+
+``install()`` routes urllib3 connections (and so every ``requests`` session)
+through the shared cache; collectors.py calls it. TLS still verifies
+against the hostname, only the address lookup is cached. ``DNS_CACHE=0``
+turns caching off. Lookups are counted by result in /metrics as
+``inteltrace_dns_lookups_total`` (hit, negative_hit, coalesced, miss,
+error) and in the ``dns`` cache hit ratio.
+
+Usage:
+    python dns_cache.py resolve example.com github.com --repeat 3
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from collections import OrderedDict
+import metrics
+
+try:
+    import dns.resolver as dns_resolver
+except ImportError:  # fall back to the system resolver with a fixed TTL
+    dns_resolver = None
+
+ENABLED = os.getenv('DNS_CACHE', '1') != '0'
+TTL = float(os.getenv('DNS_CACHE_TTL', '60'))
+MAX_TTL = float(os.getenv('DNS_CACHE_MAX_TTL', '3600'))
+NEGATIVE_TTL = float(os.getenv('DNS_NEGATIVE_TTL', '30'))
+SIZE = int(os.getenv('DNS_CACHE_SIZE', '1024'))
+LOOKUP_TIMEOUT = 5.0
+
+# Only definite answers are cached as negative; a timed-out resolver is retried
+_NEGATIVE_ERRORS = {getattr(socket, name) for name in ('EAI_NONAME', 'EAI_NODATA') if hasattr(socket, name)}
+
+
+def is_address(host):
+    """True for IPv4/IPv6 literals, which need no lookup."""
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            continue
+    return False
+
+
+def _system_lookup(host, family):
+    addresses = []
+    for info in socket.getaddrinfo(host, None, family, socket.SOCK_STREAM):
+        if info[4][0] not in addresses:
+            addresses.append(info[4][0])
+    return addresses, TTL
+
+
+def _dnspython_lookup(host, family):
+    rdtypes = {socket.AF_INET: ('A',), socket.AF_INET6: ('AAAA',)}.get(family, ('A', 'AAAA'))
+    addresses, ttl = [], None
+    for rdtype in rdtypes:
+        try:
+            answer = dns_resolver.resolve(host, rdtype, lifetime=LOOKUP_TIMEOUT)
+        except Exception:
+            continue
+        addresses.extend(record.address for record in answer)
+        ttl = answer.rrset.ttl if ttl is None else min(ttl, answer.rrset.ttl)
+    if not addresses:
+        return None
+    return addresses, min(float(ttl), MAX_TTL)
+
+
+class DNSCache:
+    """TTL cache of hostname -> addresses with negative caching and coalescing."""
+
+    def __init__(self, size=SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counts = {'hit': 0, 'negative_hit': 0, 'coalesced': 0, 'miss': 0, 'error': 0, 'eviction': 0}
+
+    def _lookup(self, host, family):
+        """(addresses, ttl) from the resolver; raises socket.gaierror."""
+        if dns_resolver is not None and host != 'localhost':
+            found = _dnspython_lookup(host, family)
+            if found:
+                return found
+        # Also covers /etc/hosts names that dnspython does not see
+        return _system_lookup(host, family)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.counts['eviction'] += 1
+
+    def _error(self):
+        with self._lock:
+            self.counts['error'] += 1
+        metrics.DNS_LOOKUPS.inc(result='error')
+
+    def _fresh(self, key):
+        """The unexpired entry for ``key``, or None; caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def resolve(self, host, family=socket.AF_UNSPEC):
+        """Addresses for ``host`` (list of str); raises socket.gaierror like getaddrinfo."""
+        if is_address(host):
+            return [host]
+        key = (host.lower().rstrip('.'), family)
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                result = 'negative_hit' if entry[2] is not None else 'hit'
+            else:
+                waiter = self._inflight.get(key)
+                leader = waiter is None
+                if leader:
+                    waiter = self._inflight[key] = {'done': threading.Event()}
+                result = 'miss' if leader else 'coalesced'
+            self.counts[result] += 1
+        metrics.DNS_LOOKUPS.inc(result=result)
+        # A coalesced lookup costs no resolver call, so it counts as a hit
+        metrics.cache_lookup('dns', result != 'miss')
+        if entry is not None:
+            if entry[2] is not None:
+                raise socket.gaierror(*entry[2])
+            return list(entry[1])
+        if not leader:
+            waiter['done'].wait()
+            if 'error' in waiter:
+                raise socket.gaierror(*waiter['error'])
+            return list(waiter['addresses'])
+
+        try:
+            addresses, ttl = self._lookup(key[0], family)
+            waiter['addresses'] = addresses
+            self._store(key, (time.monotonic() + ttl, tuple(addresses), None))
+            return list(addresses)
+        except socket.gaierror as e:
+            waiter['error'] = e.args
+            self._error()
+            if e.args and e.args[0] in _NEGATIVE_ERRORS:
+                self._store(key, (time.monotonic() + NEGATIVE_TTL, (), e.args))
+            raise
+        except Exception as e:
+            waiter['error'] = (socket.EAI_FAIL, str(e))
+            self._error()
+            raise socket.gaierror(socket.EAI_FAIL, str(e))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter['done'].set()
+
+    async def resolve_async(self, host, family=socket.AF_UNSPEC):
+        """``resolve`` for asyncio code: cache hits return at once, misses run in the default executor."""
+        with self._lock:
+            cached = is_address(host) or self._fresh((host.lower().rstrip('.'), family)) is not None
+        if cached:
+            return self.resolve(host, family)
+        return await asyncio.get_running_loop().run_in_executor(None, self.resolve, host, family)
+
+    def gethostbyname(self, host):
+        """First IPv4 address of ``host``, like socket.gethostbyname."""
+        return self.resolve(host, socket.AF_INET)[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return dict(self.counts, size=len(self._entries),
+                        negative_entries=sum(1 for e in self._entries.values() if e[2] is not None and e[0] > now),
+                        backend='dnspython' if dns_resolver is not None else 'system')
+
+
+SHARED = DNSCache()
+
+
+def resolve(host, family=socket.AF_UNSPEC):
+    if not ENABLED:
+        return _system_lookup(host, family)[0] if not is_address(host) else [host]
+    return SHARED.resolve(host, family)
+
+
+async def resolve_async(host, family=socket.AF_UNSPEC):
+    if not ENABLED:
+        return await asyncio.get_running_loop().run_in_executor(None, resolve, host, family)
+    return await SHARED.resolve_async(host, family)
+
+
+def gethostbyname(host):
+    return resolve(host, socket.AF_INET)[0]
+
+
+def stats():
+    return SHARED.stats()
+
+
+def _connect_any(host, port, connect):
+    """Try each cached address of ``host`` in turn with ``connect((ip, port))``."""
+    last_error = None
+    for ip in resolve(host):
+        try:
+            return connect((ip, port))
+        except OSError as e:
+            last_error = e
+    raise last_error or OSError(f'no addresses for {host}')
+
+
+def create_connection(address, *args, **kwargs):
+    """socket.create_connection with the host looked up through the cache."""
+    host, port = address
+    return _connect_any(host, port, lambda target: socket.create_connection(target, *args, **kwargs))
+
+
+_installed = False
+
+
+def install():
+    """Make urllib3 (and so every requests session) resolve through the shared cache."""
+    global _installed
+    if _installed or not ENABLED:
+        return
+    import urllib3.util.connection as urllib3_connection
+    original = urllib3_connection.create_connection
+
+    def cached_create_connection(address, *args, **kwargs):
+        host, port = address
+        return _connect_any(host.strip('[]'), port, lambda target: original(target, *args, **kwargs))
+
+    urllib3_connection.create_connection = cached_create_connection
+    _installed = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve hostnames through the DNS cache and print its statistics')
+    sub = parser.add_subparsers(dest='command', required=True)
+    res = sub.add_parser('resolve', help='Resolve hosts (repeatedly) and show the timings')
+    res.add_argument('hosts', nargs='+')
+    res.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    for round_ in range(args.repeat):
+        for host in args.hosts:
+            start = time.perf_counter()
+            try:
+                answer = ', '.join(resolve(host))
+            except socket.gaierror as e:
+                answer = f'error: {e}'
+            print(f'[dns] #{round_ + 1} {host:<30} {round((time.perf_counter() - start) * 1000, 2):>8} ms  {answer}')
+    print(json.dumps(stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
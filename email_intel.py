@@ -3,33 +3,44 @@ import requests
 import os
 from urllib.parse import urljoin
 from dotenv import load_dotenv
+from timeline_builder import step
+import cassette
+from records import EmailResult
 
 load_dotenv()
+HIBP_URL = os.getenv('HIBP_URL', 'https://haveibeenpwned.com')
 
 
 class EmailIntel:
-    def __init__(self, use_tor=False):
-        self.session = requests.Session()
+    def __init__(self, use_tor=False, hibp_url=None):
+        self.session = cassette.mount(requests.Session())
+        self.hibp_url = (hibp_url or HIBP_URL).rstrip('/')
 
     def breach_check(self, email):
+        """Breaches for ``email``: [] when it has none, None when the lookup failed."""
         # Uses haveibeenpwned API pattern but without API key here.
         # This is a placeholder; production should use HIBP API with key.
         try:
-            url = f'https://haveibeenpwned.com/api/v3/breachedaccount/{email}'
-            r = self.session.get(url, timeout=10, headers={'User-Agent': 'IntelTrace'})
-            if r.status_code == 200:
-                return r.json()
-            return []
+            url = f'{self.hibp_url}/api/v3/breachedaccount/{email}'
+            with step('email', 'hibp') as outcome:
+                r = self.session.get(url, timeout=10, headers={'User-Agent': 'IntelTrace'})
+                if r.status_code == 200:
+                    return r.json()
+                if r.status_code == 404:
+                    return []
+                outcome.fail(f'http_{r.status_code}')
+            return None
         except Exception:
-            return []
+            return None
 
     def domain_reputation(self, domain):
         # Basic WHOIS + DNS reputation placeholder
         return {'domain': domain, 'reputation': 'unknown'}
 
     def collect(self, email):
-        data = {}
+        data = EmailResult()
         domain = email.split('@')[-1]
-        data['breaches'] = self.breach_check(email)
-        data['domain_reputation'] = self.domain_reputation(domain)
+        data.breaches = self.breach_check(email)
+        with step('email', 'domain_reputation'):
+            data.domain_reputation = self.domain_reputation(domain)
         return data
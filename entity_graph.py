@@ -0,0 +1,340 @@
+"""Cross-case entity graph: links cases that share IPs, ASNs, emails, usernames, hashes.
+
+Entities are extracted from each case's collector results when the case is saved
+and appended to a small JSON-lines index, so adjacency is maintained incrementally
+instead of rescanning every report. The graph is bipartite: case ids on one side,
+``kind:value`` entity keys (e.g. ``ip:8.8.8.8``, ``asn:AS15169``) on the other.
+"""
+import os
+import re
+import json
+import glob
+import argparse
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+import shared_files
+
+ENTITY_KINDS = ('ip', 'asn', 'email', 'domain', 'username', 'url', 'image_hash', 'phone')
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+ASN_RE = re.compile(r'\bAS\d+\b', re.IGNORECASE)
+IPV4_RE = re.compile(r'^\d{1,3}(?:\.\d{1,3}){3}$')
+
+
+def _key(kind, value):
+    value = str(value).strip()
+    if not value:
+        return None
+    if kind == 'asn':
+        return f'{kind}:{value.upper()}'
+    if kind == 'url':
+        value = value.rstrip('/')
+    if kind != 'image_hash':
+        value = value.lower()
+    return f'{kind}:{value}'
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+def _ip_entities(target, results):
+    found = [('ip', target)]
+    if not isinstance(results, dict):
+        return found
+    info = results.get('ipinfo') or {}
+    if isinstance(info, dict):
+        if info.get('ip'):
+            found.append(('ip', info['ip']))
+        if info.get('hostname'):
+            found.append(('domain', info['hostname']))
+        for asn in ASN_RE.findall(str(info.get('org') or '')):
+            found.append(('asn', asn))
+    whois_data = results.get('whois') or {}
+    if isinstance(whois_data, dict):
+        for email in _as_list(whois_data.get('emails')):
+            found.append(('email', email))
+        for domain in _as_list(whois_data.get('domain_name')):
+            found.append(('domain', domain))
+    return found
+
+
+def _email_entities(target, results):
+    found = [('email', target), ('domain', target.split('@')[-1])]
+    if not isinstance(results, dict):
+        return found
+    for breach in results.get('breaches') or []:
+        if isinstance(breach, dict) and breach.get('Domain'):
+            found.append(('domain', breach['Domain']))
+    return found
+
+
+def _username_entities(target, results):
+    found = [('username', target)]
+    for item in results if isinstance(results, list) else []:
+        if isinstance(item, dict) and item.get('exists') and item.get('url'):
+            found.append(('url', item['url']))
+    return found
+
+
+def _phone_entities(target, results):
+    if isinstance(results, dict) and results.get('number'):
+        return [('phone', results['number'])]
+    return [('phone', target)]
+
+
+def _photo_entities(target, results):
+    found = []
+    for item in results if isinstance(results, list) else []:
+        if not isinstance(item, dict):
+            continue
+        kind = item.get('type')
+        if kind == 'image_hash' and item.get('hash'):
+            found.append(('image_hash', f"{item.get('algorithm', 'sha256')}:{item['hash']}"))
+        elif kind == 'image_source' and item.get('url'):
+            found.append(('url', item['url']))
+        elif kind == 'social_media_match' and item.get('profile_url'):
+            found.append(('url', item['profile_url']))
+    return found
+
+
+def _ddos_entities(target, results):
+    found = [('ip' if IPV4_RE.match(target) else 'domain', target)]
+    for item in results if isinstance(results, list) else []:
+        if isinstance(item, dict) and item.get('type') == 'target_info' and item.get('resolved_ip'):
+            found.append(('ip', item['resolved_ip']))
+    return found
+
+
+EXTRACTORS = {
+    'ip': _ip_entities,
+    'email': _email_entities,
+    'phone': _phone_entities,
+    'username': _username_entities,
+    'photo': _photo_entities,
+    'ddos': _ddos_entities,
+}
+
+
+def extract_entities(case):
+    """Return the sorted entity keys referenced by a case."""
+    extractor = EXTRACTORS.get(case.get('target_type'))
+    if not extractor:
+        return []
+    target = str(case.get('target') or '')
+    keys = set()
+    for kind, value in extractor(target, case.get('results')):
+        if kind == 'url':
+            host = urlparse(str(value)).hostname
+            if host:
+                keys.add(_key('domain', host))
+        if kind == 'email' and not EMAIL_RE.fullmatch(str(value).strip()):
+            continue
+        keys.add(_key(kind, value))
+    keys.discard(None)
+    return sorted(keys)
+
+
+class EntityGraph:
+    """Incrementally maintained case <-> entity adjacency index."""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.index_path = os.path.join(index_dir, 'entities.jsonl')
+        os.makedirs(index_dir, exist_ok=True)
+        self.case_entities = {}
+        self.entity_cases = defaultdict(set)
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_dir(cls, index_dir):
+        """Return the process-wide graph for an index directory."""
+        path = os.path.abspath(index_dir)
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(index_dir)
+            return cls._instances[path]
+
+    def _link(self, case_id, entities):
+        for entity in self.case_entities.pop(case_id, ()):
+            cases = self.entity_cases.get(entity)
+            if cases is not None:
+                cases.discard(case_id)
+                if not cases:
+                    del self.entity_cases[entity]
+        self.case_entities[case_id] = set(entities)
+        for entity in entities:
+            self.entity_cases[entity].add(case_id)
+
+    def refresh(self):
+        """Apply index lines appended since the last read (possibly by other processes)."""
+        with self._lock:
+            current = shared_files.identity(self.index_path)
+            if current is None:
+                return
+            inode, size = current
+            if inode != self._inode or size < self._offset:
+                # Index was rebuilt (replaced) underneath us
+                self.case_entities.clear()
+                self.entity_cases.clear()
+                self._offset = 0
+                self._inode = inode
+            if size == self._offset:
+                return
+            with open(self.index_path, 'rb') as f:
+                f.seek(self._offset)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break
+                    self._offset += len(raw)
+                    try:
+                        entry = json.loads(raw)
+                    except ValueError:
+                        continue
+                    self._link(entry['case_id'], entry.get('entities', []))
+
+    def add_case(self, case):
+        """Index a saved case and return its entity keys."""
+        entities = extract_entities(case)
+        line = json.dumps({'case_id': case['case_id'], 'entities': entities}) + '\n'
+        with self._lock:
+            shared_files.append(self.index_path, line)
+            self.refresh()
+        return entities
+
+    def entities_for(self, case_id):
+        self.refresh()
+        return sorted(self.case_entities.get(case_id, ()))
+
+    def cases_for(self, entity):
+        self.refresh()
+        return sorted(self.entity_cases.get(entity, ()))
+
+    def neighbourhood(self, node, k=2):
+        """Breadth-first k-hop neighbourhood of a case id or entity key.
+
+        Each hop crosses one case/entity edge, so k=2 from a case returns the
+        entities it references and every other case sharing one of them.
+        Returns ``{node: distance}`` excluding the start node.
+        """
+        self.refresh()
+        with self._lock:
+            seen = {node: 0}
+            queue = deque([node])
+            while queue:
+                current = queue.popleft()
+                depth = seen[current]
+                if depth >= k:
+                    continue
+                if current in self.case_entities:
+                    adjacent = self.case_entities[current]
+                else:
+                    adjacent = self.entity_cases.get(current, ())
+                for nxt in adjacent:
+                    if nxt not in seen:
+                        seen[nxt] = depth + 1
+                        queue.append(nxt)
+        del seen[node]
+        return seen
+
+    def shared_entities(self, case_a, case_b):
+        """Entities referenced by both cases."""
+        self.refresh()
+        with self._lock:
+            return sorted(self.case_entities.get(case_a, set()) & self.case_entities.get(case_b, set()))
+
+    def related_cases(self, case_id):
+        """Other cases sharing at least one entity, mapped to the shared entities."""
+        self.refresh()
+        related = defaultdict(list)
+        with self._lock:
+            for entity in self.case_entities.get(case_id, ()):
+                for other in self.entity_cases.get(entity, ()):
+                    if other != case_id:
+                        related[other].append(entity)
+        return {cid: sorted(ents) for cid, ents in related.items()}
+
+    def rebuild(self, reports_dir):
+        """Re-extract entities from every stored case and rewrite the index."""
+        with shared_files.locked(self.index_path):
+            return self._rebuild(reports_dir)
+
+    def ensure(self, reports_dir):
+        """Build the index from the archive if there is none yet; returns the case count, or None if it existed.
+
+        Cases saved before the index existed are found this way without a
+        manual ``rebuild``; with several workers, one builds it and the others
+        wait for it.
+        """
+        if os.path.exists(self.index_path):
+            return None
+        with shared_files.locked(self.index_path):
+            if os.path.exists(self.index_path):
+                self.refresh()
+                return None
+            return self._rebuild(reports_dir)
+
+    def _rebuild(self, reports_dir):
+        tmp_path = shared_files.tmp_path(self.index_path)
+        count = 0
+        with self._lock, shared_files.appends_blocked(self.index_path):
+            self.case_entities.clear()
+            self.entity_cases.clear()
+            with open(tmp_path, 'w') as out:
+                for json_path in glob.glob(os.path.join(reports_dir, '*.json')):
+                    try:
+                        with open(json_path, 'r') as f:
+                            case = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    if 'case_id' not in case:
+                        continue
+                    entities = extract_entities(case)
+                    out.write(json.dumps({'case_id': case['case_id'], 'entities': entities}) + '\n')
+                    self._link(case['case_id'], entities)
+                    count += 1
+            os.replace(tmp_path, self.index_path)
+            self._inode, self._offset = shared_files.identity(self.index_path)
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the IntelTrace cross-case entity graph')
+    parser.add_argument('--reports-dir', default='reports')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help='Rebuild the entity index from all stored cases')
+    p = sub.add_parser('neighbours', help='k-hop neighbourhood of a case id or entity key')
+    p.add_argument('node')
+    p.add_argument('-k', type=int, default=2)
+    p = sub.add_parser('shared', help='Entities shared by two cases')
+    p.add_argument('case_a')
+    p.add_argument('case_b')
+    p = sub.add_parser('related', help='Cases sharing entities with a case')
+    p.add_argument('case_id')
+    args = parser.parse_args()
+
+    graph = EntityGraph.for_dir(os.path.join(args.reports_dir, '_index'))
+    if args.command == 'rebuild':
+        print(f'[graph] Indexed {graph.rebuild(args.reports_dir)} cases')
+    elif args.command == 'neighbours':
+        for node, depth in sorted(graph.neighbourhood(args.node, args.k).items(), key=lambda x: (x[1], x[0])):
+            print(f'{depth}  {node}')
+    elif args.command == 'shared':
+        for entity in graph.shared_entities(args.case_a, args.case_b):
+            print(entity)
+    elif args.command == 'related':
+        for case_id, entities in sorted(graph.related_cases(args.case_id).items()):
+            print(f"{case_id}  {', '.join(entities)}")
+
+
+if __name__ == '__main__':
+    main()
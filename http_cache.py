@@ -0,0 +1,233 @@
+"""HTTP validators, rendered-page caching and compression for the web UI.
+
+Stored cases only change when they are re-saved or re-scored, so pages built
+from them are cached in memory under the case file's content hash, which is
+also sent as a strong ``ETag`` (with ``Last-Modified`` from the file). A
+request revalidating an unchanged page gets a bodiless 304; any other hit
+is served from the cache without re-reading the case or re-rendering the
+template. Bodies are compressed with brotli (when the ``brotli`` package is
+installed) or gzip according to ``Accept-Encoding``, and compressed variants
+are cached alongside the original.
+
+Static assets are pre-compressed next to the originals (``style.css.gz``,
+``style.css.br``) when the UI starts, and the compressed file is served
+directly to clients that accept it.
+
+    python http_cache.py precompress static
+"""
+import os
+import gzip
+import hashlib
+import argparse
+import mimetypes
+import threading
+from collections import OrderedDict
+from flask import request, Response, send_from_directory
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_SIZE = int(os.getenv('UI_PAGE_CACHE_SIZE', '128'))
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+_pages = OrderedDict()
+_hashes = {}
+_lock = threading.Lock()
+
+
+def accepted_encoding(header=None):
+    """'br', 'gzip' or None for an Accept-Encoding header (q=0 means refused)."""
+    header = request.headers.get('Accept-Encoding', '') if header is None else header
+    offered = {}
+    for part in header.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, 6, mtime=0)
+
+
+def file_etag(path):
+    """Content hash of a file, memoised per (path, mtime, size); None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    etag = _hashes.get(key)
+    if etag is None:
+        with open(path, 'rb') as f:
+            etag = hashlib.sha256(f.read()).hexdigest()[:32]
+        with _lock:
+            _hashes[key] = etag
+            if len(_hashes) > CACHE_SIZE * 8:
+                _hashes.pop(next(iter(_hashes)))
+    return etag
+
+
+def listing_etag(directory, suffix='.json'):
+    """(etag, newest mtime) over the files in ``directory``; changes whenever any file does."""
+    digest = hashlib.sha256()
+    newest = 0.0
+    with os.scandir(directory) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.name.endswith(suffix) and entry.is_file():
+                st = entry.stat()
+                digest.update(f'{entry.name}:{st.st_mtime_ns}:{st.st_size};'.encode())
+                newest = max(newest, st.st_mtime)
+    return digest.hexdigest()[:32], newest or None
+
+
+def _cached(key, build):
+    with _lock:
+        body = _pages.get(key)
+        if body is not None:
+            _pages.move_to_end(key)
+    metrics.cache_lookup('ui_page', body is not None)
+    if body is None:
+        body = build()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        with _lock:
+            _pages[key] = body
+            while len(_pages) > CACHE_SIZE:
+                _pages.popitem(last=False)
+    return body
+
+
+def _not_modified(etag, last_modified, encoding):
+    """The validator to echo in a 304, or None when the client's copy is stale."""
+    if request.if_none_match:
+        for tag in (etag, f'{etag}-br', f'{etag}-gzip'):
+            if request.if_none_match.contains(tag):
+                return tag
+        return None
+    since = request.if_modified_since
+    if since is not None and last_modified is not None and int(last_modified) <= since.timestamp():
+        return etag + (f'-{encoding}' if encoding else '')
+    return None
+
+
+def cached_page(name, etag, build, mimetype='text/html', last_modified=None):
+    """Response for a page identified by ``etag``: 304, cached body, or ``build()`` once.
+
+    ``build`` returns the uncompressed body (str or bytes) and is only called
+    on a cache miss, so a hit neither loads the case nor renders a template.
+    """
+    encoding = accepted_encoding()
+    matched = _not_modified(etag, last_modified, encoding)
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        body = _cached((name, etag, None), build)
+        if encoding and len(body) >= MIN_COMPRESS_BYTES:
+            body = _cached((name, etag, encoding), lambda: compress(_cached((name, etag, None), build), encoding))
+            response = Response(body, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            encoding = None
+            response = Response(body, mimetype=mimetype)
+        # Each encoding is a different representation, so it needs its own strong validator
+        response.set_etag(etag + (f'-{encoding}' if encoding else ''))
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_response(response):
+    """after_request hook: compress dynamic text responses the client accepts."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding()
+    data = response.get_data()
+    if not encoding or len(data) < MIN_COMPRESS_BYTES:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+def precompress(static_dir):
+    """Write .gz (and .br) siblings of compressible static files that are stale or missing."""
+    written = 0
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if name.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(root, name)
+            mimetype = mimetypes.guess_type(name)[0] or ''
+            if not mimetype.startswith(COMPRESSIBLE) or os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                continue
+            with open(path, 'rb') as f:
+                data = None
+                for encoding, suffix in SUFFIXES.items():
+                    if encoding == 'br' and brotli is None:
+                        continue
+                    target = path + suffix
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    data = f.read() if data is None else data
+                    packed = brotli.compress(data, quality=11) if encoding == 'br' else gzip.compress(data, 9, mtime=0)
+                    with open(target, 'wb') as out:
+                        out.write(packed)
+                    written += 1
+    return written
+
+
+def send_static(static_dir, filename):
+    """Serve a static file, preferring an up-to-date pre-compressed sibling."""
+    encoding = accepted_encoding()
+    path = os.path.join(static_dir, filename)
+    if encoding and os.path.isfile(path):
+        packed = path + SUFFIXES[encoding]
+        if os.path.isfile(packed) and os.path.getmtime(packed) >= os.path.getmtime(path):
+            response = send_from_directory(static_dir, filename + SUFFIXES[encoding],
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+    response = send_from_directory(static_dir, filename)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-compress static assets for the web UI')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('precompress', help='Write .gz/.br copies of CSS, JS and other text assets')
+    p.add_argument('static_dir', nargs='?', default='static')
+    args = parser.parse_args()
+    print(f'[http_cache] Wrote {precompress(args.static_dir)} compressed assets'
+          f"{'' if brotli else ' (gzip only; pip install brotli for .br)'}")
+
+
+if __name__ == '__main__':
+    main()
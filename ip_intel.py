@@ -2,29 +2,57 @@
 import os
 import requests
 import whois
+from whois.parser import WhoisEntry
 from dotenv import load_dotenv
+from timeline_builder import step
+import cassette
+import dns_cache
+from records import IPResult
 
 load_dotenv()
 TOR_PROXY = os.getenv('TOR_PROXY')
+IPINFO_URL = os.getenv('IPINFO_URL', 'https://ipinfo.io')
+# Optional "host:port" WHOIS server queried directly (e.g. a local stub)
+WHOIS_SERVER = os.getenv('WHOIS_SERVER')
 
 
 class IPIntel:
-    def __init__(self, use_tor=False):
-        self.session = requests.Session()
+    def __init__(self, use_tor=False, ipinfo_url=None, whois_server=None):
+        self.session = cassette.mount(requests.Session())
+        self.ipinfo_url = (ipinfo_url or IPINFO_URL).rstrip('/')
+        self.whois_server = whois_server or WHOIS_SERVER
         if use_tor and TOR_PROXY:
             self.session.proxies.update({'http': TOR_PROXY, 'https': TOR_PROXY})
 
     def whois_lookup(self, ip):
         try:
-            return whois.whois(ip)
+            with step('ip', 'whois'):
+                if self.whois_server:
+                    return cassette.call('whois', ip, lambda: self._whois_direct(ip))
+                return cassette.call('whois', ip, lambda: whois.whois(ip))
         except Exception:
             return {}
 
+    def _whois_direct(self, ip, timeout=10):
+        host, _, port = self.whois_server.rpartition(':')
+        with dns_cache.create_connection((host, int(port)), timeout=timeout) as sock:
+            sock.sendall(f'{ip}\r\n'.encode())
+            chunks = []
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                chunks.append(data)
+        return WhoisEntry.load(ip, b''.join(chunks).decode(errors='replace'))
+
     def ipinfo_lookup(self, ip):
         # Uses ipinfo.io free endpoint (no key). For production use, add keys.
         try:
-            r = self.session.get(f'https://ipinfo.io/{ip}/json', timeout=10)
-            return r.json()
+            with step('ip', 'ipinfo') as outcome:
+                r = self.session.get(f'{self.ipinfo_url}/{ip}/json', timeout=10)
+                if r.status_code != 200:
+                    outcome.fail(f'http_{r.status_code}')
+                return r.json()
         except Exception:
             return {}
 
@@ -38,9 +66,11 @@ class IPIntel:
         return {'vpn': False, 'proxy': False}
 
     def collect(self, ip):
-        data = {}
-        data['whois'] = self.whois_lookup(ip)
-        data['ipinfo'] = self.ipinfo_lookup(ip)
-        data['blacklist'] = self.blacklist_check(ip)
-        data['vpn_proxy'] = self.detect_vpn_proxy(ip)
+        data = IPResult()
+        data.whois = self.whois_lookup(ip)
+        data.ipinfo = self.ipinfo_lookup(ip)
+        with step('ip', 'blacklist'):
+            data.blacklist = self.blacklist_check(ip)
+        with step('ip', 'vpn_proxy'):
+            data.vpn_proxy = self.detect_vpn_proxy(ip)
         return data
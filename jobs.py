@@ -0,0 +1,182 @@
+"""Bulk investigation jobs for the REST API.
+
+``POST /api/scans/bulk`` hands a list of mixed-type targets to ``BulkJobs``,
+which assigns every target its case id up front, queues the investigations on
+a bounded thread pool and returns immediately. Callers poll the job
+(``GET /api/jobs/<job_id>``) or fetch the finished cases by id in one request
+(``POST /api/reports/bulk``) instead of making one blocking ``/scan`` call per
+target. The submitting process tracks its jobs in memory (the most recent
+``BULK_JOB_HISTORY``) and also writes each job to ``reports/_jobs``, so a
+status request answered by another UI worker process still sees it: there an
+item is done once its case file exists, failed if it is in the job's error
+log, lost if the submitting process has exited, and pending otherwise.
+At most ``BULK_MAX_QUEUED`` items wait or run per process; ``submit`` raises
+``QueueFull`` beyond that instead of letting the backlog grow in memory.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import shared_files
+
+BULK_TYPES = ('ip', 'email', 'phone', 'username', 'ddos')
+MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '1000'))
+WORKERS = int(os.getenv('BULK_WORKERS', '4'))
+JOB_HISTORY = int(os.getenv('BULK_JOB_HISTORY', '200'))
+MAX_QUEUED = int(os.getenv('BULK_MAX_QUEUED', '5000'))
+
+
+class QueueFull(Exception):
+    """Accepting a job would put more than ``MAX_QUEUED`` items in the queue."""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def validate(targets, default_investigator=None):
+    """Split submitted targets into (accepted items, rejected entries)."""
+    accepted, rejected = [], []
+    if not isinstance(targets, list):
+        return accepted, [{'index': None, 'error': 'targets must be a list of {type, value} objects'}]
+    for index, target in enumerate(targets):
+        if len(accepted) >= MAX_ITEMS:
+            rejected.append({'index': index, 'error': f'more than {MAX_ITEMS} targets in one request'})
+            continue
+        if not isinstance(target, dict):
+            rejected.append({'index': index, 'error': 'expected a {type, value} object'})
+            continue
+        t, v = target.get('type'), str(target.get('value') or '').strip()
+        if t not in BULK_TYPES:
+            rejected.append({'index': index, 'error': f'type must be one of {", ".join(BULK_TYPES)}'})
+        elif not v:
+            rejected.append({'index': index, 'error': 'missing value'})
+        else:
+            accepted.append({'index': index, 'type': t, 'value': v,
+                             'investigator': target.get('investigator') or default_investigator})
+    return accepted, rejected
+
+
+class BulkJobs:
+    """Queues investigations on a thread pool and tracks them per job."""
+
+    def __init__(self, run, new_case_id, jobs_dir=None, case_exists=None, workers=WORKERS,
+                 max_queued=MAX_QUEUED):
+        self.run = run
+        self.new_case_id = new_case_id
+        self.jobs_dir = jobs_dir
+        self.case_exists = case_exists
+        self.max_queued = max_queued
+        self.queued = 0  # items submitted and not yet finished
+        if jobs_dir:
+            os.makedirs(jobs_dir, exist_ok=True)
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk')
+
+    def submit(self, items):
+        """Create a job for validated items; returns it with case ids assigned.
+
+        Raises QueueFull if the items would not fit in the queue.
+        """
+        with self._lock:
+            if self.queued + len(items) > self.max_queued:
+                raise QueueFull(f'{self.queued} investigations already queued (limit {self.max_queued})')
+            self.queued += len(items)
+        job_id = f'JOB-{os.urandom(4).hex()}'
+        job = {
+            'job_id': job_id,
+            'created': datetime.utcnow().isoformat() + 'Z',
+            'pid': os.getpid(),
+            'items': [dict(item, job_id=job_id, case_id=self.new_case_id(), status='queued') for item in items],
+        }
+        with self._lock:
+            self.jobs[job['job_id']] = job
+            while len(self.jobs) > JOB_HISTORY:
+                self.jobs.popitem(last=False)
+        if self.jobs_dir:
+            path = self._path(job['job_id'])
+            tmp_path = shared_files.tmp_path(path)
+            with open(tmp_path, 'w') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+        for item in job['items']:
+            metrics.BULK_ITEMS.inc(state='queued')
+            self._pool.submit(self._investigate, item)
+        print(f"[jobs] {job['job_id']}: queued {len(job['items'])} investigations")
+        return job
+
+    def _investigate(self, item):
+        metrics.BULK_ITEMS.dec(state='queued')
+        metrics.BULK_ITEMS.inc(state='running')
+        item['status'] = 'running'
+        try:
+            self.run(item['type'], item['value'], item['investigator'], case_id=item['case_id'])
+            item['status'] = 'done'
+        except Exception as e:
+            item['status'] = 'error'
+            item['error'] = str(e)
+            if self.jobs_dir:
+                shared_files.append(self._path(item['job_id'], '.errors.jsonl'),
+                                    json.dumps({'case_id': item['case_id'], 'error': item['error']}) + '\n')
+            print(f"[jobs] {item['case_id']} ({item['type']} {item['value']}) failed: {e}")
+        finally:
+            metrics.BULK_ITEMS.dec(state='running')
+            with self._lock:
+                self.queued -= 1
+
+    def _path(self, job_id, suffix='.json'):
+        return os.path.join(self.jobs_dir, f'{os.path.basename(job_id)}{suffix}')
+
+    def _load(self, job_id):
+        """A job submitted by another process, with item states derived from disk."""
+        if not self.jobs_dir:
+            return None
+        try:
+            with open(self._path(job_id), 'r') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        errors = {}
+        try:
+            with open(self._path(job_id, '.errors.jsonl'), 'r') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    errors[entry['case_id']] = entry['error']
+        except (OSError, ValueError):
+            pass
+        # Items are queued in the submitting process's memory only
+        orphaned = job.get('pid') is not None and not _pid_alive(job['pid'])
+        for item in job['items']:
+            if item['case_id'] in errors:
+                item.update(status='error', error=errors[item['case_id']])
+            elif self.case_exists and self.case_exists(item['case_id']):
+                item['status'] = 'done'
+            elif orphaned:
+                item.update(status='lost', error='worker exited before running it; resubmit')
+            else:
+                item['status'] = 'pending'
+        return job
+
+    def status(self, job_id):
+        """Job with per-state counts, or None if unknown (or expired)."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        if job is None:
+            return None
+        counts = {}
+        for item in job['items']:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        return dict(job, items=[dict(item) for item in job['items']], counts=counts,
+                    finished=not (counts.get('queued') or counts.get('running') or counts.get('pending')))
@@ -0,0 +1,169 @@
+"""Log-bucketed latency histogram (HDR-histogram style) for load tests.
+
+Values are recorded in integer microseconds. Below 128 us every value has its
+own bucket; above that each power of two is split into 64 sub-buckets, so any
+recorded value is reported within 1/64 (about 1.6%) of its true value
+whatever its magnitude, in a few hundred buckets at most. Histograms from
+different worker threads are merged by adding bucket counts.
+
+The CSV export follows HdrHistogram's percentile distribution layout
+(value, percentile, total count, 1/(1-percentile)), so existing plotting
+tools can read it.
+
+Export the stress-test histograms of a stored case:
+    python latency_histogram.py reports/<case>.json --out latency_csv
+"""
+import os
+import csv
+import json
+import argparse
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_SUB_BUCKETS = SUB_BUCKETS >> 1
+PERCENTILES = ((50.0, 'p50'), (90.0, 'p90'), (99.0, 'p99'), (99.9, 'p99_9'))
+
+
+def bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF_SUB_BUCKETS + ((value >> shift) - HALF_SUB_BUCKETS)
+
+
+def bucket_upper(index):
+    """Highest value that lands in ``index`` (HDR's 'highest equivalent value')."""
+    if index < SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - SUB_BUCKETS, HALF_SUB_BUCKETS)
+    shift += 1
+    return ((offset + HALF_SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram of microsecond latencies."""
+    __slots__ = ('counts', 'total', 'min', 'max', 'sum')
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+
+    def record(self, value_us, count=1):
+        value = max(0, int(value_us))
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def record_seconds(self, seconds):
+        self.record(seconds * 1e6)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if other.total:
+            self.total += other.total
+            self.sum += other.sum
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    @classmethod
+    def merged(cls, histograms):
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    def value_at_percentile(self, pct):
+        if not self.total:
+            return 0
+        wanted = max(1, int(pct / 100.0 * self.total + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= wanted:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+    def distribution(self):
+        """(value_us, count, cumulative_count) per non-empty bucket, ascending."""
+        seen = 0
+        rows = []
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            rows.append((min(bucket_upper(index), self.max), self.counts[index], seen))
+        return rows
+
+    def summary(self):
+        """Percentiles in milliseconds."""
+        summary = {
+            'count': self.total,
+            'min_ms': round((self.min or 0) / 1000.0, 3),
+            'mean_ms': round(self.sum / self.total / 1000.0, 3) if self.total else 0.0,
+        }
+        for pct, name in PERCENTILES:
+            summary[f'{name}_ms'] = round(self.value_at_percentile(pct) / 1000.0, 3)
+        summary['max_ms'] = round(self.max / 1000.0, 3)
+        return summary
+
+    def to_dict(self):
+        """Summary plus the non-empty buckets as [value_ms, count] pairs."""
+        data = self.summary()
+        data['buckets'] = [[round(value / 1000.0, 3), count] for value, count, _ in self.distribution()]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for value_ms, count in data.get('buckets', []):
+            histogram.record(round(value_ms * 1000), count)
+        return histogram
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['value_ms', 'percentile', 'total_count', 'inverted_percentile'])
+            for value, _, seen in self.distribution():
+                fraction = seen / self.total
+                inverted = '' if fraction >= 1.0 else round(1.0 / (1.0 - fraction), 2)
+                writer.writerow([round(value / 1000.0, 3), round(fraction, 6), seen, inverted])
+        return path
+
+
+def export_case(case_path, out_dir):
+    """Write a CSV per latency histogram found in a case's stress-test reports."""
+    with open(case_path, 'r') as f:
+        case = json.load(f)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    results = case.get('results', [])
+    for i, item in enumerate(results if isinstance(results, list) else []):
+        if not isinstance(item, dict) or item.get('type') != 'stress_simulation_report':
+            continue
+        name = item.get('attack_type', 'stress').lower().replace(' ', '_').replace('(', '').replace(')', '')
+        for key in ('latency', 'latency_corrected'):
+            if item.get(key):
+                path = os.path.join(out_dir, f'{i:02d}_{name}_{key}.csv')
+                written.append(LatencyHistogram.from_dict(item[key]).to_csv(path))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export stress-test latency histograms as CSV')
+    parser.add_argument('case', help='Case JSON file containing stress_simulation_report results')
+    parser.add_argument('--out', default='latency_csv', help='Output directory')
+    args = parser.parse_args()
+    for path in export_case(args.case, args.out):
+        print(f'[latency] Wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
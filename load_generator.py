@@ -0,0 +1,266 @@
+"""Open-loop asyncio HTTP load generator for services on 127.0.0.1.
+
+Requests are issued on a precomputed arrival schedule (constant, Poisson or a
+linear ramp) from a single event loop, independent of how fast responses come
+back, so a slow server shows up as growing latency rather than a silently
+reduced request rate. Connections are kept alive and reused; at most
+``concurrency`` are open at once and arrivals beyond that wait for a free
+connection (the wait counts towards their corrected latency).
+
+Only localhost targets are accepted, exactly as ``LocalhostStressSimulator``
+enforces.
+
+Usage:
+    python load_generator.py --port 5000 --rate 200 --duration 10 --schedule poisson
+    python load_generator.py --port 5000 --rate 10 --end-rate 300 --schedule ramp --path / --path /dashboard
+    python load_generator.py --port 5000 --rate 4000 --concurrency 256 --processes 4
+"""
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+
+SCHEDULES = ('constant', 'poisson', 'ramp')
+
+
+def arrivals(schedule, rate, duration, end_rate=None, seed=None):
+    """Yield arrival offsets in seconds from the start of the run."""
+    if rate <= 0 and not (schedule == 'ramp' and end_rate):
+        return
+    if schedule == 'constant':
+        count = int(rate * duration)
+        for i in range(count):
+            yield i / rate
+    elif schedule == 'poisson':
+        rng = random.Random(seed)
+        t = rng.expovariate(rate)
+        while t < duration:
+            yield t
+            t += rng.expovariate(rate)
+    elif schedule == 'ramp':
+        # Rate grows linearly from ``rate`` to ``end_rate``; the k-th arrival is
+        # where the integral of the rate reaches k.
+        end_rate = rate if end_rate is None else end_rate
+        slope = (end_rate - rate) / duration
+        k = 0
+        while True:
+            if slope == 0:
+                t = k / rate
+            else:
+                disc = rate * rate + 2 * slope * k
+                if disc < 0:
+                    return
+                t = (math.sqrt(disc) - rate) / slope
+            if t >= duration:
+                return
+            yield t
+            k += 1
+    else:
+        raise ValueError(f'Unknown schedule: {schedule}')
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response; return (status, bytes_read, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    status = int(status_line.split(None, 2)[1])
+    length, chunked, keep_alive = None, False, True
+    size = len(status_line)
+    while True:
+        line = await reader.readline()
+        size += len(line)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+    if chunked:
+        while True:
+            line = await reader.readline()
+            chunk = int(line.split(b';', 1)[0], 16)
+            body = await reader.readexactly(chunk + 2)
+            size += len(line) + len(body)
+            if chunk == 0:
+                break
+    elif length is not None:
+        size += len(await reader.readexactly(length))
+    else:
+        size += len(await reader.read())
+        keep_alive = False
+    if status_line.startswith(b'HTTP/1.0'):
+        keep_alive = False
+    return status, size, keep_alive
+
+
+class OpenLoopGenerator:
+    """Issues GET requests against 127.0.0.1:port on an arrival schedule."""
+
+    def __init__(self, port, paths=('/',), concurrency=64, timeout=5.0, host='127.0.0.1'):
+        from stress_simulator import LocalhostStressSimulator
+        if not LocalhostStressSimulator().validate_target(host):
+            raise ValueError(f'{host} is not localhost; load tests are restricted to 127.0.0.1')
+        self.host = host
+        self.port = port
+        self.paths = list(paths) or ['/']
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.status_codes = {}
+        self.max_dispatch_lag = 0.0
+        self.max_in_flight = 0
+        self.abandoned = 0
+        self._in_flight = 0
+        self._idle = []
+        self._slots = None
+
+    async def _acquire(self, counters):
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            self._slots.release()
+            raise
+        counters.connections_made += 1
+        return _Connection(reader, writer)
+
+    def _release(self, conn, reusable):
+        if reusable:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    async def _request(self, path, intended, counters):
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        conn = None
+        try:
+            conn = await asyncio.wait_for(self._acquire(counters), self.timeout)
+            started = time.monotonic()
+            data = (f'GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                    f'User-Agent: IntelTrace-LoadGenerator\r\nConnection: keep-alive\r\n\r\n').encode()
+            conn.writer.write(data)
+            status, _, keep_alive = await asyncio.wait_for(_read_response(conn.reader), self.timeout)
+            counters.observe(started, intended)
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            self._release(conn, keep_alive)
+            conn = None
+            if status < 400:
+                counters.success(packets=1, nbytes=len(data))
+            else:
+                counters.error()
+        except asyncio.CancelledError:
+            # Still unanswered when the run gave up on it: counted as an error
+            self.abandoned += 1
+            counters.error()
+            if conn is not None:
+                conn.close()
+            raise
+        except Exception:
+            counters.error()
+            if conn is not None:
+                self._release(conn, False)
+        finally:
+            self._in_flight -= 1
+
+    async def run(self, offsets, counters, start=None):
+        """Dispatch one request per offset (seconds after ``start``, time.monotonic)."""
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        start = time.monotonic() if start is None else start
+        tasks = set()
+        for i, offset in enumerate(offsets):
+            intended = start + offset
+            delay = intended - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.max_dispatch_lag = max(self.max_dispatch_lag, time.monotonic() - intended)
+            task = loop.create_task(self._request(self.paths[i % len(self.paths)], intended, counters))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            _, pending = await asyncio.wait(set(tasks), timeout=self.timeout * 2)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+    def details(self):
+        return {
+            'status_codes': {str(k): v for k, v in sorted(self.status_codes.items())},
+            'concurrency_cap': self.concurrency,
+            'max_in_flight': self.max_in_flight,
+            'abandoned': self.abandoned,
+            'max_dispatch_lag_ms': round(self.max_dispatch_lag * 1000, 3),
+        }
+
+
+def main():
+    from stress_simulator import LocalhostStressSimulator
+
+    parser = argparse.ArgumentParser(description='Open-loop HTTP load test of a service on 127.0.0.1')
+    parser.add_argument('--host', default='127.0.0.1', help='Must resolve to localhost')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=50, help='Requests per second (start rate for ramp)')
+    parser.add_argument('--end-rate', type=float, default=None, help='Final rate for --schedule ramp')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--schedule', choices=SCHEDULES, default='constant')
+    parser.add_argument('--path', action='append', dest='paths', help='Request path (repeatable, round-robin)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Maximum open connections')
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Shard the load across this many processes (rate and concurrency are split)')
+    parser.add_argument('--json', help='Write the report to this file')
+    args = parser.parse_args()
+
+    simulator = LocalhostStressSimulator()
+    if not simulator.validate_target(args.host):
+        parser.error(f'{args.host} is not localhost; load tests are restricted to 127.0.0.1')
+    options = dict(host=args.host, port=args.port, duration=args.duration, rate=args.rate, schedule=args.schedule,
+                   end_rate=args.end_rate, paths=args.paths or ['/'], concurrency=args.concurrency,
+                   timeout=args.timeout, seed=args.seed)
+    if args.processes > 1:
+        report = simulator.simulate_sharded('http_load', args.processes, **options)
+    else:
+        report = simulator.simulate_http_load(**options)
+    stats, latency = report['statistics'], report.get('latency_corrected', {})
+    print(f"[load] {stats['attempts']} requests, {stats['avg_rate']} ok/s "
+          f"(configured {stats['configured_rate']}), errors {stats['errors']}")
+    if latency:
+        print(f"[load] latency ms p50 {latency['p50_ms']}  p90 {latency['p90_ms']}  "
+              f"p99 {latency['p99_ms']}  p99.9 {latency['p99_9_ms']}  max {latency['max_ms']}")
+    print(f"[load] status codes {report['load']['status_codes']}, "
+          f"max in flight {report['load']['max_in_flight']}, abandoned {report['load']['abandoned']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
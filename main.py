@@ -1,24 +1,70 @@
 """Orchestration entrypoint for IntelTrace CLI usage."""
 import os
+import time
 import argparse
 import json
+import copy
+import functools
 from datetime import datetime
 from dotenv import load_dotenv
 from banner import print_banner
 from database import IntelDB
-from ip_intel import IPIntel
-from email_intel import EmailIntel
-from phone_intel import PhoneIntel
-from username_intel import UsernameIntel
-from photo_intel import PhotoIntel
-from ddos_intel import DDOSIntel
 from reputation_engine import ReputationEngine
-from timeline_builder import TimelineBuilder
+from timeline_builder import TimelineBuilder, recording, step
 from report_generator import ReportGenerator
+import tracing
+import metrics
+import collectors
+import coalescing
+import records
 
 load_dotenv()
 
 
+def _print_fields(kind, fields):
+    print(f"      Type: {kind.upper()}")
+    for key, value in fields:
+        if isinstance(value, dict):
+            print(f"      {key.replace('_', ' ').title()}:")
+            for k, v in value.items():
+                print(f"        - {k}: {v}")
+        elif isinstance(value, list):
+            print(f"      {key.replace('_', ' ').title()}: {len(value)} items")
+        else:
+            print(f"      {key.replace('_', ' ').title()}: {value}")
+
+
+@functools.singledispatch
+def print_result(result):
+    """Print one result; records dispatch on their class, anything else is printed as stored."""
+    if isinstance(result, dict):
+        _print_fields(str(result.get('type', 'result')), ((k, v) for k, v in result.items() if k != 'type'))
+    else:
+        print(f"      {result}")
+
+
+@print_result.register
+def _print_record(result: records.Record):
+    _print_fields(result.kind, result.fields())
+
+
+@print_result.register
+def _print_profile(result: records.ProfileCheck):
+    status = "\033[92m✓ FOUND\033[0m" if result.exists else "\033[91m✗ NOT FOUND\033[0m"
+    print(f"      Platform: {result.platform.upper()}")
+    print(f"      Status: {status}")
+    if result.exists:
+        print(f"      URL: {result.url}")
+        print(f"      Status Code: {result.status_code}")
+
+
+@print_result.register
+def _print_series(result: records.TrafficSeries):
+    print(f"      Type: TRAFFIC TIMESERIES")
+    print(f"      Points: {result.length} x {result.interval_s}s from {result.start}")
+    print(f"      Columns: {', '.join(result.columns)}")
+
+
 def print_results(report):
     """Print investigation results to console in a formatted way."""
     print("\n" + "="*80)
@@ -39,80 +85,114 @@ def print_results(report):
     
     # Results
     print(f"\n\033[92m[INVESTIGATION RESULTS] ({len(report['results'])} items found)\033[0m")
-    for idx, result in enumerate(report['results'], 1):
+    results = records.load_case(report)
+    for idx, result in enumerate(results if isinstance(results, list) else [results], 1):
         print(f"\n  [{idx}] " + "-"*70)
-        
-        if isinstance(result, dict):
-            if 'platform' in result:
-                # Social media result
-                status = "\033[92m✓ FOUND\033[0m" if result.get('exists') else "\033[91m✗ NOT FOUND\033[0m"
-                print(f"      Platform: {result['platform'].upper()}")
-                print(f"      Status: {status}")
-                if result.get('exists'):
-                    print(f"      URL: {result.get('url', 'N/A')}")
-                    print(f"      Status Code: {result.get('status_code', 'N/A')}")
-            
-            elif 'type' in result:
-                # Photo intel or other structured results
-                print(f"      Type: {result['type'].upper()}")
-                for key, value in result.items():
-                    if key != 'type':
-                        if isinstance(value, dict):
-                            print(f"      {key.replace('_', ' ').title()}:")
-                            for k, v in value.items():
-                                print(f"        - {k}: {v}")
-                        elif isinstance(value, list):
-                            print(f"      {key.replace('_', ' ').title()}: {len(value)} items")
-                        else:
-                            print(f"      {key.replace('_', ' ').title()}: {value}")
-            else:
-                # Generic result
-                for key, value in result.items():
-                    print(f"      {key}: {value}")
+        print_result(result)
     
     # Timeline
     print(f"\n\033[92m[TIMELINE] ({len(report['timeline'])} events)\033[0m")
     for event in report['timeline']:
-        print(f"  ⏱  {event['time']} - {event['desc']}")
+        duration = f" ({event['duration_ms']:.1f} ms)" if 'duration_ms' in event else ''
+        print(f"  ⏱  {event['time']} - {event['desc']}{duration}")
     
     # Save location
     print(f"\n\033[92m[+] Full report saved to:\033[0m reports/{report['case_id']}.json")
     print("="*80 + "\n")
 
 
-def run_investigation(target_type, target_value, investigator_name=None):
-    db = IntelDB()
-    collector = {
-        'ip': IPIntel(),
-        'email': EmailIntel(),
-        'phone': PhoneIntel(),
-        'username': UsernameIntel(),
-        'photo': PhotoIntel(),
-        'ddos': DDOSIntel()
-    }[target_type]
+def new_case_id():
+    return f"IT-{os.urandom(4).hex()}"
+
+
+def run_investigation(target_type, target_value, investigator_name=None, case_id=None):
+    case_id = case_id or new_case_id()
+    started = time.perf_counter()
+    outcome = 'error'
+    root = None
+    metrics.INVESTIGATIONS_IN_PROGRESS.inc(target_type=target_type)
+    try:
+        with tracing.span('investigation', case_id=case_id, target_type=target_type) as root:
+            report = _investigate(case_id, target_type, target_value, investigator_name)
+        outcome = 'success'
+    finally:
+        metrics.INVESTIGATIONS_IN_PROGRESS.dec(target_type=target_type)
+        metrics.INVESTIGATIONS.inc(target_type=target_type, outcome=outcome)
+        metrics.INVESTIGATION_LATENCY.observe(time.perf_counter() - started, target_type=target_type)
+        # Failed investigations are exported too (the root span carries the error)
+        trace = tracing.write_trace(root, case_id)
+        if trace:
+            print(f"[main] Trace written to {trace['jsonl']} and {trace['chrome']}")
+
+    # Display results on console
+    print_results(report)
+    return report
+
 
+def collect(target_type, target_value):
+    """Run the collector for one target; returns (results, step recorder)."""
+    with tracing.span('collectors.get'):
+        collector = collectors.get(target_type)
     print(f"[main] Starting collection for {target_type}: {target_value}")
-    results = collector.collect(target_value)
+    with recording() as recorder:
+        with step(target_type, 'collect'):
+            results = collector.collect(target_value)
+    return results, recorder
+
+
+def _investigate(case_id, target_type, target_value, investigator_name):
+    def collect_for_case():
+        return (case_id,) + collect(target_type, target_value)
+
+    with tracing.span('collect.single_flight'):
+        (evidence_case, results, recorder), leader = coalescing.collect_once(target_type, target_value,
+                                                                             collect_for_case)
+    if leader:
+        return save_report(case_id, target_type, target_value, investigator_name, results, recorder)
+    print(f"[main] Reused the concurrent collection of {evidence_case} for {target_value}")
+    metrics.COALESCED_COLLECTIONS.inc(target_type=target_type)
+    return save_report(case_id, target_type, target_value, investigator_name, copy.deepcopy(results), recorder,
+                       notes=[f'Evidence shared with {evidence_case}'], evidence_case=evidence_case)
+
+
+def save_report(case_id, target_type, target_value, investigator_name, results, recorder, notes=(), **extra):
+    """Score collected results, build the timeline, then save and render the case.
+
+    ``results`` are the collector's records; the case stores their JSON form
+    (see ``records``).
+
+    ``notes`` are added to the timeline after "Collection started"; ``extra``
+    keys are stored on the case as-is.
+    """
+    with tracing.span('db.init'):
+        db = IntelDB.shared()
     print("[main] Running reputation engine and timeline builder")
-    rep = ReputationEngine().score(results)
-    timeline = TimelineBuilder().build(results)
+    with tracing.span('reputation.score'):
+        rep = ReputationEngine().score(results)
+    stored = records.dump(results)
+    with tracing.span('timeline.build'):
+        timeline = TimelineBuilder().build(stored, recorder)
+        for i, note in enumerate(notes, 1):
+            timeline.insert(i, {'time': timeline[0]['time'], 'desc': note, 'offset_ms': 0.0})
 
     report = {
-        'case_id': f"IT-{os.urandom(4).hex()}",
+        'case_id': case_id,
         'investigator': investigator_name or os.getenv('INVESTIGATOR_NAME', 'Analyst'),
         'target_type': target_type,
         'target': target_value,
-        'results': results,
+        'results': stored,
+        'results_version': records.VERSION,
         'reputation': rep,
         'timeline': timeline
     }
+    report.update(extra)
 
-    db.save_case(report)
-    ReportGenerator().generate(report)
+    with tracing.span('db.save_case'):
+        db.save_case(report)
+    with tracing.span('report.generate'):
+        ReportGenerator().generate(report)
     print(f"[main] Investigation saved and report generated for {target_value}")
-    
-    # Display results on console
-    print_results(report)
+    return report
 
 
 def cli():
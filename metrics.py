@@ -0,0 +1,398 @@
+"""Prometheus-style metrics for the collectors and the Flask UI.
+
+Hot-path updates never take a lock: every thread writes into its own shard
+(a plain dict reached through ``threading.local``) and shards are only summed
+when ``/metrics`` is scraped. Shards of finished threads are folded into a
+retired total so short-lived pool threads do not accumulate.
+
+For multi-process deployments set ``INTELTRACE_METRICS_DIR``: each process
+periodically snapshots its totals to ``metrics_<pid>.json`` there and a scrape
+served by any worker merges every snapshot, so counters and histograms cover
+all workers. A process that exits rewrites its snapshot without gauges;
+gauges from a snapshot whose process is gone (killed without cleanup) or that
+has not been refreshed for ``STALE_FLUSHES`` flush intervals are left out of
+the merge. Counters and histograms of exited processes are kept, so totals
+never go down: the flusher periodically folds the snapshots of dead pids into
+``metrics_aggregate.json`` and removes them, so the directory does not grow
+with every recycled worker (as prometheus_client's multiprocess mode does).
+Gauge callbacks (e.g. case store size) are evaluated by the scraping process
+only.
+"""
+import os
+import json
+import glob
+import time
+import bisect
+import atexit
+import threading
+
+import shared_files
+
+METRICS_DIR = os.getenv('INTELTRACE_METRICS_DIR')
+FLUSH_INTERVAL = float(os.getenv('INTELTRACE_METRICS_FLUSH', '5'))
+STALE_FLUSHES = 3
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_definitions = {}
+_gauge_callbacks = []
+_local = threading.local()
+_shards = []
+_retired = {}
+_registry_lock = threading.Lock()
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _registry_lock:
+            _retire_dead_shards()
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def _merge_value(totals, key, value):
+    if isinstance(value, list):
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def _retire_dead_shards():
+    # Caller holds _registry_lock; dead threads no longer write to their shard
+    alive = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            alive.append((thread, shard))
+        else:
+            for key, value in shard.items():
+                _merge_value(_retired, key, value)
+    _shards[:] = alive
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        _definitions[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = (self.name, _label_key(self.labelnames, labels))
+        shard = _shard()
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """Up/down value summed across threads and processes (e.g. in-progress work)."""
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        _definitions[name] = self
+
+    def observe(self, value, **labels):
+        key = (self.name, _label_key(self.labelnames, labels))
+        shard = _shard()
+        counts = shard.get(key)
+        if counts is None:
+            # one slot per bucket plus +Inf, then the running sum
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+def gauge_callback(name, help_text, fn, labelnames=()):
+    """Register a gauge computed at scrape time; ``fn`` returns {label_tuple: value}."""
+    _gauge_callbacks.append((name, help_text, tuple(labelnames), fn))
+
+
+def snapshot():
+    """Sum of every thread shard in this process."""
+    with _registry_lock:
+        _retire_dead_shards()
+        totals = {key: (list(v) if isinstance(v, list) else v) for key, v in _retired.items()}
+        shards = [dict(shard) for _, shard in _shards]
+    for shard in shards:
+        for key, value in shard.items():
+            _merge_value(totals, key, value)
+    return totals
+
+
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f'metrics_{pid or os.getpid()}.json')
+
+
+def _aggregate_path():
+    return os.path.join(METRICS_DIR, 'metrics_aggregate.json')
+
+
+def _is_gauge(name):
+    return getattr(_definitions.get(name), 'kind', None) == 'gauge'
+
+
+def _write_entries(path, entries):
+    tmp = shared_files.tmp_path(path)
+    with open(tmp, 'w') as f:
+        json.dump(entries, f)
+    os.replace(tmp, path)
+
+
+def _read_entries(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush(gauges=True):
+    """Write this process's totals for other workers to merge."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    entries = [[name, list(labels), value] for (name, labels), value in snapshot().items()
+               if gauges or not _is_gauge(name)]
+    _write_entries(_snapshot_path(), entries)
+
+
+def _final_flush():
+    # On exit: counters and histograms stay for the merge, in-progress gauges go
+    try:
+        flush(gauges=False)
+    except OSError:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _snapshot_pid(path):
+    """Pid a snapshot belongs to, or None for the aggregate and stray files."""
+    try:
+        return int(os.path.basename(path)[len('metrics_'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def _live_snapshot(path, now):
+    """Whether the process behind a snapshot is running and flushing."""
+    pid = _snapshot_pid(path)
+    try:
+        age = now - os.path.getmtime(path)
+    except OSError:
+        return False
+    return pid is not None and (pid == os.getpid() or (age <= STALE_FLUSHES * FLUSH_INTERVAL and _pid_alive(pid)))
+
+
+def compact(dead=()):
+    """Fold the counters and histograms of dead processes into the aggregate file.
+
+    ``dead`` adds pids to treat as dead although they are running (at start
+    a process folds a snapshot left under its own, reused, pid). Runs under
+    the aggregate's lock, which ``collect_all`` also takes, so a scrape never
+    sees a value both in the aggregate and in the snapshot it came from.
+    Returns the number of snapshots folded.
+    """
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return 0
+    aggregate = _aggregate_path()
+    with shared_files.locked(aggregate):
+        folded = []
+        for path in glob.glob(os.path.join(METRICS_DIR, 'metrics_*.json')):
+            pid = _snapshot_pid(path)
+            if pid is None or (pid not in dead and (pid == os.getpid() or _pid_alive(pid))):
+                continue
+            folded.append(path)
+        if not folded:
+            return 0
+        totals = {}
+        for path in [aggregate] + folded:
+            for name, labels, value in _read_entries(path) or ():
+                if not _is_gauge(name):
+                    _merge_value(totals, (name, tuple(labels)), value)
+        _write_entries(aggregate, [[name, list(labels), value] for (name, labels), value in totals.items()])
+        for path in folded:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return len(folded)
+
+
+def collect_all():
+    """Totals across every process sharing METRICS_DIR (or just this one).
+
+    Counters and histograms of exited processes are kept (they only ever
+    grow), from their last snapshot or from the aggregate they were folded
+    into; their gauges are not, as they would report in-progress work that
+    no longer exists.
+    """
+    if not METRICS_DIR:
+        return snapshot()
+    flush()
+    totals = {}
+    now = time.time()
+    with shared_files.locked(_aggregate_path()):
+        for path in glob.glob(os.path.join(METRICS_DIR, 'metrics_*.json')):
+            live = _live_snapshot(path, now)
+            for name, labels, value in _read_entries(path) or ():
+                if not live and _is_gauge(name):
+                    continue
+                _merge_value(totals, (name, tuple(labels)), value)
+    return totals
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [(n, v) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)."""
+    totals = collect_all()
+    by_name = {}
+    for (name, labels), value in totals.items():
+        by_name.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, metric in sorted(_definitions.items()):
+        lines.append(f'# HELP {name} {metric.help}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, value in sorted(by_name.get(name, [])):
+            if metric.kind != 'histogram':
+                lines.append(f'{name}{_format_labels(metric.labelnames, labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(metric.labelnames, labels, ('le', le))} {cumulative}")
+            lines.append(f'{name}_sum{_format_labels(metric.labelnames, labels)} {round(value[-1], 6)}')
+            lines.append(f'{name}_count{_format_labels(metric.labelnames, labels)} {cumulative}')
+    for name, help_text, labelnames, fn in _gauge_callbacks:
+        try:
+            values = fn()
+        except Exception:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in sorted(values.items()):
+            lines.append(f'{name}{_format_labels(labelnames, labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _flusher():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+            compact()
+        except OSError:
+            pass
+
+
+def _start():
+    # A snapshot under this pid was left by an earlier process that had it
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        compact(dead=(os.getpid(),))
+    except OSError:
+        pass
+    threading.Thread(target=_flusher, name='metrics-flusher', daemon=True).start()
+    atexit.register(_final_flush)
+
+
+COLLECTOR_CALLS = Counter('inteltrace_collector_calls_total',
+                          'Collector sub-source calls by outcome (success, timeout, error)',
+                          ('collector', 'source', 'outcome'))
+COLLECTOR_LATENCY = Histogram('inteltrace_collector_latency_seconds',
+                              'Collector sub-source call latency', ('collector', 'source'))
+HTTP_REQUESTS = Counter('inteltrace_http_requests_total', 'UI requests by route and status',
+                        ('route', 'method', 'status'))
+HTTP_LATENCY = Histogram('inteltrace_http_request_seconds', 'UI request latency by route', ('route', 'method'))
+INVESTIGATIONS = Counter('inteltrace_investigations_total', 'Completed investigations',
+                         ('target_type', 'outcome'))
+INVESTIGATION_LATENCY = Histogram('inteltrace_investigation_seconds', 'End-to-end investigation latency',
+                                  ('target_type',))
+INVESTIGATIONS_IN_PROGRESS = Gauge('inteltrace_investigations_in_progress',
+                                   'Investigations currently running', ('target_type',))
+BULK_ITEMS = Gauge('inteltrace_bulk_items', 'Bulk-submitted investigations by state', ('state',))
+CACHE_REQUESTS = Counter('inteltrace_cache_requests_total', 'Cache lookups by cache and result (hit/miss)',
+                         ('cache', 'result'))
+COALESCED_COLLECTIONS = Counter('inteltrace_coalesced_collections_total',
+                                'Investigations that reused a concurrent collection of the same target',
+                                ('target_type',))
+WATCH_CHECKS = Counter('inteltrace_watch_checks_total',
+                       'Watchlist checks by outcome (baseline/unchanged/delta/changed/error)',
+                       ('target_type', 'outcome'))
+WATCH_EVENTS = Counter('inteltrace_watch_events_total', 'Change events found by watchlist checks', ('event',))
+DNS_LOOKUPS = Counter('inteltrace_dns_lookups_total',
+                      'DNS cache lookups by result (hit/negative_hit/coalesced/miss/error)', ('result',))
+
+
+def record_step(collector, source, status, error, seconds):
+    """Record one collector sub-step (called by timeline_builder.step)."""
+    if status == 'ok':
+        outcome = 'success'
+    elif error and ('Timeout' in error or 'timeout' in error):
+        outcome = 'timeout'
+    else:
+        outcome = 'error'
+    COLLECTOR_CALLS.inc(collector=collector, source=source, outcome=outcome)
+    COLLECTOR_LATENCY.observe(seconds, collector=collector, source=source)
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _cache_hit_ratios():
+    hits, totals = {}, {}
+    for (name, labels), value in collect_all().items():
+        if name != CACHE_REQUESTS.name:
+            continue
+        cache, result = labels
+        totals[cache] = totals.get(cache, 0) + value
+        if result == 'hit':
+            hits[cache] = hits.get(cache, 0) + value
+    return {(cache,): round(hits.get(cache, 0) / total, 4) for cache, total in totals.items() if total}
+
+
+gauge_callback('inteltrace_cache_hit_ratio', 'Cache hit ratio since start', _cache_hit_ratios, ('cache',))
+
+
+if METRICS_DIR:
+    _start()
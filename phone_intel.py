@@ -1,6 +1,8 @@
 """Phone intelligence: carrier lookup, country code detection."""
 import phonenumbers
 from phonenumbers import geocoder, carrier
+from timeline_builder import step
+from records import PhoneResult
 
 
 class PhoneIntel:
@@ -17,12 +19,13 @@ class PhoneIntel:
     def carrier_info(self, number, region=None):
         pn = self.parse_number(number, region)
         if not pn:
-            return {}
-        return {
-            'number': phonenumbers.format_number(pn, phonenumbers.PhoneNumberFormat.E164),
-            'country': geocoder.country_name_for_number(pn, 'en'),
-            'carrier': carrier.name_for_number(pn, 'en')
-        }
+            return PhoneResult()
+        return PhoneResult(
+            number=phonenumbers.format_number(pn, phonenumbers.PhoneNumberFormat.E164),
+            country=geocoder.country_name_for_number(pn, 'en'),
+            carrier=carrier.name_for_number(pn, 'en')
+        )
 
     def collect(self, number):
-        return self.carrier_info(number)
+        with step('phone', 'carrier_lookup'):
+            return self.carrier_info(number)
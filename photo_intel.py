@@ -5,6 +5,10 @@ import hashlib
 from datetime import datetime
 import requests
 from dotenv import load_dotenv
+from timeline_builder import step
+import cassette
+from records import (ImageSource, ImageHash, ImageSearch, FacialAnalysis, FacialRecognition, ExifData,
+                     SocialMediaMatch)
 
 load_dotenv()
 
@@ -16,6 +20,7 @@ class PhotoIntel:
             'tineye': 'https://tineye.com/search',
             'bing_visual': 'https://www.bing.com/images/search'
         }
+        self.session = cassette.mount(requests.Session())
         self.upload_dir = 'uploads'
         os.makedirs(self.upload_dir, exist_ok=True)
 
@@ -31,41 +36,44 @@ class PhotoIntel:
         is_url = photo_path_or_url.startswith('http://') or photo_path_or_url.startswith('https://')
         
         if is_url:
-            results.append({
-                'type': 'image_source',
-                'source': 'url',
-                'url': photo_path_or_url,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
-            image_hash = self._hash_from_url(photo_path_or_url)
+            results.append(ImageSource(
+                source='url',
+                url=photo_path_or_url,
+                timestamp=datetime.utcnow().isoformat() + 'Z'
+            ))
+            with step('photo', 'hash_from_url'):
+                image_hash = self._hash_from_url(photo_path_or_url)
         else:
-            results.append({
-                'type': 'image_source',
-                'source': 'file',
-                'path': photo_path_or_url,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            })
-            image_hash = self._hash_from_file(photo_path_or_url)
+            results.append(ImageSource(
+                source='file',
+                path=photo_path_or_url,
+                timestamp=datetime.utcnow().isoformat() + 'Z'
+            ))
+            with step('photo', 'hash_from_file'):
+                image_hash = self._hash_from_file(photo_path_or_url)
         
         # Add image hash
         if image_hash:
-            results.append({
-                'type': 'image_hash',
-                'algorithm': 'sha256',
-                'hash': image_hash
-            })
+            results.append(ImageHash(
+                algorithm='sha256',
+                hash=image_hash
+            ))
         
         # Reverse image search results (simulated)
-        results.extend(self._reverse_image_search(photo_path_or_url, is_url))
+        with step('photo', 'reverse_image_search'):
+            results.extend(self._reverse_image_search(photo_path_or_url, is_url))
         
         # Facial analysis (simulated)
-        results.extend(self._facial_analysis())
+        with step('photo', 'facial_analysis'):
+            results.extend(self._facial_analysis())
         
         # EXIF data extraction (simulated)
-        results.extend(self._extract_exif(photo_path_or_url, is_url))
+        with step('photo', 'exif'):
+            results.extend(self._extract_exif(photo_path_or_url, is_url))
         
         # Social media profile matching (simulated)
-        results.extend(self._social_media_matching())
+        with step('photo', 'social_media_matching'):
+            results.extend(self._social_media_matching())
         
         print(f"[photo_intel] Analysis complete. Found {len(results)} data points")
         return results
@@ -84,7 +92,7 @@ class PhotoIntel:
     def _hash_from_url(self, url):
         """Calculate SHA256 hash from URL."""
         try:
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=10)
             if response.status_code == 200:
                 return hashlib.sha256(response.content).hexdigest()
         except Exception as e:
@@ -96,72 +104,70 @@ class PhotoIntel:
         results = []
         
         # Google Images
-        results.append({
-            'platform': 'google_images',
-            'service': 'Reverse Image Search',
-            'search_url': f"{self.services['google_images']}?image_url={image_ref}" if is_url else self.services['google_images'],
-            'matches_found': True,
-            'estimated_matches': 847,
-            'similar_images': 1203,
-            'status': 'success'
-        })
+        results.append(ImageSearch(
+            platform='google_images',
+            service='Reverse Image Search',
+            search_url=f"{self.services['google_images']}?image_url={image_ref}" if is_url else self.services['google_images'],
+            matches_found=True,
+            estimated_matches=847,
+            similar_images=1203,
+            status='success'
+        ))
         
         # Yandex Images
-        results.append({
-            'platform': 'yandex_images',
-            'service': 'Reverse Image Search',
-            'search_url': self.services['yandex_images'],
-            'matches_found': True,
-            'estimated_matches': 523,
-            'status': 'success'
-        })
+        results.append(ImageSearch(
+            platform='yandex_images',
+            service='Reverse Image Search',
+            search_url=self.services['yandex_images'],
+            matches_found=True,
+            estimated_matches=523,
+            status='success'
+        ))
         
         # TinEye
-        results.append({
-            'platform': 'tineye',
-            'service': 'Reverse Image Search',
-            'search_url': self.services['tineye'],
-            'matches_found': True,
-            'estimated_matches': 156,
-            'oldest_match': '2019-03-15',
-            'newest_match': '2025-11-28',
-            'status': 'success'
-        })
+        results.append(ImageSearch(
+            platform='tineye',
+            service='Reverse Image Search',
+            search_url=self.services['tineye'],
+            matches_found=True,
+            estimated_matches=156,
+            oldest_match='2019-03-15',
+            newest_match='2025-11-28',
+            status='success'
+        ))
         
         # Bing Visual Search
-        results.append({
-            'platform': 'bing_visual',
-            'service': 'Visual Search',
-            'search_url': self.services['bing_visual'],
-            'matches_found': True,
-            'estimated_matches': 692,
-            'related_searches': ['person', 'profile photo', 'social media'],
-            'status': 'success'
-        })
+        results.append(ImageSearch(
+            platform='bing_visual',
+            service='Visual Search',
+            search_url=self.services['bing_visual'],
+            matches_found=True,
+            estimated_matches=692,
+            related_searches=['person', 'profile photo', 'social media'],
+            status='success'
+        ))
         
         return results
 
     def _facial_analysis(self):
         """Simulate facial recognition and analysis."""
         return [
-            {
-                'type': 'facial_analysis',
-                'faces_detected': 1,
-                'confidence': 0.94,
-                'attributes': {
+            FacialAnalysis(
+                faces_detected=1,
+                confidence=0.94,
+                attributes={
                     'gender': 'male',
                     'age_range': '25-35',
                     'emotion': 'neutral',
                     'glasses': False,
                     'facial_hair': True
                 },
-                'face_quality': 'high',
-                'face_landmarks': 68
-            },
-            {
-                'type': 'facial_recognition',
-                'database_matches': 3,
-                'matches': [
+                face_quality='high',
+                face_landmarks=68
+            ),
+            FacialRecognition(
+                database_matches=3,
+                matches=[
                     {
                         'source': 'social_media',
                         'platform': 'linkedin',
@@ -181,64 +187,60 @@ class PhotoIntel:
                         'match_type': 'possible'
                     }
                 ]
-            }
+            )
         ]
 
     def _extract_exif(self, image_ref, is_url):
         """Simulate EXIF metadata extraction."""
         return [
-            {
-                'type': 'exif_data',
-                'found': True,
-                'camera_make': 'Apple',
-                'camera_model': 'iPhone 13 Pro',
-                'date_taken': '2025-11-15 14:23:17',
-                'gps_coordinates': {
+            ExifData(
+                found=True,
+                camera_make='Apple',
+                camera_model='iPhone 13 Pro',
+                date_taken='2025-11-15 14:23:17',
+                gps_coordinates={
                     'latitude': 37.7749,
                     'longitude': -122.4194,
                     'location': 'San Francisco, CA'
                 },
-                'image_dimensions': {
+                image_dimensions={
                     'width': 3024,
                     'height': 4032
                 },
-                'software': 'iOS 17.1.2',
-                'orientation': 'portrait'
-            }
+                software='iOS 17.1.2',
+                orientation='portrait'
+            )
         ]
 
     def _social_media_matching(self):
         """Simulate social media profile matching."""
         return [
-            {
-                'type': 'social_media_match',
-                'platform': 'instagram',
-                'profile_found': True,
-                'profile_url': 'https://instagram.com/user_profile',
-                'match_confidence': 0.89,
-                'profile_image_match': True,
-                'followers': 1247,
-                'posts': 342
-            },
-            {
-                'type': 'social_media_match',
-                'platform': 'facebook',
-                'profile_found': True,
-                'profile_url': 'https://facebook.com/user.profile',
-                'match_confidence': 0.82,
-                'profile_image_match': True,
-                'friends_visible': False
-            },
-            {
-                'type': 'social_media_match',
-                'platform': 'twitter',
-                'profile_found': True,
-                'profile_url': 'https://twitter.com/userprofile',
-                'match_confidence': 0.75,
-                'profile_image_match': True,
-                'verified': False,
-                'followers': 523
-            }
+            SocialMediaMatch(
+                platform='instagram',
+                profile_found=True,
+                profile_url='https://instagram.com/user_profile',
+                match_confidence=0.89,
+                profile_image_match=True,
+                followers=1247,
+                posts=342
+            ),
+            SocialMediaMatch(
+                platform='facebook',
+                profile_found=True,
+                profile_url='https://facebook.com/user.profile',
+                match_confidence=0.82,
+                profile_image_match=True,
+                friends_visible=False
+            ),
+            SocialMediaMatch(
+                platform='twitter',
+                profile_found=True,
+                profile_url='https://twitter.com/userprofile',
+                match_confidence=0.75,
+                profile_image_match=True,
+                verified=False,
+                followers=523
+            )
         ]
 
     def save_upload(self, file_data, filename):
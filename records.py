@@ -0,0 +1,352 @@
+"""Typed result records returned by the collectors.
+
+Each kind of result (a profile check, a breach lookup, a DDoS report
+section, ...) is a small ``__slots__`` class instead of a free-form dict, so
+bulk runs hold far less memory per result and scoring and printing can
+dispatch on the record's class rather than probing for keys. Fields that a
+collector did not fill are simply unset and are left out when serialised.
+
+Cases store results as plain JSON, versioned with ``results_version``:
+
+- version 2 (current): every list item carries its kind in ``type``
+  (``profile_check``, ``exif_data``, ``target_info``, ...); dict results
+  (IP, email, phone) are one record whose kind follows the case's
+  ``target_type``.
+- version 1 (cases saved before records existed): no ``results_version``;
+  profile checks, reverse image searches and the dark web check had no
+  ``type`` and are recognised from their keys, once, when loaded.
+
+``IntelDB`` upgrades version 1 cases as it reads them; ``python records.py
+upgrade`` rewrites them on disk. Items of unknown kinds or with unexpected
+fields (e.g. stress test reports) are kept as plain dicts.
+
+Usage:
+    python records.py upgrade --dry-run
+    python records.py measure -n 2000
+"""
+import os
+import json
+import argparse
+
+VERSION = 2
+
+_UNSET = object()
+
+
+class Record:
+    """Base class: ``kind`` names the record in JSON, ``__slots__`` are its fields."""
+    __slots__ = ()
+    kind = None
+    tagged = True  # list items carry ``type``; whole-case results do not
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def fields(self):
+        """(name, value) for every field that is set, in declaration order."""
+        for name in self.__slots__:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                yield name, value
+
+    def to_json(self):
+        data = {'type': self.kind} if self.tagged else {}
+        for name in self.__slots__:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                data[name] = value
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        """Build a record from its JSON dict; unknown fields raise AttributeError."""
+        record = cls.__new__(cls)
+        for name, value in data.items():
+            if name != 'type':
+                setattr(record, name, value)
+        return record
+
+    def __eq__(self, other):
+        return type(other) is type(self) and dict(self.fields()) == dict(other.fields())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.fields())})"
+
+
+# --- whole-case results (dict shaped) ----------------------------------------
+
+class IPResult(Record):
+    __slots__ = ('whois', 'ipinfo', 'blacklist', 'vpn_proxy')
+    kind, tagged = 'ip', False
+
+
+class EmailResult(Record):
+    __slots__ = ('breaches', 'domain_reputation')
+    kind, tagged = 'email', False
+
+
+class PhoneResult(Record):
+    __slots__ = ('number', 'country', 'carrier')
+    kind, tagged = 'phone', False
+
+
+# --- username ------------------------------------------------------------------
+
+class ProfileCheck(Record):
+    # ``failed`` is set (True) only when the platform did not answer (error, 429, 5xx)
+    __slots__ = ('platform', 'exists', 'url', 'status_code', 'failed')
+    kind = 'profile_check'
+
+
+class DarkwebCheck(Record):
+    __slots__ = ('tor_presence_simulation',)
+    kind = 'darkweb_check'
+
+
+# --- photo -----------------------------------------------------------------------
+
+class ImageSource(Record):
+    __slots__ = ('source', 'url', 'path', 'timestamp')
+    kind = 'image_source'
+
+
+class ImageHash(Record):
+    __slots__ = ('algorithm', 'hash')
+    kind = 'image_hash'
+
+
+class ImageSearch(Record):
+    __slots__ = ('platform', 'service', 'search_url', 'matches_found', 'estimated_matches', 'similar_images',
+                 'oldest_match', 'newest_match', 'related_searches', 'status')
+    kind = 'reverse_image_search'
+
+
+class FacialAnalysis(Record):
+    __slots__ = ('faces_detected', 'confidence', 'attributes', 'face_quality', 'face_landmarks')
+    kind = 'facial_analysis'
+
+
+class FacialRecognition(Record):
+    __slots__ = ('database_matches', 'matches')
+    kind = 'facial_recognition'
+
+
+class ExifData(Record):
+    __slots__ = ('found', 'camera_make', 'camera_model', 'date_taken', 'gps_coordinates', 'image_dimensions',
+                 'software', 'orientation')
+    kind = 'exif_data'
+
+
+class SocialMediaMatch(Record):
+    __slots__ = ('platform', 'profile_found', 'profile_url', 'match_confidence', 'profile_image_match',
+                 'followers', 'posts', 'friends_visible', 'verified')
+    kind = 'social_media_match'
+
+
+# --- ddos --------------------------------------------------------------------------
+
+class TargetInfo(Record):
+    __slots__ = ('target', 'is_ip', 'resolved_ip', 'analysis_type', 'timestamp', 'status')
+    kind = 'target_info'
+
+
+class TrafficAnalysis(Record):
+    __slots__ = ('baseline_rps', 'current_rps', 'peak_rps', 'traffic_spike_detected', 'spike_percentage',
+                 'unusual_patterns')
+    kind = 'traffic_analysis'
+
+
+class AttackVectors(Record):
+    __slots__ = ('detected_vectors', 'primary_vector', 'vector_details')
+    kind = 'attack_vectors'
+
+
+class SourceAnalysis(Record):
+    __slots__ = ('unique_source_ips', 'botnet_indicators', 'top_source_countries', 'suspicious_asn_count',
+                 'tor_exit_nodes_detected', 'cloud_provider_ips', 'residential_proxy_ips')
+    kind = 'source_analysis'
+
+
+class ProtocolAnalysis(Record):
+    __slots__ = ('protocols', 'malformed_packets', 'fragmented_packets')
+    kind = 'protocol_analysis'
+
+
+class ImpactAssessment(Record):
+    __slots__ = ('severity_level', 'estimated_downtime', 'affected_services', 'cpu_usage', 'memory_usage',
+                 'bandwidth_utilization', 'connection_queue_size', 'dropped_packets')
+    kind = 'impact_assessment'
+
+
+class BotnetAnalysis(Record):
+    __slots__ = ('botnet_detected', 'suspected_botnet', 'bot_characteristics')
+    kind = 'botnet_analysis'
+
+
+class MitigationRecommendations(Record):
+    __slots__ = ('immediate_actions', 'recommended_services', 'firewall_rules', 'estimated_mitigation_time')
+    kind = 'mitigation_recommendations'
+
+
+class HistoricalAnalysis(Record):
+    __slots__ = ('previous_attacks', 'attack_history', 'pattern', 'likely_targeted')
+    kind = 'historical_analysis'
+
+
+class CostEstimation(Record):
+    __slots__ = ('estimated_costs', 'reputation_impact', 'customer_impact')
+    kind = 'cost_estimation'
+
+
+class TrafficSeries(Record):
+    __slots__ = ('start', 'interval_s', 'length', 'columns', 'protocols')
+    kind = 'traffic_timeseries'
+
+
+KINDS = {cls.kind: cls for cls in Record.__subclasses__() if cls.tagged}
+RESULT_TYPES = {cls.kind: cls for cls in Record.__subclasses__() if not cls.tagged}
+
+
+# --- serialisation ---------------------------------------------------------------
+
+def dump(results):
+    """JSON-ready form of a collector's results (records, lists of records or plain data)."""
+    if isinstance(results, list):
+        return [item.to_json() if isinstance(item, Record) else item for item in results]
+    if isinstance(results, Record):
+        return results.to_json()
+    return results
+
+
+def _legacy_kind(item, target_type):
+    # Version 1 items without a 'type'
+    if 'tor_presence_simulation' in item:
+        return 'darkweb_check'
+    if 'platform' in item:
+        return 'reverse_image_search' if target_type == 'photo' else 'profile_check'
+    return None
+
+
+def _load_item(item, target_type, version):
+    if not isinstance(item, dict):
+        return item
+    kind = item.get('type')
+    if kind is None and version < 2:
+        kind = _legacy_kind(item, target_type)
+    cls = KINDS.get(kind)
+    if cls is None:
+        return item
+    try:
+        return cls.from_json(item)
+    except AttributeError:
+        return item
+
+
+def load(target_type, results, version=VERSION):
+    """Records for a case's stored results; anything unrecognised is returned as stored."""
+    if isinstance(results, list):
+        return [_load_item(item, target_type, version) for item in results]
+    cls = RESULT_TYPES.get(target_type)
+    if cls is not None and isinstance(results, dict):
+        try:
+            return cls.from_json(results)
+        except AttributeError:
+            return results
+    return results
+
+
+def load_case(case):
+    """Records for a stored case of any version."""
+    return load(case.get('target_type'), case.get('results'), case.get('results_version', 1))
+
+
+def upgrade(case):
+    """Bring a stored case's results to the current version in place; returns the case."""
+    if case.get('results_version', 1) < VERSION and 'results' in case:
+        case['results'] = dump(load_case(case))
+        case['results_version'] = VERSION
+    return case
+
+
+# --- CLI -------------------------------------------------------------------------
+
+def upgrade_dir(reports_dir='reports', dry_run=False):
+    """Rewrite version 1 cases in ``reports_dir``; returns (checked, upgraded)."""
+    checked = upgraded = 0
+    with os.scandir(reports_dir) as entries:
+        for entry in entries:
+            if not (entry.name.endswith('.json') and entry.is_file()):
+                continue
+            checked += 1
+            try:
+                with open(entry.path, 'r') as f:
+                    case = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f'[records] Skipping {entry.name}: {e}')
+                continue
+            if not isinstance(case, dict) or case.get('results_version', 1) >= VERSION:
+                continue
+            upgraded += 1
+            if dry_run:
+                continue
+            upgrade(case)
+            tmp_path = entry.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(case, f, indent=2)
+            os.replace(tmp_path, entry.path)
+    return checked, upgraded
+
+
+def measure(n=2000, seed=0):
+    """Bytes allocated per simulated DDoS report held as records vs as dicts, and (de)serialisation speed."""
+    import time
+    import tracemalloc
+    from ddos_synth import generate_reports
+
+    def allocated(build):
+        tracemalloc.start()
+        held = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return held, size
+
+    reports = [results for _, results in generate_reports(n, seed)]
+    stored = [json.dumps(dump(results)) for results in reports]
+    _, as_dicts = allocated(lambda: [json.loads(text) for text in stored])
+    _, as_records = allocated(lambda: [load('ddos', json.loads(text)) for text in stored])
+    started = time.perf_counter()
+    loaded = [load('ddos', json.loads(text)) for text in stored]
+    load_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for results in loaded:
+        json.dumps(dump(results))
+    dump_s = time.perf_counter() - started
+    return {'reports': n, 'dict_bytes_per_report': as_dicts // n, 'record_bytes_per_report': as_records // n,
+            'load_us_per_report': round(load_s / n * 1e6, 1), 'dump_us_per_report': round(dump_s / n * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Typed result records: upgrade stored cases, measure memory')
+    sub = parser.add_subparsers(dest='command', required=True)
+    up = sub.add_parser('upgrade', help=f'Rewrite stored cases to results version {VERSION}')
+    up.add_argument('--reports-dir', default='reports')
+    up.add_argument('--dry-run', action='store_true', help='Only count the cases that need it')
+    me = sub.add_parser('measure', help='Memory and speed of records vs dicts on simulated DDoS reports')
+    me.add_argument('-n', type=int, default=2000)
+    me.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'upgrade':
+        checked, upgraded = upgrade_dir(args.reports_dir, args.dry_run)
+        verb = 'need upgrading' if args.dry_run else 'upgraded'
+        print(f'[records] {upgraded} of {checked} cases {verb} to results version {VERSION}')
+    else:
+        for key, value in measure(args.n, args.seed).items():
+            print(f'[records] {key}: {value}')
+
+
+if __name__ == '__main__':
+    # Go through the imported module, so records built by the collectors are instances of the same classes
+    import records
+    records.main()
@@ -5,6 +5,7 @@ from datetime import datetime
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from dotenv import load_dotenv
+import tracing
 
 load_dotenv()
 REPORTS_DIR = os.getenv('REPORTS_DIR', './reports')
@@ -50,6 +51,8 @@ class ReportGenerator:
         return fname
 
     def generate(self, payload):
-        j = self.generate_json(payload)
-        p = self.generate_pdf(payload)
+        with tracing.span('report.json'):
+            j = self.generate_json(payload)
+        with tracing.span('report.pdf'):
+            p = self.generate_pdf(payload)
         return {'json': j, 'pdf': p}
@@ -1,35 +1,262 @@
-"""Simple reputation engine to score aggregated intelligence."""
-def score(results):
-    # Very lightweight heuristic scoring: presence of breaches, blacklist entries, and social hits increase risk.
-    score = 0
-    details = {}
-    # Email breaches
-    if isinstance(results.get('results'), dict):
-        # Called from main: handle full payload
-        pass
+"""Rule-based reputation engine to score aggregated intelligence.
+
+Rules live in a declarative JSON file (``reputation_rules.json`` by default,
+override with ``REPUTATION_RULES``). Each rule names a factor, a JSONPath-like
+selector into a collector's results, an optional comparison, a weight and an
+optional cap::
+
+    {"factor": "social_hits_{count}", "selector": "[*].exists",
+     "weight": 5, "per_match": true, "cap": 30}
+
+Selector syntax: dotted keys, ``*`` for every value of a dict, ``[*]`` for every
+item of a list, ``[n]`` for a list index and ``[key=value]`` to keep list items
+whose ``key`` equals ``value`` (e.g. ``[type=exif_data].gps_coordinates``).
+Selectors work the same on stored JSON and on the typed records collectors
+return (see ``records``); ``[type=kind]`` then matches on the record class.
+Rules are compiled once per file version into closures and reused by every
+engine instance, so ``score_many`` can rescore an archive in one pass.
+"""
+import os
+import json
+import hashlib
+import argparse
+import threading
+import metrics
+from records import Record, KINDS
+
+RULES_PATH = os.getenv('REPUTATION_RULES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reputation_rules.json'))
+
+OPERATORS = {
+    'truthy': lambda v, _: bool(v),
+    'eq': lambda v, ref: v == ref,
+    'ne': lambda v, ref: v != ref,
+    'gt': lambda v, ref: isinstance(v, (int, float)) and v > ref,
+    'gte': lambda v, ref: isinstance(v, (int, float)) and v >= ref,
+    'lt': lambda v, ref: isinstance(v, (int, float)) and v < ref,
+    'lte': lambda v, ref: isinstance(v, (int, float)) and v <= ref,
+    'in': lambda v, ref: v in ref,
+    'contains': lambda v, ref: isinstance(v, (str, list, dict)) and ref in v,
+}
+
+_MISSING = object()
+
+
+def _parse_selector(selector):
+    """Split a selector into ('key'|'values'|'each'|'index'|'filter', arg) steps."""
+    steps = []
+    for part in selector.split('.'):
+        name, _, rest = part.partition('[')
+        if name == '*':
+            steps.append(('values', None))
+        elif name:
+            steps.append(('key', name))
+        rest = '[' + rest if rest else ''
+        while rest:
+            close = rest.index(']')
+            inner, rest = rest[1:close], rest[close + 1:]
+            if inner == '*':
+                steps.append(('each', None))
+            elif '=' in inner:
+                key, value = inner.split('=', 1)
+                steps.append(('filter', (key, value)))
+            else:
+                steps.append(('index', int(inner)))
+    return steps
+
+
+def _field(record, name):
+    # Unset or undeclared fields select nothing, like a missing dict key
+    return getattr(record, name, _MISSING) if name in type(record).__slots__ else _MISSING
+
+
+def _compile_step(kind, arg):
+    if kind == 'key':
+        def step(values):
+            found = []
+            for v in values:
+                if isinstance(v, dict):
+                    if arg in v:
+                        found.append(v[arg])
+                elif isinstance(v, Record):
+                    value = _field(v, arg)
+                    if value is not _MISSING:
+                        found.append(value)
+            return found
+    elif kind == 'values':
+        def step(values):
+            found = []
+            for v in values:
+                if isinstance(v, dict):
+                    found.extend(v.values())
+                elif isinstance(v, Record):
+                    found.extend(value for _, value in v.fields())
+            return found
+    elif kind == 'each':
+        def step(values):
+            return [x for v in values if isinstance(v, list) for x in v]
+    elif kind == 'index':
+        def step(values):
+            return [v[arg] for v in values if isinstance(v, list) and -len(v) <= arg < len(v)]
+    else:
+        key, expected = arg
+        # Records are matched on their class for [type=kind], on the field otherwise
+        record_type = KINDS.get(expected) if key == 'type' else None
+
+        def matches(x):
+            if isinstance(x, dict):
+                return str(x.get(key)) == expected
+            if isinstance(x, Record):
+                if key == 'type':
+                    return type(x) is record_type
+                value = _field(x, key)
+                return value is not _MISSING and str(value) == expected
+            return False
+
+        def step(values):
+            return [x for v in values if isinstance(v, list) for x in v if matches(x)]
+    return step
+
+
+def compile_selector(selector):
+    """Compile a selector string into ``fn(results) -> list of matched values``."""
+    steps = [_compile_step(kind, arg) for kind, arg in _parse_selector(selector)]
+
+    def select(results):
+        values = [results]
+        for step in steps:
+            values = step(values)
+            if not values:
+                break
+        return values
+    return select
+
+
+def compile_rule(rule):
+    """Compile one rule dict into ``fn(results) -> (factor, matches, points) | None``."""
+    select = compile_selector(rule['selector'])
+    op = OPERATORS[rule.get('op', 'truthy')]
+    ref = rule.get('value')
+    weight = rule['weight']
+    cap = rule.get('cap')
+    per_match = rule.get('per_match', False)
+    factor = rule['factor']
+    templated = '{count}' in factor
+
+    def evaluate(results):
+        matches = sum(1 for v in select(results) if op(v, ref))
+        if not matches:
+            return None
+        points = weight * matches if per_match else weight
+        if cap is not None:
+            points = min(cap, points)
+        return (factor.format(count=matches) if templated else factor), matches, points
+    evaluate.rule = rule
+    return evaluate
+
+
+class RuleSet:
+    """Compiled rules plus the version string recorded on scored cases."""
+
+    def __init__(self, spec, digest):
+        self.spec = spec
+        self.max_score = spec.get('max_score', 100)
+        self.version = f"{spec.get('version', 1)}-{digest[:8]}"
+        self.rules = [compile_rule(rule) for rule in spec.get('rules', [])]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        return cls(json.loads(raw), hashlib.sha256(raw).hexdigest())
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def load_rules(path=None):
+    """Return the compiled RuleSet for a rules file, recompiling only when it changes."""
+    path = os.path.abspath(path or RULES_PATH)
+    mtime = os.path.getmtime(path)
+    with _compiled_lock:
+        cached = _compiled.get(path)
+        metrics.cache_lookup('reputation_rules', bool(cached and cached[0] == mtime))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        ruleset = RuleSet.from_file(path)
+        _compiled[path] = (mtime, ruleset)
+        return ruleset
+
+
+def _results_of(payload):
+    # Accepts either a raw collector result or a full case/payload with 'results'
+    if isinstance(payload, dict) and 'results' in payload:
+        return payload['results']
+    return payload
 
 
 class ReputationEngine:
-    def score(self, payload):
-        # payload contains 'results' and other metadata
-        r = {'score': 0, 'factors': []}
-        results = payload.get('results') if isinstance(payload, dict) else payload
+    def __init__(self, rules_path=None):
+        self.ruleset = load_rules(rules_path)
+
+    @property
+    def rules_version(self):
+        return self.ruleset.version
+
+    def score(self, payload, explain=False):
+        # payload is either a collector's results or a case holding 'results'
+        return self._score(_results_of(payload), self.ruleset.rules, self.ruleset.max_score, explain)
+
+    def score_many(self, payloads, explain=False):
+        """Score many payloads in one pass with the same compiled rules."""
+        rules, max_score, score = self.ruleset.rules, self.ruleset.max_score, self._score
+        return [score(_results_of(p), rules, max_score, explain) for p in payloads]
+
+    def explain(self, payload):
+        return self.score(payload, explain=True)
+
+    def _score(self, results, rules, max_score, explain):
+        r = {'score': 0, 'factors': [], 'rules_version': self.ruleset.version}
+        if explain:
+            r['trace'] = []
         if not results:
             return r
-        # check email breaches
-        if isinstance(results, dict) and 'breaches' in results and results['breaches']:
-            r['score'] += 40
-            r['factors'].append('email_breach')
-        # username social presence
-        if isinstance(results, list):
-            hits = sum(1 for x in results if x.get('exists'))
-            if hits:
-                r['score'] += min(30, hits * 5)
-                r['factors'].append(f'social_hits_{hits}')
-        # IP blacklists
-        if isinstance(results, dict) and results.get('blacklist'):
-            r['score'] += 20
-            r['factors'].append('ip_blacklist')
-
-        r['score'] = max(0, min(100, r['score']))
+        total = 0
+        for rule in rules:
+            fired = rule(results)
+            if fired is None:
+                continue
+            factor, matches, points = fired
+            total += points
+            r['factors'].append(factor)
+            if explain:
+                r['trace'].append({'factor': factor, 'selector': rule.rule['selector'],
+                                   'matches': matches, 'points': points})
+        r['score'] = max(0, min(max_score, total))
         return r
+
+
+def score(results):
+    """Convenience wrapper scoring a single payload with the default rules."""
+    return ReputationEngine().score(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Explain reputation scores for stored cases')
+    parser.add_argument('cases', nargs='+', help='Case JSON files')
+    parser.add_argument('--rules', default=None, help='Rules file (default: reputation_rules.json)')
+    args = parser.parse_args()
+
+    engine = ReputationEngine(args.rules)
+    print(f'[reputation] Rules version {engine.rules_version}')
+    for path in args.cases:
+        with open(path, 'r') as f:
+            case = json.load(f)
+        result = engine.explain(case)
+        print(f"\n{case.get('case_id', path)}: score {result['score']}")
+        for entry in result['trace']:
+            print(f"  +{entry['points']:<3} {entry['factor']}  ({entry['matches']} x {entry['selector']})")
+
+
+if __name__ == '__main__':
+    main()
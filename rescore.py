@@ -0,0 +1,185 @@
+"""Offline re-scoring of stored cases after reputation rules or feeds change.
+
+Walks ``reports/*.json`` lazily, recomputes each case's ``reputation`` block from
+its stored results (no network access) across a process pool (a bounded number
+of chunks in flight), and rewrites only the cases whose score or factors changed
+(and updates the dashboard score histogram for them) or whose
+``reputation.rules_version`` is not the current one. Every case checked is recorded with
+the rules version in ``reports/_index/rescore_state.json`` so the next run only
+looks at new or modified cases unless the rules change again.
+
+Usage:
+    python rescore.py                 # rescore with reputation_rules.json
+    python rescore.py --rules new_rules.json --workers 8
+    python rescore.py --dry-run       # report changes without writing
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from reputation_engine import ReputationEngine
+from case_stats import CaseStats
+import records
+import shared_files
+
+CHUNK_SIZE = 64  # cases per task sent to a worker
+_engine = None
+
+
+def _init_worker(rules_path):
+    global _engine
+    _engine = ReputationEngine(rules_path)
+
+
+def _iter_case_files(reports_dir):
+    with os.scandir(reports_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                yield entry.path, entry.stat().st_mtime
+
+
+def _rescore_file(job):
+    path, dry_run = job
+    try:
+        with open(path, 'r') as f:
+            case = json.load(f)
+    except (OSError, ValueError) as e:
+        return {'path': path, 'error': str(e)}
+    if not isinstance(case, dict):
+        return {'path': path, 'error': f'not a case object ({type(case).__name__})'}
+    # Score the same results IntelDB.get_case serves, whatever version they were stored in
+    records.upgrade(case)
+    old = case.get('reputation') or {}
+    new = _engine.score(case)
+    changed = old.get('score') != new['score'] or old.get('factors') != new['factors']
+    # Same score under new rules: still rewritten, so the case records the rules it was scored with
+    restamp = not changed and old.get('rules_version') != new['rules_version']
+    if (changed or restamp) and not dry_run:
+        case['reputation'] = new
+        tmp_path = shared_files.tmp_path(path)
+        with open(tmp_path, 'w') as f:
+            json.dump(case, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+    return {
+        'path': path,
+        'case_id': case.get('case_id'),
+        'old_score': old.get('score'),
+        'new_score': new['score'],
+        'changed': changed,
+        'restamped': restamp,
+        'mtime': os.path.getmtime(path),
+    }
+
+
+def _rescore_chunk(jobs):
+    return [_rescore_file(job) for job in jobs]
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Rescorer:
+    """Streams stored cases through a process pool and rewrites stale scores."""
+
+    def __init__(self, reports_dir='reports', rules_path=None, workers=None):
+        self.reports_dir = reports_dir
+        self.rules_path = rules_path
+        self.workers = workers or os.cpu_count() or 1
+        self.rules_version = ReputationEngine(rules_path).rules_version
+        self.state_path = os.path.join(reports_dir, '_index', 'rescore_state.json')
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = shared_files.tmp_path(self.state_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _stream(self, pool, jobs):
+        """Outcomes of ``jobs``, with at most ``workers * 2`` chunks in flight, so memory stays
+        flat however large the archive (``Executor.map`` would submit every job up front)."""
+        chunks = _chunks(jobs, CHUNK_SIZE)
+        in_flight = set()
+        for chunk in chunks:
+            in_flight.add(pool.submit(_rescore_chunk, chunk))
+            if len(in_flight) < self.workers * 2:
+                continue
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+        for future in as_completed(in_flight):
+            yield from future.result()
+
+    def run(self, dry_run=False, force=False):
+        state = self._load_state()
+        version = self.rules_version
+
+        def pending():
+            for path, mtime in _iter_case_files(self.reports_dir):
+                seen = state.get(os.path.basename(path))
+                if not force and seen and seen[0] == version and seen[1] >= mtime:
+                    continue
+                yield path, dry_run
+
+        summary = {'rules_version': version, 'checked': 0, 'changed': 0, 'restamped': 0, 'errors': 0,
+                   'changes': []}
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.rules_path,)) as pool:
+            for outcome in self._stream(pool, pending()):
+                if 'error' in outcome:
+                    summary['errors'] += 1
+                    print(f"[rescore] Skipped {outcome['path']}: {outcome['error']}")
+                    continue
+                summary['checked'] += 1
+                summary['restamped'] += outcome['restamped']
+                if outcome['changed']:
+                    summary['changed'] += 1
+                    summary['changes'].append((outcome['case_id'], outcome['old_score'], outcome['new_score']))
+                if not dry_run:
+                    state[os.path.basename(outcome['path'])] = [version, outcome['mtime']]
+        if not dry_run:
+            self._save_state(state)
+            stats = CaseStats.for_dir(os.path.join(self.reports_dir, '_index'))
+            for case_id, _, new_score in summary['changes']:
+                stats.rescored(case_id, new_score)
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score stored IntelTrace cases offline')
+    parser.add_argument('--reports-dir', default='reports')
+    parser.add_argument('--rules', default=None, help='Rules file (default: reputation_rules.json)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without rewriting cases')
+    parser.add_argument('--force', action='store_true', help='Recheck cases already scored with these rules')
+    args = parser.parse_args()
+
+    summary = Rescorer(args.reports_dir, args.rules, args.workers).run(args.dry_run, args.force)
+    for case_id, old, new in summary['changes']:
+        print(f'[rescore] {case_id}: {old} -> {new}')
+    print(f"[rescore] Rules {summary['rules_version']}: checked {summary['checked']}, "
+          f"{'would change' if args.dry_run else 'rewrote'} {summary['changed']}, "
+          f"{'would restamp' if args.dry_run else 'restamped'} {summary['restamped']} (same score, new rules), "
+          f"errors {summary['errors']} in {summary['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
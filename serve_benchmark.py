@@ -0,0 +1,171 @@
+"""Load benchmark of the web UI: development server vs. production WSGI serving.
+
+Starts ``stub_services`` on 127.0.0.1, seeds a temporary reports directory
+with investigations run against the stubs, then launches the UI under each
+server in turn (``python ui_engine.py``, ``wsgi.py`` with waitress and with
+gunicorn) and drives the same open-loop request mix at it with
+``load_generator``: dashboard, report list, paginated APIs, report pages and
+bulk fetches. Prints throughput, errors and coordinated-omission corrected
+latency percentiles per server.
+
+Usage:
+    python serve_benchmark.py --rate 200 --duration 20
+    python serve_benchmark.py --servers dev,gunicorn --workers 4 --threads 8 --json serve.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import tempfile
+import argparse
+import contextlib
+import subprocess
+import urllib.request
+from stub_services import StubServices, StubConfig
+from stress_simulator import LocalhostStressSimulator
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED_TYPES = ('ip', 'email', 'phone', 'username', 'ddos')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_cases(stubs, per_type):
+    """Run investigations against the stubs in the current directory; return their case ids."""
+    from benchmark import Benchmark
+    os.environ.update(stubs.env())
+    import main as pipeline
+    target = Benchmark(stubs).target
+    case_ids = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for target_type in SEED_TYPES:
+            for i in range(per_type):
+                case_ids.append(pipeline.run_investigation(target_type, target(target_type, i), 'Benchmark')['case_id'])
+    return case_ids
+
+
+def request_mix(case_ids):
+    paths = ['/', '/dashboard', '/reports', '/api/cases?limit=50', '/api/cases?q=user&limit=50',
+             '/api/reports/bulk?ids=' + ','.join(case_ids[:10])]
+    for case_id in case_ids[:20]:
+        paths += [f'/reports/{case_id}', f'/api/reports/{case_id}/results?limit=50']
+    return paths
+
+
+def server_command(name, port, args):
+    if name == 'dev':
+        return [sys.executable, os.path.join(HERE, 'ui_engine.py')]
+    return [sys.executable, os.path.join(HERE, 'wsgi.py'), '--server', name, '--port', str(port),
+            '--workers', str(args.workers), '--threads', str(args.threads)]
+
+
+def wait_ready(port, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def stop(proc):
+    # The dev server's reloader runs the app in a child process, so signal the whole group
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def run_server(name, paths, env, args):
+    port = free_port()
+    log_path = os.path.join(os.getcwd(), f'serve_{name}.log')
+    with open(log_path, 'w') as log:
+        proc = subprocess.Popen(server_command(name, port, args), env=dict(env, UI_PORT=str(port)),
+                                stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        if not wait_ready(port, proc):
+            return {'error': f'server did not start (see {log_path})'}
+        simulator = LocalhostStressSimulator()
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = simulator.simulate_http_load(port=port, duration=args.duration, rate=args.rate,
+                                                  schedule='poisson', paths=paths, concurrency=args.concurrency,
+                                                  timeout=args.timeout, seed=1)
+    finally:
+        stop(proc)
+    stats, latency = report['statistics'], report.get('latency_corrected', {})
+    return {
+        'requests': stats['attempts'],
+        'ok_per_s': stats['avg_rate'],
+        'errors': stats['errors'],
+        'status_codes': report['load']['status_codes'],
+        'p50_ms': latency.get('p50_ms'),
+        'p90_ms': latency.get('p90_ms'),
+        'p99_ms': latency.get('p99_ms'),
+        'max_ms': latency.get('max_ms'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the dev server with production WSGI serving under load')
+    parser.add_argument('--servers', default='dev,waitress,gunicorn', help='Comma-separated: dev, waitress, gunicorn')
+    parser.add_argument('--rate', type=float, default=100, help='Offered requests per second (Poisson)')
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per worker (waitress/gunicorn)')
+    parser.add_argument('--cases-per-type', type=int, default=8, help='Seeded investigations per target type')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary reports directory and server logs')
+    args = parser.parse_args()
+
+    stubs = StubServices(StubConfig(latency_ms=5, jitter_ms=1, seed=1)).start()
+    workdir = tempfile.mkdtemp(prefix='inteltrace-serve-')
+    cwd = os.getcwd()
+    results = {}
+    try:
+        os.chdir(workdir)
+        paths = request_mix(seed_cases(stubs, args.cases_per_type))
+        env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        for name in [s for s in args.servers.split(',') if s]:
+            print(f'[serve] {name}: {args.rate} req/s for {args.duration}s over {len(paths)} paths')
+            results[name] = run_server(name, paths, env, args)
+    finally:
+        os.chdir(cwd)
+        stubs.stop()
+        if args.keep:
+            print(f'[serve] Kept {workdir} (cases and server logs)')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'server':<10}{'requests':>10}{'ok/s':>9}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        if 'error' in r:
+            print(f"{name:<10}  {r['error']}")
+            continue
+        print(f"{name:<10}{r['requests']:>10}{r['ok_per_s']:>9}{r['errors']:>8}{r['p50_ms']:>10}"
+              f"{r['p90_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'servers': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Process-safe primitives for the append-only indexes under ``reports/``.
+
+The entity graph, timeline buckets and dashboard statistics are JSON-lines
+logs that several UI worker processes append to and tail at the same time.
+``append`` writes a record with one ``O_APPEND`` write under an exclusive
+``flock`` so concurrent writers never interleave partial lines, and
+``identity`` lets a reader notice that a log was rebuilt (replaced by a new
+file) even when the new file is already larger than what it had read.
+``locked`` serialises read-modify-write updates of small JSON files and
+rebuilds; ``appends_blocked`` lets a rebuild replace a log without losing
+lines appended meanwhile.
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+
+def _replaced(fd, path):
+    try:
+        return os.fstat(fd).st_ino != os.stat(path).st_ino
+    except OSError:
+        return True
+
+
+def append(path, data):
+    """Append ``data`` (str) to ``path`` atomically with respect to other appenders."""
+    payload = data.encode('utf-8')
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if fcntl is None:
+            break
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        # A rebuild may have replaced the file while we waited: write to the new one
+        if not _replaced(fd, path):
+            break
+        os.close(fd)
+    try:
+        view = memoryview(payload)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        # Closing the descriptor also releases the lock
+        os.close(fd)
+
+
+def identity(path):
+    """(inode, size) of ``path``, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size
+
+
+def tmp_path(path):
+    """Per-process temporary name for rewriting ``path``."""
+    return f'{path}.{os.getpid()}.tmp'
+
+
+@contextmanager
+def appends_blocked(path):
+    """Hold the lock ``append`` takes on ``path`` (creating it if needed) for the block.
+
+    A rebuild scans its sources and replaces the log inside this block;
+    appenders that waited meanwhile then write to the new file, so no
+    line is lost (at worst one is applied twice, which the logs tolerate).
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on ``path + '.lock'`` across processes for the block."""
+    fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
@@ -353,3 +353,107 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   });
 });
+
+// Escape text for insertion into HTML strings
+function escapeHtml(value) {
+  return String(value === undefined || value === null ? '' : value)
+    .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+}
+
+// Virtualised table: rows are fetched a page at a time from a JSON endpoint
+// ({total, items}) and only the rows in view, plus a small margin, exist in
+// the DOM, so a list of 100k cases renders as fast as a list of ten.
+class VirtualTable {
+  constructor(container, options) {
+    this.columns = options.columns;        // [{title, width, render(item, index) -> HTML}]
+    this.fetchPage = options.fetchPage;    // (offset, limit) => Promise<{total, items}>
+    this.rowHeight = options.rowHeight || 38;
+    this.pageSize = options.pageSize || 100;
+    this.overscan = options.overscan || 8;
+    this.onRowClick = options.onRowClick;
+    this.onTotal = options.onTotal;
+    this.generation = 0;
+
+    const template = this.columns.map(c => c.width || '1fr').join(' ');
+    container.classList.add('vtable');
+    container.innerHTML =
+      `<div class="vtable-header" style="grid-template-columns:${template}">` +
+      this.columns.map(c => `<div>${escapeHtml(c.title)}</div>`).join('') + '</div>' +
+      `<div class="vtable-viewport" style="height:${options.height || 520}px">` +
+      '<div class="vtable-spacer"></div><div class="vtable-rows"></div></div>';
+    this.template = template;
+    this.viewport = container.querySelector('.vtable-viewport');
+    this.spacer = container.querySelector('.vtable-spacer');
+    this.rows = container.querySelector('.vtable-rows');
+
+    let queued = false;
+    this.viewport.addEventListener('scroll', () => {
+      if (queued) return;
+      queued = true;
+      requestAnimationFrame(() => { queued = false; this.render(); });
+    });
+    this.rows.addEventListener('click', (e) => {
+      const row = e.target.closest('.vtable-row');
+      if (!row || !this.onRowClick || e.target.closest('a')) return;
+      const index = Number(row.dataset.index);
+      const item = this.item(index);
+      if (item !== undefined) this.onRowClick(item, index, row);
+    });
+    this.reload();
+  }
+
+  reload() {
+    this.generation += 1;
+    this.pages = new Map();
+    this.total = 0;
+    this.spacer.style.height = '0px';
+    this.rows.innerHTML = '';
+    this.viewport.scrollTop = 0;
+    this.load(0);
+  }
+
+  load(page) {
+    if (this.pages.has(page)) return;
+    const generation = this.generation;
+    this.pages.set(page, null);  // in flight
+    this.fetchPage(page * this.pageSize, this.pageSize).then(data => {
+      if (generation !== this.generation) return;
+      this.pages.set(page, data.items);
+      if (data.total !== this.total || page === 0) {
+        this.total = data.total;
+        this.spacer.style.height = (this.total * this.rowHeight) + 'px';
+        if (this.onTotal) this.onTotal(this.total);
+      }
+      this.render();
+    }).catch(() => {
+      if (generation === this.generation) this.pages.delete(page);
+    });
+  }
+
+  item(index) {
+    const page = this.pages.get(Math.floor(index / this.pageSize));
+    return page ? page[index % this.pageSize] : undefined;
+  }
+
+  render() {
+    const top = this.viewport.scrollTop;
+    const first = Math.max(0, Math.floor(top / this.rowHeight) - this.overscan);
+    const last = Math.min(this.total, Math.ceil((top + this.viewport.clientHeight) / this.rowHeight) + this.overscan);
+    let html = '';
+    for (let index = first; index < last; index++) {
+      const item = this.item(index);
+      if (item === undefined) this.load(Math.floor(index / this.pageSize));
+      html += `<div class="vtable-row" data-index="${index}" ` +
+        `style="height:${this.rowHeight}px;grid-template-columns:${this.template}">` +
+        this.columns.map(c => `<div>${item === undefined ? '…' : c.render(item, index)}</div>`).join('') +
+        '</div>';
+    }
+    this.rows.style.transform = `translateY(${first * this.rowHeight}px)`;
+    this.rows.innerHTML = html;
+  }
+}
+
+function scoreClass(score) {
+  return score > 50 ? 'high' : (score > 20 ? 'medium' : 'low');
+}
@@ -0,0 +1,225 @@
+"""Declarative scenarios for localhost stress tests.
+
+A scenario file (JSON, or YAML when PyYAML is installed) lists the phases a
+``ddos`` scan of 127.0.0.1 runs, in order:
+
+    {
+      "name": "ui_endpoints",
+      "port": 5000,
+      "phases": [
+        {"name": "steady", "mode": "http_load", "duration": 20, "rate": 100,
+         "schedule": "poisson", "paths": {"/": 2, "/api/reports": 4}}
+      ]
+    }
+
+``mode`` selects a ``LocalhostStressSimulator.simulate_<mode>`` method and the
+remaining keys are its arguments; a phase ``port`` overrides the scenario's.
+``paths`` may be a list or a {path: weight} mix, and ``processes`` shards the
+phase across that many worker processes. Which scenario DDOSIntel runs
+is set with STRESS_SCENARIO (default: scenarios/default.json).
+
+Usage:
+    python stress_scenarios.py run scenarios/ui_endpoints.json     # saved as a normal case
+    python stress_scenarios.py compare IT-1234abcd IT-5678ef01 --tolerance 0.1
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+from stress_simulator import LocalhostStressSimulator
+from timeline_builder import step
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+DEFAULT_SCENARIO = os.path.join(SCENARIO_DIR, 'default.json')
+MODES = ('syn_flood', 'udp_flood', 'http_flood', 'http_load', 'slowloris', 'icmp_flood')
+LATENCY_KEYS = ('p50_ms', 'p90_ms', 'p99_ms', 'p99_9_ms')
+
+
+def _expand_paths(paths):
+    if isinstance(paths, dict):
+        expanded = []
+        for path, weight in paths.items():
+            expanded.extend([path] * max(0, int(weight)))
+        paths = expanded
+    if isinstance(paths, str):
+        paths = [paths]
+    if not paths or not all(isinstance(p, str) and p.startswith('/') for p in paths):
+        raise ValueError(f'paths must be absolute request paths: {paths!r}')
+    return paths
+
+
+def load_scenario(path):
+    """Read and validate a scenario file; phase arguments are checked against the simulator."""
+    with open(path, 'r') as f:
+        if path.endswith(('.yml', '.yaml')):
+            if yaml is None:
+                raise ValueError('YAML scenarios need PyYAML (pip install pyyaml)')
+            scenario = yaml.safe_load(f)
+        else:
+            scenario = json.load(f)
+    if not isinstance(scenario, dict) or not scenario.get('phases'):
+        raise ValueError(f'{path}: a scenario needs a non-empty "phases" list')
+    scenario.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    default_port = scenario.get('port', 5000)
+    phases = []
+    for i, phase in enumerate(scenario['phases']):
+        phase = dict(phase)
+        mode = phase.pop('mode', None)
+        if mode not in MODES:
+            raise ValueError(f'{path}: phase {i + 1} has unknown mode {mode!r} (expected one of {", ".join(MODES)})')
+        name = phase.pop('name', mode)
+        processes = int(phase.pop('processes', 1))
+        phase.setdefault('port', default_port)
+        if 'paths' in phase:
+            phase['paths'] = _expand_paths(phase['paths'])
+        accepted = inspect.signature(getattr(LocalhostStressSimulator, f'simulate_{mode}')).parameters
+        unknown = sorted(set(phase) - set(accepted))
+        if unknown:
+            raise ValueError(f'{path}: phase {name!r} ({mode}) does not accept {", ".join(unknown)}')
+        phases.append({'name': name, 'mode': mode, 'processes': processes, 'args': phase})
+    scenario['phases'] = phases
+    scenario['path'] = path
+    return scenario
+
+
+def run_scenario(scenario, target='127.0.0.1', simulator=None):
+    """Run every phase; return case results (info, one report per phase, summary)."""
+    simulator = simulator or LocalhostStressSimulator()
+    phases = scenario['phases']
+    results = [{
+        'type': 'stress_test_info',
+        'target': target,
+        'scope': 'localhost_only',
+        'purpose': 'Load testing and traffic pattern simulation',
+        'scenario': scenario['name'],
+        'scenario_description': scenario.get('description', ''),
+        'test_port': scenario.get('port', 5000),
+        'disclaimer': 'Tests restricted to 127.0.0.1 for safety'
+    }]
+    total_duration = 0
+    for i, phase in enumerate(phases, 1):
+        print(f"\n[ddos_intel] Test {i}/{len(phases)}: {phase['name']} ({phase['mode']})")
+        total_duration += phase['args'].get('duration', 10)
+        try:
+            with step('ddos', phase['mode']):
+                if phase['processes'] > 1:
+                    report = simulator.simulate_sharded(phase['mode'], phase['processes'], **phase['args'])
+                else:
+                    report = getattr(simulator, f"simulate_{phase['mode']}")(**phase['args'])
+            report['phase'] = phase['name']
+            report['phase_config'] = dict(phase['args'], mode=phase['mode'], processes=phase['processes'])
+            results.append(report)
+        except Exception as e:
+            results.append({
+                'type': 'stress_test_error',
+                'test': phase['name'],
+                'phase': phase['name'],
+                'error': str(e)
+            })
+    results.append({
+        'type': 'stress_test_summary',
+        'total_tests_run': len(phases),
+        'scenario': scenario['name'],
+        'target': '127.0.0.1',
+        'total_duration': f'{total_duration} seconds',
+        'recommendations': [
+            'Monitor application performance during load',
+            'Check connection pooling and timeout settings',
+            'Verify rate limiting is working correctly',
+            'Review server resource usage (CPU, memory, connections)',
+            'Test with production-like traffic patterns'
+        ]
+    })
+    return results
+
+
+def _load_case(ref, reports_dir='reports'):
+    path = ref if os.path.exists(ref) else os.path.join(reports_dir, f'{ref}.json')
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def phase_metrics(case):
+    """{phase name: {'throughput', latency percentiles}} from a stored stress-test case."""
+    phases = {}
+    for item in case.get('results', []):
+        if not isinstance(item, dict) or item.get('type') != 'stress_simulation_report':
+            continue
+        name = item.get('phase') or item.get('attack_type')
+        latency = item.get('latency_corrected') or item.get('latency') or {}
+        entry = {'throughput': item.get('statistics', {}).get('avg_rate', 0.0)}
+        for key in LATENCY_KEYS:
+            if key in latency:
+                entry[key] = latency[key]
+        phases[name] = entry
+    return phases
+
+
+def compare(baseline, current, tolerance=0.1):
+    """Per-phase deltas between two cases; regressions are throughput drops or
+    latency increases beyond ``tolerance`` (0.1 = 10%)."""
+    old_phases, new_phases = phase_metrics(baseline), phase_metrics(current)
+    rows, regressions = [], []
+    for name, new in new_phases.items():
+        old = old_phases.get(name)
+        if not old:
+            continue
+        for metric, new_value in new.items():
+            old_value = old.get(metric)
+            if old_value is None:
+                continue
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            worse = -change if metric == 'throughput' else change
+            regressed = worse > tolerance
+            rows.append((name, metric, old_value, new_value, round(change * 100, 1), regressed))
+            if regressed:
+                regressions.append((name, metric, old_value, new_value))
+    return rows, regressions
+
+
+def _run(args):
+    # DDOSIntel reads STRESS_SCENARIO when constructed, so set it before the pipeline runs
+    load_scenario(args.scenario)
+    os.environ['STRESS_SCENARIO'] = os.path.abspath(args.scenario)
+    import main as pipeline
+    report = pipeline.run_investigation('ddos', '127.0.0.1', args.investigator)
+    print(f"[scenario] Saved as case {report['case_id']}")
+
+
+def _compare(args):
+    rows, regressions = compare(_load_case(args.baseline), _load_case(args.current), args.tolerance)
+    print(f"{'phase':<22}{'metric':<12}{'baseline':>12}{'current':>12}{'change %':>10}")
+    for name, metric, old, new, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{name:<22}{metric:<12}{old:>12}{new:>12}{change:>10}{flag}')
+    if regressions:
+        print(f'[scenario] {len(regressions)} regression(s) beyond {args.tolerance:.0%}')
+        sys.exit(1)
+    print('[scenario] No regressions')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run and compare localhost stress-test scenarios')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='Run a scenario and save it as a ddos case for 127.0.0.1')
+    run.add_argument('scenario')
+    run.add_argument('--investigator', default=None)
+    cmp_ = sub.add_parser('compare', help='Diff throughput and latency percentiles of two runs')
+    cmp_.add_argument('baseline', help='Case id or case JSON path')
+    cmp_.add_argument('current', help='Case id or case JSON path')
+    cmp_.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative change (0.1 = 10%%)')
+    args = parser.parse_args()
+    if args.command == 'run':
+        _run(args)
+    else:
+        _compare(args)
+
+
+if __name__ == '__main__':
+    main()
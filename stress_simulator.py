@@ -9,11 +9,114 @@ This module simulates various traffic patterns on localhost for:
 LEGAL NOTICE: This tool is restricted to localhost (127.0.0.1) only.
 Any attempt to target external hosts will be blocked.
 """
+import os
+import queue
 import socket
+import asyncio
 import threading
+import multiprocessing
 import time
 import random
 from datetime import datetime
+from latency_histogram import LatencyHistogram
+from load_generator import OpenLoopGenerator, arrivals
+import dns_cache
+
+# Arguments split between processes by simulate_sharded (the rest are copied)
+SHARDED_ARGS = ('rate', 'end_rate', 'connections', 'concurrency')
+
+# What each mode's achieved rate counts (successful operations per second)
+RATE_UNITS = {
+    'SYN Flood': 'connections/s',
+    'UDP Flood': 'packets/s',
+    'HTTP Flood': 'requests/s',
+    'HTTP Load (open loop)': 'requests/s',
+    'Slowloris': 'keep-alive headers/s',
+    'ICMP Flood (simulated)': 'echoes/s',
+}
+
+
+class WorkerCounters:
+    """Counters owned by a single worker thread.
+
+    Only the owning thread writes, so increments need no lock; the simulator
+    sums every worker's counters once the run is over.
+
+    ``latency`` is measured from when a probe actually started;
+    ``latency_corrected`` from when the fixed-rate schedule intended it to
+    start, so time spent waiting behind a stalled server is not omitted
+    (coordinated-omission correction).
+    """
+    __slots__ = ('attempts', 'successes', 'errors', 'packets_sent',
+                 'connections_made', 'bytes_sent', 'series', 'latency',
+                 'latency_corrected', '_start')
+
+    def __init__(self, start):
+        self.attempts = 0
+        self.successes = 0
+        self.errors = 0
+        self.packets_sent = 0
+        self.connections_made = 0
+        self.bytes_sent = 0
+        self.series = {}  # second offset -> [successes, errors]
+        self.latency = LatencyHistogram()
+        self.latency_corrected = LatencyHistogram()
+        self._start = start
+
+    def _tick(self, index):
+        second = int(time.monotonic() - self._start)
+        bucket = self.series.get(second)
+        if bucket is None:
+            bucket = self.series[second] = [0, 0]
+        bucket[index] += 1
+
+    def success(self, packets=0, connections=0, nbytes=0):
+        self.attempts += 1
+        self.successes += 1
+        self.packets_sent += packets
+        self.connections_made += connections
+        self.bytes_sent += nbytes
+        self._tick(0)
+
+    def observe(self, started, intended=None):
+        """Time a completed probe that began at ``started`` (time.monotonic)."""
+        now = time.monotonic()
+        self.latency.record_seconds(now - started)
+        self.latency_corrected.record_seconds(now - (started if intended is None else intended))
+
+    def error(self):
+        self.attempts += 1
+        self.errors += 1
+        self._tick(1)
+
+
+def _split(value, parts, index):
+    """Share ``index`` of ``value`` split ``parts`` ways (integers stay integers)."""
+    if isinstance(value, int):
+        return value // parts + (1 if index < value % parts else 0)
+    return value / parts
+
+
+def _idle(shard, kwargs):
+    """True if splitting ``kwargs`` left this shard no rate or connections, or no concurrency."""
+    split = [k for k in SHARDED_ARGS if kwargs.get(k)]
+    if 'concurrency' in split and not shard['concurrency']:
+        return True
+    work = [shard[k] for k in split if k != 'concurrency']
+    return bool(work) and not any(work)
+
+
+def _shard_worker(mode, kwargs, barrier, results):
+    """Entry point of one simulate_sharded process."""
+    simulator = LocalhostStressSimulator()
+    try:
+        barrier.wait(timeout=60)
+        report = getattr(simulator, f'simulate_{mode}')(**kwargs)
+        results.put({'attack_type': report['attack_type'], 'workers': simulator._workers,
+                     'start': simulator.stats['start_time'], 'end': simulator.stats['end_time'],
+                     'configured_rate': simulator._configured_rate, 'load': report.get('load')})
+    except Exception as e:
+        results.put({'error': f'{type(e).__name__}: {e}'})
 
 
 class LocalhostStressSimulator:
@@ -21,8 +124,9 @@ class LocalhostStressSimulator:
     
     ALLOWED_TARGETS = ['127.0.0.1', 'localhost', '::1']
     
-    def __init__(self):
+    def __init__(self, latency_csv_dir=None):
         self.active_threads = []
+        self.latency_csv_dir = latency_csv_dir
         self.stats = {
             'packets_sent': 0,
             'connections_made': 0,
@@ -31,6 +135,59 @@ class LocalhostStressSimulator:
             'end_time': None
         }
         self.stop_flag = False
+        self._workers = []
+        self._workers_lock = threading.Lock()
+        self._started = time.monotonic()
+        self._configured_rate = None
+
+    def _begin(self, rate=None):
+        """Reset counters for a new run."""
+        self.stop_flag = False
+        self._workers = []
+        self._started = time.monotonic()
+        self._configured_rate = rate
+        self.stats = {
+            'packets_sent': 0,
+            'connections_made': 0,
+            'errors': 0,
+            'start_time': datetime.now(),
+            'end_time': None
+        }
+        return self._started
+
+    def _counters(self):
+        counters = WorkerCounters(self._started)
+        with self._workers_lock:
+            self._workers.append(counters)
+        return counters
+
+    def _schedule(self, end_time, interval):
+        """Yield each slot's intended start, one per ``interval`` seconds, until ``end_time``.
+
+        Slots are fixed ahead of time, so a slow operation shortens the next
+        wait instead of pushing every later slot back.
+        """
+        next_at = time.monotonic()
+        while not self.stop_flag:
+            now = time.monotonic()
+            if now >= end_time:
+                return
+            if next_at > now:
+                time.sleep(min(next_at, end_time) - now)
+                continue
+            yield next_at
+            next_at += interval
+
+    def _run_workers(self, worker, num_threads):
+        threads = []
+        for _ in range(num_threads):
+            t = threading.Thread(target=worker, daemon=True)
+            t.start()
+            threads.append(t)
+            self.active_threads.append(t)
+        for t in threads:
+            t.join()
+        return num_threads
 
     def validate_target(self, target):
         """Ensure target is localhost only."""
@@ -38,7 +195,7 @@ class LocalhostStressSimulator:
         try:
             if target.lower() == 'localhost':
                 return True
-            resolved = socket.gethostbyname(target)
+            resolved = dns_cache.gethostbyname(target)
             if resolved in ['127.0.0.1', '::1'] or resolved.startswith('127.'):
                 return True
         except Exception:
@@ -56,33 +213,25 @@ class LocalhostStressSimulator:
         print(f"[stress] Starting SYN flood simulation on 127.0.0.1:{port}")
         print(f"[stress] Duration: {duration}s, Rate: {rate} conn/s")
         
-        self.stats['start_time'] = datetime.now()
-        self.stop_flag = False
-        end_time = time.time() + duration
+        end_time = self._begin(rate) + duration
+        # Launch multiple threads; together they issue ``rate`` connections/s
+        num_threads = min(10, rate // 10 + 1)
         
         def worker():
-            while time.time() < end_time and not self.stop_flag:
+            counters = self._counters()
+            for slot in self._schedule(end_time, num_threads / rate):
+                started = time.monotonic()
                 try:
                     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                     sock.settimeout(0.5)
                     sock.connect(('127.0.0.1', port))
-                    self.stats['connections_made'] += 1
+                    counters.observe(started, slot)
                     sock.close()
+                    counters.success(connections=1)
                 except Exception:
-                    self.stats['errors'] += 1
-                time.sleep(1.0 / rate)
-        
-        # Launch multiple threads
-        num_threads = min(10, rate // 10 + 1)
-        for _ in range(num_threads):
-            t = threading.Thread(target=worker, daemon=True)
-            t.start()
-            self.active_threads.append(t)
-        
-        # Wait for completion
-        for t in self.active_threads:
-            t.join()
+                    counters.error()
         
+        self._run_workers(worker, num_threads)
         self.stats['end_time'] = datetime.now()
         return self._generate_report('SYN Flood')
 
@@ -98,52 +247,41 @@ class LocalhostStressSimulator:
         print(f"[stress] Starting UDP flood simulation on 127.0.0.1:{port}")
         print(f"[stress] Duration: {duration}s, Rate: {rate} pkt/s, Size: {packet_size}B")
         
-        self.stats['start_time'] = datetime.now()
-        self.stop_flag = False
-        end_time = time.time() + duration
+        end_time = self._begin(rate) + duration
+        num_threads = min(5, rate // 20 + 1)
         
         def worker():
+            counters = self._counters()
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             payload = b'X' * packet_size
             
-            while time.time() < end_time and not self.stop_flag:
+            for _ in self._schedule(end_time, num_threads / rate):
                 try:
                     sock.sendto(payload, ('127.0.0.1', port))
-                    self.stats['packets_sent'] += 1
+                    counters.success(packets=1, nbytes=packet_size)
                 except Exception:
-                    self.stats['errors'] += 1
-                time.sleep(1.0 / rate)
+                    counters.error()
             
             sock.close()
         
-        # Launch multiple threads
-        num_threads = min(5, rate // 20 + 1)
-        for _ in range(num_threads):
-            t = threading.Thread(target=worker, daemon=True)
-            t.start()
-            self.active_threads.append(t)
-        
-        # Wait for completion
-        for t in self.active_threads:
-            t.join()
-        
+        self._run_workers(worker, num_threads)
         self.stats['end_time'] = datetime.now()
         return self._generate_report('UDP Flood')
 
-    def simulate_http_flood(self, port=8080, duration=10, rate=50):
+    def simulate_http_flood(self, port=8080, duration=10, rate=50, paths=('/',)):
         """Simulate HTTP flood pattern on localhost web server.
         
         Args:
             port: Target HTTP port on localhost
             duration: Test duration in seconds
             rate: Requests per second
+            paths: Request paths, picked at random per request
         """
         print(f"[stress] Starting HTTP flood simulation on 127.0.0.1:{port}")
         print(f"[stress] Duration: {duration}s, Rate: {rate} req/s")
         
-        self.stats['start_time'] = datetime.now()
-        self.stop_flag = False
-        end_time = time.time() + duration
+        end_time = self._begin(rate) + duration
+        num_threads = min(5, rate // 10 + 1)
         
         user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
@@ -152,7 +290,9 @@ class LocalhostStressSimulator:
         ]
         
         def worker():
-            while time.time() < end_time and not self.stop_flag:
+            counters = self._counters()
+            for slot in self._schedule(end_time, num_threads / rate):
+                started = time.monotonic()
                 try:
                     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                     sock.settimeout(2)
@@ -160,33 +300,62 @@ class LocalhostStressSimulator:
                     
                     # Send HTTP GET request
                     ua = random.choice(user_agents)
-                    request = f"GET /?test={random.randint(1000,9999)} HTTP/1.1\r\n"
+                    path = random.choice(paths)
+                    sep = '&' if '?' in path else '?'
+                    request = f"GET {path}{sep}test={random.randint(1000,9999)} HTTP/1.1\r\n"
                     request += f"Host: 127.0.0.1:{port}\r\n"
                     request += f"User-Agent: {ua}\r\n"
                     request += "Connection: close\r\n\r\n"
                     
-                    sock.send(request.encode())
-                    self.stats['packets_sent'] += 1
+                    data = request.encode()
+                    sock.send(data)
                     sock.recv(4096)  # Read response
+                    counters.observe(started, slot)
                     sock.close()
-                    self.stats['connections_made'] += 1
+                    counters.success(packets=1, connections=1, nbytes=len(data))
                 except Exception:
-                    self.stats['errors'] += 1
-                time.sleep(1.0 / rate)
+                    counters.error()
         
-        # Launch multiple threads
-        num_threads = min(5, rate // 10 + 1)
-        for _ in range(num_threads):
-            t = threading.Thread(target=worker, daemon=True)
-            t.start()
-            self.active_threads.append(t)
+        self._run_workers(worker, num_threads)
+        self.stats['end_time'] = datetime.now()
+        return self._generate_report('HTTP Flood')
+
+    def simulate_http_load(self, port=8080, duration=10, rate=50, schedule='constant',
+                           end_rate=None, paths=('/',), concurrency=64, timeout=5.0, seed=None,
+                           host='127.0.0.1'):
+        """Open-loop HTTP load from a single asyncio event loop.
         
-        # Wait for completion
-        for t in self.active_threads:
-            t.join()
+        Unlike ``simulate_http_flood`` no thread is spent per unit of rate:
+        requests follow a precomputed arrival schedule over keep-alive
+        connections (see ``load_generator``).
+        
+        Args:
+            port: Target HTTP port on localhost
+            duration: Test duration in seconds
+            rate: Requests per second (start rate for a ramp)
+            schedule: 'constant', 'poisson' or 'ramp'
+            end_rate: Final rate of a ramp
+            paths: Request paths, used round-robin
+            concurrency: Maximum open connections
+            timeout: Per-request timeout in seconds
+            seed: Seed for Poisson arrivals
+            host: Target host; must be localhost
+        """
+        print(f"[stress] Starting open-loop HTTP load on {host}:{port}")
+        print(f"[stress] Duration: {duration}s, Rate: {rate} req/s ({schedule}), "
+              f"Concurrency: {concurrency}")
+        
+        start = self._begin(rate)
+        counters = self._counters()
+        generator = OpenLoopGenerator(port, paths, concurrency, timeout, host)
+        offsets = arrivals(schedule, rate, duration, end_rate, seed)
+        asyncio.run(generator.run(offsets, counters, start))
         
         self.stats['end_time'] = datetime.now()
-        return self._generate_report('HTTP Flood')
+        report = self._generate_report('HTTP Load (open loop)')
+        report['load'] = dict(generator.details(), schedule=schedule, end_rate=end_rate,
+                              paths=list(paths))
+        return report
 
     def simulate_slowloris(self, port=8080, duration=10, connections=50):
         """Simulate Slowloris attack pattern on localhost.
@@ -199,9 +368,10 @@ class LocalhostStressSimulator:
         print(f"[stress] Starting Slowloris simulation on 127.0.0.1:{port}")
         print(f"[stress] Duration: {duration}s, Connections: {connections}")
         
-        self.stats['start_time'] = datetime.now()
-        self.stop_flag = False
-        end_time = time.time() + duration
+        end_time = self._begin() + duration
+        # Runs on the calling thread: connection opens and keep-alive headers
+        # go into the same counters.
+        counters = self._counters()
         
         sockets = []
         
@@ -217,19 +387,19 @@ class LocalhostStressSimulator:
                 sock.send(f"Host: 127.0.0.1:{port}\r\n".encode())
                 
                 sockets.append(sock)
-                self.stats['connections_made'] += 1
+                counters.success(connections=1)
             except Exception:
-                self.stats['errors'] += 1
+                counters.error()
         
         # Keep connections alive with periodic headers
-        while time.time() < end_time and not self.stop_flag:
+        for _ in self._schedule(end_time, 5):
             for sock in sockets:
                 try:
-                    sock.send(f"X-a: {random.randint(1,9999)}\r\n".encode())
-                    self.stats['packets_sent'] += 1
+                    header = f"X-a: {random.randint(1,9999)}\r\n".encode()
+                    sock.send(header)
+                    counters.success(packets=1, nbytes=len(header))
                 except Exception:
-                    self.stats['errors'] += 1
-            time.sleep(5)
+                    counters.error()
         
         # Clean up
         for sock in sockets:
@@ -254,38 +424,102 @@ class LocalhostStressSimulator:
         print(f"[stress] Duration: {duration}s, Rate: {rate} ping/s")
         print(f"[stress] Note: ICMP requires root/sudo - simulating at application layer")
         
-        self.stats['start_time'] = datetime.now()
-        self.stop_flag = False
-        end_time = time.time() + duration
+        end_time = self._begin(rate) + duration
+        num_threads = min(5, rate // 20 + 1)
         
         # Use TCP echo as alternative (port 7)
         def worker():
-            while time.time() < end_time and not self.stop_flag:
+            counters = self._counters()
+            for slot in self._schedule(end_time, num_threads / rate):
+                started = time.monotonic()
                 try:
                     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                     sock.settimeout(0.5)
                     sock.connect(('127.0.0.1', 7))  # Echo port
                     sock.send(b'PING')
                     sock.recv(4)
-                    self.stats['packets_sent'] += 1
+                    counters.observe(started, slot)
                     sock.close()
+                    counters.success(packets=1, connections=1, nbytes=4)
                 except Exception:
-                    self.stats['errors'] += 1
-                time.sleep(1.0 / rate)
-        
-        # Launch threads
-        num_threads = min(5, rate // 20 + 1)
-        for _ in range(num_threads):
-            t = threading.Thread(target=worker, daemon=True)
-            t.start()
-            self.active_threads.append(t)
-        
-        for t in self.active_threads:
-            t.join()
+                    counters.error()
         
+        self._run_workers(worker, num_threads)
         self.stats['end_time'] = datetime.now()
         return self._generate_report('ICMP Flood (simulated)')
 
+    def simulate_sharded(self, mode, processes=2, **kwargs):
+        """Run one simulation mode split across worker processes.
+        
+        Rates, connection counts and concurrency caps are divided between the
+        processes, which start together once all of them reach a shared
+        barrier; their counters and latency histograms are merged into one
+        report. Every process targets 127.0.0.1 exactly like the threaded modes.
+        
+        Args:
+            mode: Simulation name, e.g. 'http_flood' or 'http_load'
+            processes: Number of worker processes
+            **kwargs: Arguments of the ``simulate_<mode>`` method
+        """
+        if not hasattr(self, f'simulate_{mode}') or mode == 'sharded':
+            raise ValueError(f'Unknown simulation mode: {mode}')
+        requested = max(1, int(processes))
+        jobs = []
+        for i in range(requested):
+            shard = {k: (_split(v, requested, i) if k in SHARDED_ARGS and v else v) for k, v in kwargs.items()}
+            if _idle(shard, kwargs):
+                continue
+            if shard.get('seed') is not None:
+                shard['seed'] += i
+            jobs.append(shard)
+        processes = len(jobs)
+        if processes < requested:
+            print(f"[stress] Only {processes} of {requested} shards have work; not starting the rest")
+        print(f"[stress] Sharding {mode} across {processes} processes")
+        ctx = multiprocessing.get_context('spawn')
+        barrier = ctx.Barrier(processes)
+        results = ctx.Queue()
+        workers = []
+        for shard in jobs:
+            p = ctx.Process(target=_shard_worker, args=(mode, shard, barrier, results), daemon=True)
+            p.start()
+            workers.append(p)
+        shards = []
+        while len(shards) < processes:
+            try:
+                shards.append(results.get(timeout=1))
+            except queue.Empty:
+                if not any(p.is_alive() for p in workers):
+                    break
+        for p in workers:
+            p.join()
+        if len(shards) < processes:
+            raise RuntimeError(f'{processes - len(shards)} shard process(es) exited without a result')
+        failed = [s['error'] for s in shards if 'error' in s]
+        if failed:
+            raise RuntimeError(f'{len(failed)} shard(s) failed: {failed[0]}')
+        
+        self._begin(sum(s['configured_rate'] or 0 for s in shards) or None)
+        for shard in shards:
+            self._workers.extend(shard['workers'])
+        self.stats['start_time'] = min(s['start'] for s in shards)
+        self.stats['end_time'] = max(s['end'] for s in shards)
+        report = self._generate_report(shards[0]['attack_type'])
+        report['processes'] = processes
+        loads = [s['load'] for s in shards if s['load']]
+        if loads:
+            codes = {}
+            for load in loads:
+                for code, count in load['status_codes'].items():
+                    codes[code] = codes.get(code, 0) + count
+            report['load'] = dict(loads[0], status_codes=dict(sorted(codes.items())),
+                                  concurrency_cap=sum(l['concurrency_cap'] for l in loads),
+                                  max_in_flight=sum(l['max_in_flight'] for l in loads),
+                                  abandoned=sum(l['abandoned'] for l in loads),
+                                  max_dispatch_lag_ms=max(l['max_dispatch_lag_ms'] for l in loads),
+                                  end_rate=kwargs.get('end_rate'))
+        return report
+
     def stop(self):
         """Stop all active simulations."""
         print("[stress] Stopping all active simulations...")
@@ -293,9 +527,35 @@ class LocalhostStressSimulator:
         time.sleep(1)
         self.active_threads.clear()
 
+    def _aggregate(self):
+        """Sum every worker's counters into ``self.stats`` and a per-second series."""
+        with self._workers_lock:
+            workers = list(self._workers)
+        totals = {'attempts': 0, 'successes': 0, 'errors': 0, 'packets_sent': 0,
+                  'connections_made': 0, 'bytes_sent': 0}
+        series = {}
+        latency = LatencyHistogram.merged(c.latency for c in workers)
+        corrected = LatencyHistogram.merged(c.latency_corrected for c in workers)
+        for counters in workers:
+            for key in totals:
+                totals[key] += getattr(counters, key)
+            for second, (ok, err) in counters.series.items():
+                bucket = series.setdefault(second, [0, 0])
+                bucket[0] += ok
+                bucket[1] += err
+        self.stats.update(totals)
+        last = max(series) if series else -1
+        time_series = [{'second': second,
+                        'success': series.get(second, (0, 0))[0],
+                        'errors': series.get(second, (0, 0))[1]}
+                       for second in range(last + 1)]
+        return totals, len(workers), time_series, latency, corrected
+
     def _generate_report(self, attack_type):
         """Generate detailed simulation report."""
         duration = (self.stats['end_time'] - self.stats['start_time']).total_seconds()
+        totals, workers, time_series, latency, corrected = self._aggregate()
+        elapsed = max(duration, 1e-6)
         
         report = {
             'type': 'stress_simulation_report',
@@ -303,19 +563,35 @@ class LocalhostStressSimulator:
             'target': '127.0.0.1 (localhost)',
             'duration_seconds': round(duration, 2),
             'statistics': {
-                'packets_sent': self.stats['packets_sent'],
-                'connections_made': self.stats['connections_made'],
-                'errors': self.stats['errors'],
-                'success_rate': round(
-                    (self.stats['connections_made'] / 
-                     max(1, self.stats['connections_made'] + self.stats['errors'])) * 100, 2
-                ),
-                'avg_rate': round(self.stats['packets_sent'] / max(1, duration), 2)
+                'packets_sent': totals['packets_sent'],
+                'connections_made': totals['connections_made'],
+                'errors': totals['errors'],
+                'attempts': totals['attempts'],
+                'successes': totals['successes'],
+                'bytes_sent': totals['bytes_sent'],
+                'workers': workers,
+                'success_rate': round(totals['successes'] / max(1, totals['attempts']) * 100, 2),
+                'rate_unit': RATE_UNITS.get(attack_type, 'ops/s'),
+                'configured_rate': self._configured_rate,
+                'attempt_rate': round(totals['attempts'] / elapsed, 2),
+                'avg_rate': round(totals['successes'] / elapsed, 2)
             },
+            'time_series': time_series,
             'timestamps': {
                 'start': self.stats['start_time'].isoformat(),
                 'end': self.stats['end_time'].isoformat()
             }
         }
+        if latency.total:
+            report['latency'] = latency.to_dict()
+            report['latency_corrected'] = corrected.to_dict()
+            if self.latency_csv_dir:
+                os.makedirs(self.latency_csv_dir, exist_ok=True)
+                stem = attack_type.lower().replace(' ', '_').replace('(', '').replace(')', '')
+                stamp = self.stats['start_time'].strftime('%Y%m%dT%H%M%S')
+                report['latency_csv'] = [
+                    latency.to_csv(os.path.join(self.latency_csv_dir, f'{stem}_{stamp}_latency.csv')),
+                    corrected.to_csv(os.path.join(self.latency_csv_dir, f'{stem}_{stamp}_latency_corrected.csv')),
+                ]
         
         return report
@@ -0,0 +1,230 @@
+"""Local stub of every external service the collectors call, for offline benchmarks.
+
+Serves on 127.0.0.1 only:
+- ``GET  /{ip}/json``                         ipinfo.io-style geolocation
+- ``GET  /api/v3/breachedaccount/{email}``    HIBP-style breaches (404 when clean)
+- ``HEAD /{platform}/{username}``             profile existence (see PLATFORM_BASE_URL)
+- ``GET  /images/{name}``                     image bytes for PhotoIntel URL targets
+- a WHOIS server on a separate TCP port
+
+Latency (with jitter), a per-connection setup cost (standing in for the DNS
+lookup and TCP/TLS handshakes of a real remote service), random 5xx error
+rate and 429 throttling are configurable,
+so collectors can be measured reproducibly without touching the network.
+Point the collectors at it with IPINFO_URL, HIBP_URL, PLATFORM_BASE_URL and
+WHOIS_SERVER (``StubServices.env()`` returns the right values).
+
+Usage:
+    python stub_services.py --latency-ms 40 --error-rate 0.02 --throttle-rps 200
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import socketserver
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WHOIS_TEMPLATE = """NetRange:       {ip} - {ip}
+OrgName:        Stub Networks LLC
+OrgId:          STUB-1
+Country:        US
+OrgAbuseEmail:  abuse@stub.example
+"""
+
+
+class StubConfig:
+    def __init__(self, latency_ms=20.0, jitter_ms=5.0, error_rate=0.0, throttle_rps=0, seed=None, connect_ms=0.0):
+        self.latency_ms = latency_ms
+        self.connect_ms = connect_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_count = 0
+
+    def delay(self):
+        with self._lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+
+    def fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self.rng.random() < self.error_rate
+
+    def throttled(self):
+        """True when the current one-second window already served ``throttle_rps`` requests."""
+        if not self.throttle_rps:
+            return False
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window, self._window_count = now, 0
+            self._window_count += 1
+            return self._window_count > self.throttle_rps
+
+
+def _digest(value):
+    return int(hashlib.sha256(value.encode()).hexdigest()[:8], 16)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; like real servers, don't let
+    # Nagle hold the body back on a kept-alive connection
+    disable_nagle_algorithm = True
+    config = None
+
+    def setup(self):
+        super().setup()
+        if self.config.connect_ms:
+            time.sleep(self.config.connect_ms / 1000.0)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None, head=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _handle(self, head=False):
+        self.config.delay()
+        if self.config.throttled():
+            return self._send(429, b'{"error": "rate limited"}', headers={'Retry-After': '1'}, head=head)
+        if self.config.fail():
+            return self._send(500, b'{"error": "stub failure"}', head=head)
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if len(parts) == 2 and parts[1] == 'json':
+            return self._send(200, json.dumps(self._ipinfo(parts[0])).encode(), head=head)
+        if parts[:3] == ['api', 'v3', 'breachedaccount'] and len(parts) == 4:
+            breaches = self._breaches(parts[3])
+            if not breaches:
+                return self._send(404, head=head)
+            return self._send(200, json.dumps(breaches).encode(), head=head)
+        if parts[:1] == ['images'] and len(parts) == 2:
+            return self._send(200, hashlib.sha256(parts[1].encode()).digest() * 512, 'image/jpeg', head=head)
+        if len(parts) == 2:
+            # Deterministic profile existence: roughly half the platforms "exist"
+            found = _digest('/'.join(parts)) % 2 == 0
+            return self._send(200 if found else 404, b'<html></html>', 'text/html', head=head)
+        return self._send(404, head=head)
+
+    @staticmethod
+    def _ipinfo(ip):
+        n = _digest(ip)
+        return {'ip': ip, 'hostname': f'host-{n % 1000}.stub.example', 'city': 'Stubville',
+                'country': 'US', 'org': f'AS{64512 + n % 1000} Stub Networks LLC', 'timezone': 'UTC'}
+
+    @staticmethod
+    def _breaches(email):
+        n = _digest(email)
+        return [{'Name': f'StubBreach{i}', 'Domain': f'breach{i}.stub.example'} for i in range(n % 3)]
+
+    def do_GET(self):
+        self._handle()
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+
+class WhoisHandler(socketserver.StreamRequestHandler):
+    config = None
+
+    def handle(self):
+        query = self.rfile.readline().decode(errors='replace').strip()
+        self.config.delay()
+        self.wfile.write(WHOIS_TEMPLATE.format(ip=query).encode())
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StubServices:
+    """Runs the HTTP and WHOIS stubs on background threads."""
+
+    def __init__(self, config=None, http_port=0, whois_port=0):
+        self.config = config or StubConfig()
+        http_handler = type('BoundStubHandler', (StubHandler,), {'config': self.config})
+        whois_handler = type('BoundWhoisHandler', (WhoisHandler,), {'config': self.config})
+        self.http = ThreadingHTTPServer(('127.0.0.1', http_port), http_handler, bind_and_activate=False)
+        self.http.daemon_threads = True
+        # Bulk benchmarks open many connections at once; the default backlog of 5
+        # drops SYNs and adds one-second retransmits
+        self.http.request_queue_size = 128
+        self.http.server_bind()
+        self.http.server_activate()
+        self.whois = _ThreadingTCPServer(('127.0.0.1', whois_port), whois_handler)
+        self._threads = []
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.http.server_address[1]}'
+
+    @property
+    def whois_server(self):
+        return f'127.0.0.1:{self.whois.server_address[1]}'
+
+    def env(self):
+        """Environment variables pointing every collector at the stubs."""
+        return {
+            'IPINFO_URL': self.base_url,
+            'HIBP_URL': self.base_url,
+            'PLATFORM_BASE_URL': self.base_url,
+            'WHOIS_SERVER': self.whois_server,
+        }
+
+    def image_url(self, name):
+        return f'{self.base_url}/images/{name}.jpg'
+
+    def start(self):
+        for server in (self.http, self.whois):
+            t = threading.Thread(target=server.serve_forever, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        for server in (self.http, self.whois):
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run local stubs of the external OSINT services')
+    parser.add_argument('--port', type=int, default=8900, help='HTTP stub port')
+    parser.add_argument('--whois-port', type=int, default=4343, help='WHOIS stub port')
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--connect-ms', type=float, default=0.0, help='Extra delay on every new connection')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--throttle-rps', type=int, default=0, help='Answer 429 above this many requests/second')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rps, args.seed, args.connect_ms)
+    stubs = StubServices(config, args.port, args.whois_port).start()
+    print('[stub] Serving stub services; point collectors at them with:')
+    for key, value in stubs.env().items():
+        print(f'  export {key}={value}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stubs.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,128 @@
-"""Simple timeline builder that extracts timestamps and orders events."""
-from datetime import datetime
+"""Timeline builder: records real collector step timings and orders events.
+
+Collectors wrap each lookup in ``step(collector, source)``; while an investigation
+is running inside ``recording()`` the step's wall-clock start and monotonic
+duration are captured (and exceptions marked as errors). Every step also opens a
+tracing span and feeds the per-collector metrics. ``TimelineIndex`` keeps every case's events in per-day JSON-lines buckets
+so merged cross-case timelines can be queried by date range, target or entity
+without loading whole cases.
+"""
+import os
+import json
+import glob
+import time
+import argparse
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import tracing
+import metrics
+import shared_files
+
+_recorder = contextvars.ContextVar('timeline_recorder', default=None)
+
+
+def _iso(dt):
+    return dt.isoformat() + 'Z'
+
+
+class StepRecorder:
+    """Collects step timings for one investigation."""
+
+    def __init__(self):
+        self.started_wall = datetime.utcnow()
+        self.started_mono = time.monotonic()
+        self.ended_mono = None
+        self.steps = []
+
+    def wall_time(self, mono):
+        return self.started_wall + timedelta(seconds=mono - self.started_mono)
+
+    def add(self, collector, source, start, end, status, error=None):
+        entry = {
+            'collector': collector,
+            'source': source,
+            'start': _iso(self.wall_time(start)),
+            'offset_ms': round((start - self.started_mono) * 1000, 3),
+            'duration_ms': round((end - start) * 1000, 3),
+            'status': status,
+        }
+        if error:
+            entry['error'] = error
+        self.steps.append(entry)
+
+
+@contextmanager
+def recording():
+    """Record collector steps made in this context (and contexts copied from it)."""
+    recorder = StepRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        recorder.ended_mono = time.monotonic()
+        _recorder.reset(token)
+
+
+class StepOutcome:
+    """Handle yielded by ``step``; collectors call ``fail`` for soft failures (e.g. HTTP 429)."""
+    __slots__ = ('status', 'error')
+
+    def __init__(self):
+        self.status = 'ok'
+        self.error = None
+
+    def fail(self, error):
+        self.status = 'error'
+        self.error = error
+
+
+@contextmanager
+def step(collector, source):
+    """Time one collector sub-step; exceptions are recorded and re-raised."""
+    recorder = _recorder.get()
+    outcome = StepOutcome()
+    start = time.monotonic()
+    try:
+        with tracing.span(f'{collector}.{source}', collector=collector, source=source) as sp:
+            yield outcome
+            if outcome.error:
+                sp.set('error', outcome.error)
+    except BaseException as e:
+        outcome.fail(type(e).__name__)
+        raise
+    finally:
+        end = time.monotonic()
+        metrics.record_step(collector, source, outcome.status, outcome.error, end - start)
+        if recorder is not None:
+            recorder.add(collector, source, start, end, outcome.status, outcome.error)
+
+
+def submit(executor, fn, *args):
+    """Submit work to a thread pool so its steps land in the caller's recorder."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
 
 
 class TimelineBuilder:
-    def build(self, results):
+    def build(self, results, recorder=None):
+        if recorder is None:
+            return self._build_untimed(results)
+        events = [{'time': _iso(recorder.started_wall), 'desc': 'Collection started', 'offset_ms': 0.0}]
+        for s in sorted(recorder.steps, key=lambda s: s['offset_ms']):
+            desc = f"{s['collector']}: {s['source']}"
+            if s['status'] != 'ok':
+                desc += f" failed ({s.get('error', s['status'])})"
+            events.append({'time': s['start'], 'desc': desc, 'offset_ms': s['offset_ms'],
+                           'duration_ms': s['duration_ms'], 'status': s['status']})
+        if isinstance(results, list):
+            events.append({'time': events[-1]['time'], 'desc': f'Found {len(results)} items',
+                           'offset_ms': events[-1]['offset_ms']})
+        end = recorder.ended_mono if recorder.ended_mono is not None else time.monotonic()
+        events.append({'time': _iso(recorder.wall_time(end)), 'desc': 'Analysis complete',
+                       'offset_ms': round((end - recorder.started_mono) * 1000, 3)})
+        return events
+
+    def _build_untimed(self, results):
         # Very simple: create timestamped entries for discovered items
         events = []
         t0 = datetime.utcnow().isoformat() + 'Z'
@@ -15,3 +134,168 @@ class TimelineBuilder:
             events.append({'time': t0, 'desc': f'Found {len(results)} items'})
         events.append({'time': datetime.utcnow().isoformat() + 'Z', 'desc': 'Analysis complete'})
         return events
+
+
+class TimelineIndex:
+    """Per-day JSON-lines buckets of timeline events from every saved case."""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        # Written once the buckets hold the whole archive (by ``rebuild``)
+        self.built_path = os.path.join(index_dir, 'built.json')
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _bucket(self, day):
+        return os.path.join(self.index_dir, f'{day}.jsonl')
+
+    @staticmethod
+    def _lines(case):
+        """{day: [JSON line, ...]} of a case's events."""
+        by_day = {}
+        for event in case.get('timeline') or []:
+            entry = {
+                'time': event.get('time'),
+                'case_id': case.get('case_id'),
+                'target_type': case.get('target_type'),
+                'target': case.get('target'),
+                'desc': event.get('desc'),
+            }
+            if 'duration_ms' in event:
+                entry['duration_ms'] = event['duration_ms']
+            by_day.setdefault(str(entry['time'])[:10], []).append(json.dumps(entry) + '\n')
+        return by_day
+
+    def add_case(self, case):
+        for day, lines in self._lines(case).items():
+            shared_files.append(self._bucket(day), ''.join(lines))
+
+    def rebuild(self, reports_dir):
+        """Rewrite every day bucket from the stored cases; returns the number of cases indexed."""
+        with shared_files.locked(self.built_path):
+            return self._rebuild(reports_dir)
+
+    def ensure(self, reports_dir):
+        """Build the buckets from the archive if that was never done; returns the case count, or None if it was.
+
+        Cases saved before the index existed are found this way without a
+        manual ``rebuild``; with several workers, one builds it and the others
+        wait for it.
+        """
+        if os.path.exists(self.built_path):
+            return None
+        with shared_files.locked(self.built_path):
+            if os.path.exists(self.built_path):
+                return None
+            return self._rebuild(reports_dir)
+
+    def _rebuild(self, reports_dir):
+        # Caller holds the built_path lock. Day buckets are written to per-process
+        # temporary files first; each is then swapped in under that bucket's append
+        # lock, carrying over lines appended meanwhile by cases the scan did not see
+        # (saved after it; their file exists, unlike that of a deleted case).
+        tmp_paths, indexed = {}, set()
+        try:
+            for json_path in glob.glob(os.path.join(reports_dir, '*.json')):
+                try:
+                    with open(json_path, 'r') as f:
+                        case = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(case, dict) or 'case_id' not in case:
+                    continue
+                indexed.add(case['case_id'])
+                for day, lines in self._lines(case).items():
+                    mode = 'a' if day in tmp_paths else 'w'
+                    path = tmp_paths.setdefault(day, shared_files.tmp_path(self._bucket(day)))
+                    with open(path, mode) as out:
+                        out.writelines(lines)
+            days = set(tmp_paths)
+            days.update(os.path.basename(path)[:-len('.jsonl')]
+                        for path in glob.glob(os.path.join(self.index_dir, '*.jsonl')))
+            for day in sorted(days):
+                bucket = self._bucket(day)
+                mode = 'a' if day in tmp_paths else 'w'
+                tmp_path = tmp_paths.setdefault(day, shared_files.tmp_path(bucket))
+                with shared_files.appends_blocked(bucket):
+                    with open(bucket, 'r') as f, open(tmp_path, mode) as out:
+                        for line in f:
+                            try:
+                                case_id = json.loads(line).get('case_id')
+                            except ValueError:
+                                continue
+                            if case_id not in indexed and os.path.exists(
+                                    os.path.join(reports_dir, f'{os.path.basename(str(case_id))}.json')):
+                                out.write(line)
+                    os.replace(tmp_path, bucket)
+                tmp_paths.pop(day, None)
+        finally:
+            for tmp_path in tmp_paths.values():
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        tmp_path = shared_files.tmp_path(self.built_path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'cases': len(indexed), 'built_at': _iso(datetime.utcnow())}, f)
+        os.replace(tmp_path, self.built_path)
+        return len(indexed)
+
+    def query(self, since=None, until=None, target=None, case_ids=None, limit=None):
+        """Merged events in [since, until], optionally for a target or a set of cases.
+
+        Only the day buckets inside the range are read.
+        """
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=30)
+        lo, hi = _iso(since), _iso(until)
+        wanted = set(case_ids) if case_ids is not None else None
+        events = []
+        day = since.date()
+        while day <= until.date():
+            path = self._bucket(day.isoformat())
+            day += timedelta(days=1)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not lo <= event['time'] <= hi:
+                        continue
+                    if target is not None and str(event.get('target', '')).lower() != target.lower():
+                        continue
+                    if wanted is not None and event.get('case_id') not in wanted:
+                        continue
+                    events.append(event)
+        events.sort(key=lambda e: e['time'])
+        return events[-limit:] if limit else events
+
+
+def main():
+    from entity_graph import EntityGraph
+    parser = argparse.ArgumentParser(description='Query the merged cross-case timeline')
+    parser.add_argument('command', nargs='?', choices=('query', 'rebuild'), default='query',
+                        help='rebuild rewrites the day buckets from all stored cases')
+    parser.add_argument('--reports-dir', default='reports')
+    parser.add_argument('--days', type=int, default=30, help='Look-back window in days')
+    parser.add_argument('--target', help='Only events for this target value')
+    parser.add_argument('--entity', help='Only cases referencing this entity, e.g. asn:AS15169')
+    args = parser.parse_args()
+
+    index = TimelineIndex(os.path.join(args.reports_dir, '_timeline'))
+    if args.command == 'rebuild':
+        print(f'[timeline] Indexed {index.rebuild(args.reports_dir)} cases')
+        return
+    case_ids = None
+    if args.entity:
+        case_ids = EntityGraph.for_dir(os.path.join(args.reports_dir, '_index')).cases_for(args.entity)
+    since = datetime.utcnow() - timedelta(days=args.days)
+    for event in index.query(since=since, target=args.target, case_ids=case_ids):
+        duration = f" ({event['duration_ms']:.1f} ms)" if 'duration_ms' in event else ''
+        print(f"{event['time']}  {event['case_id']}  {event['desc']}{duration}")
+
+
+if __name__ == '__main__':
+    main()
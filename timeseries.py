@@ -0,0 +1,162 @@
+"""Compact storage and downsampling of per-second traffic series.
+
+Series live inside a case as one ``traffic_timeseries`` result whose columns
+are NumPy arrays packed as zlib-compressed, base64-encoded little-endian
+bytes, so hours of per-second data cost well under a kilobyte per minute in the case JSON
+instead of a list of JSON numbers per point.
+
+For charts, ``downsample`` reduces a column to roughly one point per pixel:
+LTTB (largest-triangle-three-buckets) keeps the visual shape of a line,
+``minmax`` keeps every bucket's extremes so spikes are never lost, and
+``mean`` averages multi-column data such as the protocol mix.
+"""
+import os
+import zlib
+import base64
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+import metrics
+from records import TrafficSeries
+
+METHODS = ('lttb', 'minmax', 'mean')
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 16
+
+
+def encode(array, dtype):
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {
+        'dtype': array.dtype.str,
+        'shape': list(array.shape),
+        'codec': 'zlib+base64',
+        'data': base64.b64encode(zlib.compress(array.tobytes(), 6)).decode('ascii'),
+    }
+
+
+def decode(block):
+    raw = zlib.decompress(base64.b64decode(block['data']))
+    return np.frombuffer(raw, dtype=np.dtype(block['dtype'])).reshape(block['shape'])
+
+
+def series_result(start, interval_s, columns, **info):
+    """A ``traffic_timeseries`` case result; ``columns`` maps name -> (array, dtype)."""
+    length = len(next(iter(columns.values()))[0])
+    return TrafficSeries(
+        start=start.isoformat() + 'Z',
+        interval_s=interval_s,
+        length=length,
+        columns={name: encode(array, dtype) for name, (array, dtype) in columns.items()},
+        **info)
+
+
+def find_series(case):
+    for item in case.get('results', []) if isinstance(case.get('results'), list) else []:
+        if isinstance(item, dict) and item.get('type') == 'traffic_timeseries':
+            return item
+    return None
+
+
+def decoded(case_path, load_case):
+    """Decoded series of a stored case, cached by (path, mtime); None if it has none."""
+    try:
+        key = (case_path, os.path.getmtime(case_path))
+    except OSError:
+        return None
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+    metrics.cache_lookup('timeseries', hit is not None)
+    if hit is not None:
+        return hit
+    series = find_series(load_case() or {})
+    if series is None:
+        return None
+    hit = {
+        'start': datetime.fromisoformat(series['start'].rstrip('Z')),
+        'interval_s': series['interval_s'],
+        'columns': {name: decode(block) for name, block in series['columns'].items()},
+    }
+    with _cache_lock:
+        _cache[key] = hit
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return hit
+
+
+def lttb(y, threshold):
+    """Indices of ``threshold`` points chosen by largest-triangle-three-buckets."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:max(nxt_hi, nxt_lo + 1)].mean()
+        avg_y = y[nxt_lo:max(nxt_hi, nxt_lo + 1)].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def minmax(y, buckets):
+    """Indices of each bucket's minimum and maximum, in time order."""
+    n = len(y)
+    if buckets * 2 >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    picked = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        chunk = y[lo:hi]
+        pair = sorted((lo + int(chunk.argmin()), lo + int(chunk.argmax())))
+        picked.extend(pair if pair[0] != pair[1] else pair[:1])
+    return np.asarray(picked, dtype=np.int64)
+
+
+def bucket_means(y, buckets):
+    """(bucket start indices, per-bucket means); works for (n,) and (n, k) arrays."""
+    n = len(y)
+    if buckets >= n:
+        return np.arange(n), np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    sums = np.add.reduceat(np.asarray(y, dtype=np.float64), edges[:-1], axis=0)
+    counts = np.diff(edges).reshape((-1,) + (1,) * (np.ndim(y) - 1))
+    return edges[:-1], sums / counts
+
+
+def downsample(series, column, width, method='lttb', start=None, end=None):
+    """Reduce one column to about ``width`` points between offsets ``start``/``end`` (seconds)."""
+    values = series['columns'][column]
+    interval = series['interval_s']
+    first = max(0, int((start or 0) // interval))
+    last = len(values) if end is None else min(len(values), int(end // interval) + 1)
+    window = values[first:last]
+    width = max(3, int(width))
+    if window.ndim > 1 or method == 'mean':
+        index, points = bucket_means(window, width)
+        points = np.round(points, 2)
+    elif method == 'minmax':
+        index = minmax(window, width // 2)
+        points = window[index]
+    else:
+        index = lttb(window, width)
+        points = window[index]
+    origin = series['start'] + timedelta(seconds=first * interval)
+    return {
+        'start': origin.isoformat() + 'Z',
+        'interval_s': interval,
+        'points_total': int(len(window)),
+        'method': 'mean' if window.ndim > 1 else method,
+        't': (index * interval).tolist(),
+        'v': points.tolist(),
+    }
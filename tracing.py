@@ -0,0 +1,195 @@
+"""Lightweight span tracing for investigations.
+
+Spans nest through a context variable (so thread-pool work submitted with
+``timeline_builder.submit`` keeps its parent) and carry attributes and
+durations. Tracing is off unless ``INTELTRACE_TRACE=1`` or ``enable()`` is
+called; while off, ``span()`` hands back a shared no-op object so instrumented
+code pays one attribute check per call.
+
+Finished traces can be written as JSON lines or in Chrome trace format
+(load the ``.trace.json`` file in chrome://tracing or https://ui.perfetto.dev).
+"""
+import os
+import json
+import time
+import threading
+import itertools
+import contextvars
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+TRACE_DIR = os.getenv('INTELTRACE_TRACE_DIR', os.path.join('reports', '_traces'))
+
+_current = contextvars.ContextVar('tracing_span', default=None)
+_ids = itertools.count(1)
+_EPOCH_NS = time.perf_counter_ns()
+_EPOCH_WALL_US = time.time_ns() // 1000
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'attrs', 'trace_id', 'span_id', 'parent_id',
+                 'start_ns', 'end_ns', 'tid', '_token')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        self.parent_id = None
+        self.trace_id = self.span_id
+        self.start_ns = self.end_ns = 0
+        self.tid = 0
+        self._token = None
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is not None:
+            self.parent_id = parent.span_id
+            self.trace_id = parent.trace_id
+        self.tid = threading.get_ident()
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        _current.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self):
+        start_us = _EPOCH_WALL_US + (self.start_ns - _EPOCH_NS) // 1000
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': datetime.fromtimestamp(start_us / 1e6, timezone.utc).isoformat().replace('+00:00', 'Z'),
+            'duration_ms': round(self.duration_ms, 3),
+            'pid': os.getpid(),
+            'tid': self.tid,
+            'attrs': self.attrs,
+        }
+
+    def to_chrome(self):
+        return {
+            'name': self.name,
+            'cat': self.name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': _EPOCH_WALL_US + (self.start_ns - _EPOCH_NS) // 1000,
+            'dur': max(1, (self.end_ns - self.start_ns) // 1000),
+            'pid': os.getpid(),
+            'tid': self.tid,
+            'args': dict(self.attrs, span_id=self.span_id, parent_id=self.parent_id),
+        }
+
+
+class Tracer:
+    """Collects finished spans until their trace is exported with ``pop_trace``.
+
+    Once a trace's root span ends, the trace waits in ``done``; only the
+    last ``KEEP_DONE`` of those are kept, so traces nobody exports (a caller
+    that failed, or spans opened outside an investigation) cannot pile up.
+    """
+    KEEP_DONE = 64
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.spans = []
+        self.done = OrderedDict()
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if span.parent_id is None:
+                self.done[span.trace_id] = [s for s in self.spans if s.trace_id == span.trace_id]
+                self.spans = [s for s in self.spans if s.trace_id != span.trace_id]
+                while len(self.done) > self.KEEP_DONE:
+                    self.done.popitem(last=False)
+
+    def pop_trace(self, trace_id):
+        """Remove and return the finished spans of one trace, in start order."""
+        with self._lock:
+            mine = self.done.pop(trace_id, None)
+            if mine is None:
+                mine = [s for s in self.spans if s.trace_id == trace_id]
+                self.spans = [s for s in self.spans if s.trace_id != trace_id]
+        return sorted(mine, key=lambda s: s.start_ns)
+
+
+_tracer = Tracer(enabled=os.getenv('INTELTRACE_TRACE', '') == '1')
+
+
+def get_tracer():
+    return _tracer
+
+
+def enable():
+    _tracer.enabled = True
+
+
+def disable():
+    _tracer.enabled = False
+
+
+def span(name, **attrs):
+    """Open a child span of the current one (no-op while tracing is disabled)."""
+    if not _tracer.enabled:
+        return NOOP_SPAN
+    return Span(_tracer, name, attrs)
+
+
+def export_jsonl(spans, path):
+    with open(path, 'w') as f:
+        for s in spans:
+            f.write(json.dumps(s.to_dict(), default=str) + '\n')
+    return path
+
+
+def export_chrome(spans, path):
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': [s.to_chrome() for s in spans], 'displayTimeUnit': 'ms'}, f, default=str)
+    return path
+
+
+def write_trace(root, name, trace_dir=None):
+    """Export the finished trace rooted at ``root`` as ``<name>.jsonl`` and ``<name>.trace.json``."""
+    if not isinstance(root, Span):
+        return None
+    spans = root.tracer.pop_trace(root.trace_id)
+    trace_dir = trace_dir or TRACE_DIR
+    os.makedirs(trace_dir, exist_ok=True)
+    base = os.path.join(trace_dir, name)
+    return {'jsonl': export_jsonl(spans, base + '.jsonl'),
+            'chrome': export_chrome(spans, base + '.trace.json')}
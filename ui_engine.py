@@ -1,24 +1,80 @@
 """Flask-based hacker-themed UI for IntelTrace."""
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response
 from dotenv import load_dotenv
-from main import run_investigation
+from main import run_investigation, new_case_id
 from database import IntelDB
-from photo_intel import PhotoIntel
 from werkzeug.utils import secure_filename
 import os
 import json
 import glob
+import time
+import metrics
+import timeseries
+import http_cache
+import jobs
+import collectors
+import watch
+import records
+from datetime import datetime, timedelta
 
 load_dotenv()
-app = Flask(__name__, static_folder='static', template_folder='templates')
+app = Flask(__name__, static_folder=None, template_folder='templates')
+STATIC_DIR = os.path.join(app.root_path, 'static')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+BULK_FETCH_MAX = 500
+TIMELINE_MAX = 5000  # events per /api/timeline response
+bulk_jobs = jobs.BulkJobs(run_investigation, new_case_id, os.path.join('reports', '_jobs'),
+                          lambda case_id: os.path.exists(IntelDB.shared().case_path(case_id)))
+watchlist = watch.Watchlist()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _case_store_gauges():
+    count, size = IntelDB.shared().store_size()
+    return {('cases',): count, ('bytes',): size}
+
+
+metrics.gauge_callback('inteltrace_case_store_size', 'Stored cases and bytes on disk', _case_store_gauges, ('unit',))
+
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method)
+    return response
+
+
+app.after_request(http_cache.compress_response)
+
+
+@app.route('/static/<path:filename>')
+def static(filename):
+    return http_cache.send_static(STATIC_DIR, filename)
+
+
+try:
+    http_cache.precompress(STATIC_DIR)
+except OSError as e:
+    print(f'[ui] Could not pre-compress static assets: {e}')
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -26,33 +82,35 @@ def index():
 
 @app.route('/dashboard')
 def dashboard():
-    db = IntelDB()
-    cases = db.list_cases()
-    stats = {
-        'total_cases': len(cases),
-        'target_types': {},
-        'recent_cases': cases[:10] if cases else []
-    }
-    for case in cases:
-        t_type = case.get('target_type', 'unknown')
-        stats['target_types'][t_type] = stats['target_types'].get(t_type, 0) + 1
+    db = IntelDB.shared()
+    stats = db.dashboard_stats()
     return render_template('dashboard.html', stats=stats)
 
 
 @app.route('/reports')
 def reports():
-    db = IntelDB()
-    cases = db.list_cases()
-    return render_template('reports.html', cases=cases)
+    # Rows are fetched page by page from /api/cases by the virtualised table
+    total, _ = IntelDB.shared().case_page(limit=0)
+    return render_template('reports.html', total=total)
 
 
 @app.route('/reports/<case_id>')
 def report_detail(case_id):
-    db = IntelDB()
-    case = db.get_case(case_id)
-    if not case:
+    db = IntelDB.shared()
+    path = db.case_path(case_id)
+    etag = http_cache.file_etag(path)
+    if etag is None:
         return jsonify({'error': 'Case not found'}), 404
-    return render_template('report_detail.html', case=case)
+
+    def render():
+        # Results are left out of the page and fetched from /api/reports/<case_id>/results
+        case = db.get_case(case_id)
+        results = case.get('results')
+        return render_template('report_detail.html', case=case,
+                               results_count=len(results) if isinstance(results, (list, dict)) else 0,
+                               has_series=timeseries.find_series(case) is not None)
+
+    return http_cache.cached_page(f'report:{case_id}', etag, render, last_modified=os.path.getmtime(path))
 
 
 @app.route('/ddos')
@@ -62,9 +120,140 @@ def ddos_page():
 
 @app.route('/api/reports')
 def api_reports():
-    db = IntelDB()
-    cases = db.list_cases()
-    return jsonify(cases)
+    db = IntelDB.shared()
+    etag, last_modified = http_cache.listing_etag(db.reports_dir)
+    return http_cache.cached_page('api_reports', etag, lambda: json.dumps(db.list_cases()),
+                                  mimetype='application/json', last_modified=last_modified)
+
+
+def _page_args(default_limit=50):
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', default_limit, type=int), 500))
+    return offset, limit
+
+
+@app.route('/api/cases')
+def api_cases():
+    """One page of case summaries, newest first; ``q`` searches id/target/investigator."""
+    offset, limit = _page_args()
+    total, items = IntelDB.shared().case_page(offset, limit, request.args.get('q'), request.args.get('type') or None)
+    return jsonify({'total': total, 'offset': offset, 'limit': limit, 'items': items})
+
+
+@app.route('/api/reports/bulk', methods=['GET', 'POST'])
+def api_reports_bulk():
+    """Many cases in one round-trip: POST ``{"ids": [...], "fields": [...]}`` or GET ``?ids=a,b``."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        ids, fields = data.get('ids'), data.get('fields')
+    else:
+        ids = [i for i in request.args.get('ids', '').split(',') if i]
+        fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, (str, int)) for i in ids):
+        return jsonify({'error': 'ids must be a non-empty list of case ids'}), 400
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)):
+        return jsonify({'error': 'fields must be a list of field names'}), 400
+    if len(ids) > BULK_FETCH_MAX:
+        return jsonify({'error': f'at most {BULK_FETCH_MAX} ids per request'}), 400
+    found = IntelDB.shared().get_cases(ids)
+    if fields:
+        fields = set(fields) | {'case_id'}
+        found = {cid: {k: v for k, v in case.items() if k in fields} for cid, case in found.items()}
+    return jsonify({
+        'cases': [found[str(cid)] for cid in ids if str(cid) in found],
+        'missing': [cid for cid in ids if str(cid) not in found],
+    })
+
+
+@app.route('/api/reports/<case_id>')
+def api_case(case_id):
+    """A whole stored case; ``?download=1`` serves it as an attachment.
+
+    Current cases are served as stored; older ones are upgraded to the
+    current results version first, as every other endpoint returns them.
+    """
+    path = IntelDB.shared().case_path(case_id)
+    etag = http_cache.file_etag(path)
+    if etag is None:
+        return jsonify({'error': 'Case not found'}), 404
+
+    def read():
+        with open(path, 'rb') as f:
+            raw = f.read()
+        case = json.loads(raw)
+        if case.get('results_version', 1) >= records.VERSION:
+            return raw
+        return json.dumps(records.upgrade(case), indent=2, default=str)
+
+    response = http_cache.cached_page(f'case:{case_id}', etag, read, mimetype='application/json',
+                                      last_modified=os.path.getmtime(path))
+    if request.args.get('download'):
+        response.headers['Content-Disposition'] = f'attachment; filename={case_id}.json'
+    return response
+
+
+@app.route('/api/reports/<case_id>/results')
+def api_case_results(case_id):
+    """One page of a case's results."""
+    db = IntelDB.shared()
+    path = db.case_path(case_id)
+    etag = http_cache.file_etag(path)
+    if etag is None:
+        return jsonify({'error': 'Case not found'}), 404
+    offset, limit = _page_args()
+
+    def build():
+        total, items = db.result_page(case_id, offset, limit)
+        return json.dumps({'total': total, 'offset': offset, 'limit': limit, 'items': items}, default=str)
+
+    return http_cache.cached_page(f'results:{case_id}:{offset}:{limit}', etag, build,
+                                  mimetype='application/json', last_modified=os.path.getmtime(path))
+
+
+@app.route('/api/reports/<case_id>/related')
+def api_related_cases(case_id):
+    db = IntelDB.shared()
+    return jsonify(db.related_cases(case_id))
+
+
+@app.route('/api/reports/<case_id>/series')
+def api_case_series(case_id):
+    """Traffic series of a case, downsampled to about ``width`` points."""
+    db = IntelDB.shared()
+    series = db.traffic_series(case_id)
+    if series is None:
+        return jsonify({'error': 'No traffic series for this case'}), 404
+    metric = request.args.get('metric', 'rps')
+    method = request.args.get('method', 'lttb')
+    if metric not in series['columns'] or method not in timeseries.METHODS:
+        return jsonify({'error': 'unknown metric or method',
+                        'metrics': sorted(series['columns']), 'methods': timeseries.METHODS}), 400
+    width = max(10, min(request.args.get('width', 800, type=int), 5000))
+    data = timeseries.downsample(series, metric, width, method,
+                                 request.args.get('start', type=float), request.args.get('end', type=float))
+    data.update(case_id=case_id, metric=metric)
+    return jsonify(data)
+
+
+@app.route('/api/entities/<path:entity>')
+def api_entity_neighbourhood(entity):
+    db = IntelDB.shared()
+    k = max(1, min(request.args.get('k', 2, type=int), 6))
+    neighbours = db.entity_neighbourhood(entity, k)
+    return jsonify({'entity': entity, 'k': k, 'neighbours': neighbours})
+
+
+@app.route('/api/timeline')
+def api_timeline():
+    db = IntelDB.shared()
+    days = request.args.get('days', 30, type=int)
+    events = db.merged_timeline(
+        since=datetime.utcnow() - timedelta(days=max(1, days)),
+        target=request.args.get('target'),
+        entity=request.args.get('entity'),
+        limit=max(1, min(request.args.get('limit', 1000, type=int), TIMELINE_MAX)),
+    )
+    return jsonify(events)
 
 
 @app.route('/scan', methods=['POST'])
@@ -79,9 +268,76 @@ def scan():
     inv = data.get('investigator')
     if not t or not v:
         return jsonify({'error': 'missing type or value'}), 400
-    # Kick off investigation synchronously for demo; production use background jobs
-    run_investigation(t, v, inv)
-    return jsonify({'status': 'started', 'target': v})
+    # Runs synchronously; use /api/scans/bulk to queue many targets at once
+    report = run_investigation(t, v, inv)
+    return jsonify({'status': 'done', 'target': v, 'case_id': report['case_id']})
+
+
+@app.route('/api/scans/bulk', methods=['POST'])
+def bulk_scan():
+    """Queue many investigations; body ``{"targets": [{"type", "value"}...], "investigator"}``."""
+    data = request.get_json(silent=True) or {}
+    items, rejected = jobs.validate(data.get('targets'), data.get('investigator'))
+    if not items:
+        return jsonify({'error': 'no valid targets', 'rejected': rejected}), 400
+    try:
+        job = bulk_jobs.submit(items)
+    except jobs.QueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    response = jsonify({
+        'job_id': job['job_id'],
+        'status_url': f"/api/jobs/{job['job_id']}",
+        'items': [{'index': i['index'], 'type': i['type'], 'value': i['value'], 'case_id': i['case_id']}
+                  for i in job['items']],
+        'rejected': rejected,
+    })
+    return response, 202
+
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = bulk_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/watch', methods=['GET', 'POST'])
+def watch_targets():
+    """List watched targets, or watch one: ``{"type", "value", "interval": "1d", "investigator"}``.
+
+    Checks are run by ``python watch.py run``.
+    """
+    if request.method == 'GET':
+        return jsonify({'targets': watchlist.entries()})
+    data = request.get_json(silent=True) or {}
+    try:
+        entry = watchlist.add(data.get('type'), data.get('value'), data.get('interval') or watch.DEFAULT_INTERVAL,
+                              data.get('investigator'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(entry), 201
+
+
+@app.route('/api/watch/events')
+def watch_events():
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify({'events': watchlist.events(limit, request.args.get('watch_id'))})
+
+
+@app.route('/api/watch/<watch_id>', methods=['GET', 'DELETE'])
+def watch_target(watch_id):
+    if request.method == 'DELETE':
+        if not watchlist.remove(watch_id):
+            return jsonify({'error': 'Not watched'}), 404
+        return jsonify({'removed': watch_id})
+    entry = watchlist.get(watch_id)
+    if entry is None:
+        return jsonify({'error': 'Not watched'}), 404
+    return jsonify(dict(entry, deltas=watchlist.deltas(watch_id, entry.get('baseline_case')),
+                        events=watchlist.events(50, watch_id)))
 
 
 def handle_photo_scan():
@@ -95,15 +351,15 @@ def handle_photo_scan():
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        photo_intel = PhotoIntel()
+        photo_intel = collectors.get('photo')
         filepath = photo_intel.save_upload(file.read(), filename)
         
         # Get investigator from form data
         inv = request.form.get('investigator')
         
-        # Run investigation
-        run_investigation('photo', filepath, inv)
-        return jsonify({'status': 'started', 'target': filename, 'path': filepath})
+        # Run investigation (synchronously, like /scan)
+        report = run_investigation('photo', filepath, inv)
+        return jsonify({'status': 'done', 'target': filename, 'path': filepath, 'case_id': report['case_id']})
     
     return jsonify({'error': 'Invalid file type'}), 400
 
@@ -115,4 +371,5 @@ def uploaded_file(filename):
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server; see wsgi.py for production serving
+    app.run(debug=True, port=int(os.getenv('UI_PORT', '5000')))
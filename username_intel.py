@@ -1,6 +1,10 @@
 """Username reconnaissance across major platforms (public profile existence checks)."""
+import os
 import requests
 from concurrent.futures import ThreadPoolExecutor
+from timeline_builder import step, submit
+import cassette
+from records import ProfileCheck, DarkwebCheck
 
 PLATFORMS = {
     'github': 'https://github.com/{}',
@@ -11,30 +15,48 @@ PLATFORMS = {
     'facebook': 'https://www.facebook.com/{}',
     'medium': 'https://medium.com/@{}'
 }
+# Serve every platform from one base URL instead (e.g. a local stub): {base}/{platform}/{username}
+PLATFORM_BASE_URL = os.getenv('PLATFORM_BASE_URL')
+
+
+def platform_urls(base_url=None):
+    base_url = base_url or PLATFORM_BASE_URL
+    if not base_url:
+        return dict(PLATFORMS)
+    return {p: f"{base_url.rstrip('/')}/{p}/{{}}" for p in PLATFORMS}
 
 
 class UsernameIntel:
-    def __init__(self, timeout=8):
-        self.s = requests.Session()
+    def __init__(self, timeout=8, platform_base_url=None):
+        self.s = cassette.mount(requests.Session())
         self.timeout = timeout
+        self.platforms = platform_urls(platform_base_url)
 
     def check_profile(self, platform, username):
-        url = PLATFORMS.get(platform).format(username)
+        url = self.platforms.get(platform).format(username)
         try:
-            r = self.s.head(url, allow_redirects=True, timeout=self.timeout)
-            return {'platform': platform, 'exists': r.status_code in (200, 301, 302), 'url': r.url, 'status_code': r.status_code}
+            with step('username', platform) as outcome:
+                r = self.s.head(url, allow_redirects=True, timeout=self.timeout)
+                if r.status_code == 429 or r.status_code >= 500:
+                    outcome.fail(f'http_{r.status_code}')
+                    # Throttled or erroring: existence is unknown, not "not found"
+                    return ProfileCheck(platform=platform, exists=False, url=r.url, status_code=r.status_code,
+                                        failed=True)
+            return ProfileCheck(platform=platform, exists=r.status_code in (200, 301, 302), url=r.url,
+                                status_code=r.status_code)
         except Exception:
-            return {'platform': platform, 'exists': False, 'url': url, 'status_code': None}
+            return ProfileCheck(platform=platform, exists=False, url=url, status_code=None, failed=True)
 
     def darkweb_sim(self, username):
         # Tor-based checks would be performed here. This is a simulation placeholder.
-        return {'tor_presence_simulation': False}
+        return DarkwebCheck(tor_presence_simulation=False)
 
     def collect(self, username):
         results = []
         with ThreadPoolExecutor(max_workers=6) as ex:
-            futures = [ex.submit(self.check_profile, p, username) for p in PLATFORMS.keys()]
+            futures = [submit(ex, self.check_profile, p, username) for p in self.platforms.keys()]
             for f in futures:
                 results.append(f.result())
-        results.append(self.darkweb_sim(username))
+        with step('username', 'darkweb_sim'):
+            results.append(self.darkweb_sim(username))
         return results
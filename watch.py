@@ -0,0 +1,517 @@
+"""Watchlist: periodic re-investigation of targets with change detection.
+
+Targets (IPs, emails, phone numbers, usernames) are watched with their own
+interval. When one is due, ``Watcher`` runs its collector again and compares
+the results with the target's current state: its last stored case plus the
+deltas recorded since. The comparison is structural. Profile checks are
+matched by platform and breaches by name. Lookups that failed this time
+(a breach lookup error, a profile check that got an error, 429 or 5xx) are
+not counted as changes.
+
+- Changes that matter (a new breach, a new or removed profile, an ASN or
+  carrier change, a new blacklist entry, see ``events``) are saved as a new
+  case. That case becomes the baseline and the events are appended to
+  ``reports/_watch/events.jsonl`` (and POSTed to ``WATCH_WEBHOOK_URL``).
+- Other differences (status codes, URLs, hostnames) are appended to the
+  target's delta log only.
+- Unchanged results store nothing beyond the next due time.
+
+So storage grows with what changes, not with how many targets are watched
+or how often.
+
+Usage:
+    python watch.py add username alice --every 1d
+    python watch.py add ip 203.0.113.7 --every 6h
+    python watch.py list
+    python watch.py run              # keep checking due targets
+    python watch.py run --once
+    python watch.py events --limit 20
+    python watch.py remove W-1a2b3c4d5e
+"""
+import os
+import copy
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import main as pipeline
+import metrics
+import coalescing
+import shared_files
+import records
+from database import IntelDB
+
+WATCH_TYPES = ('ip', 'email', 'phone', 'username')
+DEFAULT_INTERVAL = os.getenv('WATCH_DEFAULT_INTERVAL', '1d')
+MIN_INTERVAL = 60
+WORKERS = int(os.getenv('WATCH_WORKERS', '4'))
+POLL_SECONDS = float(os.getenv('WATCH_POLL_SECONDS', '30'))
+WEBHOOK_URL = os.getenv('WATCH_WEBHOOK_URL')
+# Fields that identify a record inside a list of results
+IDENTITY_KEYS = ('platform', 'Name', 'source', 'id')
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_interval(value):
+    """Seconds in '90', '30m', '6h', '1d' or '2w'."""
+    text = str(value).strip().lower()
+    seconds = float(text[:-1]) * UNITS[text[-1]] if text[-1:] in UNITS else float(text)
+    if seconds < MIN_INTERVAL:
+        raise ValueError(f'interval must be at least {MIN_INTERVAL}s')
+    return int(seconds)
+
+
+def _now_iso():
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+# --- structural diff -------------------------------------------------------
+
+def _failed(value):
+    """A lookup that did not answer.
+
+    Collectors return None (breach lookups), {} (WHOIS, ipinfo, phone) or a
+    profile check marked ``failed``; cases saved before that mark existed
+    are recognised by a missing, 429 or 5xx status code.
+    """
+    if value is None or value == {}:
+        return True
+    if not isinstance(value, dict):
+        return False
+    if value.get('failed'):
+        return True
+    if 'status_code' in value:
+        code = value['status_code']
+        return code is None or (isinstance(code, int) and (code == 429 or code >= 500))
+    return False
+
+
+def _identity_key(items):
+    for key in IDENTITY_KEYS:
+        if any(isinstance(item, dict) and key in item for item in items):
+            return key
+    return None
+
+
+def diff(old, new, path=()):
+    """Changes from ``old`` to ``new`` as [{'op': add/remove/change, 'path', 'old'/'new'}].
+
+    Dicts are compared key by key, lists of records by their identity key
+    (``[platform=github]`` in the path) and other lists as multisets
+    (``[]``). A value that failed to load this time is left as it was; one
+    that loads again after failing is replaced whole (a ``change`` of the
+    value), so it is recorded but never read as a new breach or profile.
+    """
+    if _failed(old) and not _failed(new) and old != new and path:
+        return [{'op': 'change', 'path': list(path), 'old': old, 'new': new}]
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(set(old) | set(new), key=str):
+            if key not in new:
+                changes.append({'op': 'remove', 'path': list(path) + [key], 'old': old[key]})
+            elif key not in old:
+                changes.append({'op': 'add', 'path': list(path) + [key], 'new': new[key]})
+            elif not _failed(new[key]) or _failed(old[key]):
+                changes.extend(diff(old[key], new[key], path + (key,)))
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        return _diff_list(old, new, path)
+    if old != new:
+        return [{'op': 'change', 'path': list(path), 'old': old, 'new': new}]
+    return []
+
+
+def _diff_list(old, new, path):
+    key = _identity_key(old + new)
+
+    def split(items):
+        keyed, rest = {}, Counter()
+        for item in items:
+            if key and isinstance(item, dict) and key in item:
+                keyed[f'[{key}={item[key]}]'] = item
+            else:
+                rest[json.dumps(item, sort_keys=True)] += 1
+        return keyed, rest
+
+    old_keyed, old_rest = split(old)
+    new_keyed, new_rest = split(new)
+    changes = []
+    for segment, item in old_keyed.items():
+        if segment not in new_keyed:
+            changes.append({'op': 'remove', 'path': list(path) + [segment], 'old': item})
+        elif not _failed(new_keyed[segment]) or _failed(item):
+            changes.extend(diff(item, new_keyed[segment], path + (segment,)))
+    for segment, item in new_keyed.items():
+        if segment not in old_keyed:
+            changes.append({'op': 'add', 'path': list(path) + [segment], 'new': item})
+    for text, count in (old_rest - new_rest).items():
+        changes.extend({'op': 'remove', 'path': list(path) + ['[]'], 'old': json.loads(text)} for _ in range(count))
+    for text, count in (new_rest - old_rest).items():
+        changes.extend({'op': 'add', 'path': list(path) + ['[]'], 'new': json.loads(text)} for _ in range(count))
+    return changes
+
+
+def apply(state, changes):
+    """``state`` with ``changes`` (from ``diff``) applied; the argument is not modified."""
+    state = copy.deepcopy(state)
+    for change in changes:
+        state = _apply(state, change['path'], change)
+    return state
+
+
+def _apply(node, path, change):
+    if not path:
+        return change.get('new')
+    segment, rest = path[0], path[1:]
+    if isinstance(node, list):
+        if segment == '[]':
+            if change['op'] == 'add':
+                node.append(change['new'])
+            elif change['old'] in node:
+                node.remove(change['old'])
+            return node
+        key, _, value = segment[1:-1].partition('=')
+        index = next((i for i, item in enumerate(node)
+                      if isinstance(item, dict) and str(item.get(key)) == value), None)
+        if not rest:
+            if change['op'] == 'add':
+                node.append(change['new'])
+            elif change['op'] == 'change' and index is not None:
+                node[index] = change['new']
+            elif index is not None:
+                node.pop(index)
+        elif index is not None:
+            node[index] = _apply(node[index], rest, change)
+        return node
+    if not isinstance(node, dict):
+        node = {}
+    if not rest and change['op'] == 'remove':
+        node.pop(segment, None)
+    else:
+        node[segment] = _apply(node.get(segment), rest, change)
+    return node
+
+
+# --- change events ---------------------------------------------------------
+
+def _asn(org):
+    token = str(org or '').split(' ')[0]
+    return token if token.upper().startswith('AS') else None
+
+
+def _event(change, target_type):
+    """(event, detail) for a change that matters, else None."""
+    path, op = change['path'], change['op']
+    old, new = change.get('old'), change.get('new')
+    if target_type == 'email':
+        if path[:1] == ['breaches'] and len(path) == 2 and op == 'add':
+            return 'new_breach', new.get('Name') if isinstance(new, dict) else new
+        if path == ['domain_reputation', 'reputation']:
+            return 'reputation_change', f'{old} -> {new}'
+    elif target_type == 'username':
+        if len(path) == 1 and op == 'add' and isinstance(new, dict) and new.get('exists'):
+            return 'new_profile', new.get('platform')
+        if len(path) == 2 and path[1] == 'exists' and op == 'change':
+            platform = path[0][1:-1].partition('=')[2]
+            return ('new_profile' if new else 'profile_removed'), platform
+    elif target_type == 'ip':
+        if path == ['ipinfo', 'org'] and _asn(old) != _asn(new):
+            return 'asn_change', f'{_asn(old)} -> {_asn(new)}'
+        if path == ['ipinfo', 'country']:
+            return 'country_change', f'{old} -> {new}'
+        if path[:1] == ['blacklist'] and op == 'add':
+            return 'blacklisted', new
+        if path[:1] == ['vpn_proxy'] and len(path) == 2 and op == 'change' and new is True:
+            return f'{path[1]}_detected', None
+    elif target_type == 'phone':
+        if path in (['carrier'], ['country']) and op == 'change':
+            return f'{path[0]}_change', f'{old} -> {new}'
+    return None
+
+
+def events(target_type, changes):
+    """Change events (new breach, new profile, ASN change, ...) among ``changes``."""
+    found = []
+    for change in changes:
+        if change['op'] == 'add' and change['path'] == ['breaches'] and isinstance(change.get('new'), list):
+            # First breaches for an address that had none
+            found.extend({'event': 'new_breach', 'detail': b.get('Name') if isinstance(b, dict) else b}
+                         for b in change['new'])
+            continue
+        event = _event(change, target_type)
+        if event:
+            found.append({'event': event[0], 'detail': event[1]})
+    return found
+
+
+# --- storage ---------------------------------------------------------------
+
+class Watchlist:
+    """Watched targets, delta logs and change events under ``reports/_watch``."""
+
+    def __init__(self, reports_dir='reports'):
+        self.dir = os.path.join(reports_dir, '_watch')
+        self.path = os.path.join(self.dir, 'watchlist.json')
+        self.events_path = os.path.join(self.dir, 'events.jsonl')
+        os.makedirs(os.path.join(self.dir, 'deltas'), exist_ok=True)
+
+    @staticmethod
+    def watch_id(target_type, value):
+        key = f'{target_type}:{coalescing.normalize_target(target_type, value)}'
+        return 'W-' + hashlib.sha1(key.encode()).hexdigest()[:10]
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, targets):
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(targets, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def entries(self):
+        return sorted(self._read().values(), key=lambda e: e['next_due'])
+
+    def get(self, watch_id):
+        return self._read().get(watch_id)
+
+    def add(self, target_type, value, interval=DEFAULT_INTERVAL, investigator=None):
+        """Watch a target (or change its interval); the first check is due at once."""
+        if target_type not in WATCH_TYPES:
+            raise ValueError(f'type must be one of {", ".join(WATCH_TYPES)}')
+        value = str(value or '').strip()
+        if not value:
+            raise ValueError('missing value')
+        seconds = parse_interval(interval)
+        watch_id = self.watch_id(target_type, value)
+        with shared_files.locked(self.path):
+            targets = self._read()
+            entry = targets.get(watch_id) or {
+                'id': watch_id, 'type': target_type, 'value': value, 'added': _now_iso(),
+                'next_due': 0, 'runs': 0, 'baseline_case': None, 'last_run': None, 'last_outcome': None,
+                'last_change': None,
+            }
+            entry['interval_s'] = seconds
+            entry['investigator'] = investigator or entry.get('investigator')
+            if entry['last_run'] is None:
+                entry['next_due'] = 0
+            else:
+                entry['next_due'] = min(entry['next_due'], time.time() + seconds)
+            targets[watch_id] = entry
+            self._write(targets)
+        return entry
+
+    def remove(self, watch_id):
+        with shared_files.locked(self.path):
+            targets = self._read()
+            if targets.pop(watch_id, None) is None:
+                return False
+            self._write(targets)
+        return True
+
+    def due(self, now=None):
+        now = now or time.time()
+        return [entry for entry in self.entries() if entry['next_due'] <= now]
+
+    def next_due(self):
+        entries = self.entries()
+        return entries[0]['next_due'] if entries else None
+
+    def update_many(self, updates):
+        """Apply {watch_id: fields} in one write; removed targets are skipped."""
+        with shared_files.locked(self.path):
+            targets = self._read()
+            for watch_id, fields in updates.items():
+                if watch_id in targets:
+                    targets[watch_id].update(fields)
+            self._write(targets)
+
+    def _delta_path(self, watch_id):
+        return os.path.join(self.dir, 'deltas', f'{os.path.basename(watch_id)}.jsonl')
+
+    def deltas(self, watch_id, baseline_case=None):
+        """Recorded deltas, oldest first (only those on top of ``baseline_case`` if given)."""
+        found = []
+        try:
+            with open(self._delta_path(watch_id), 'r') as f:
+                for line in f:
+                    try:
+                        delta = json.loads(line)
+                    except ValueError:
+                        continue
+                    if baseline_case is None or delta.get('baseline_case') == baseline_case:
+                        found.append(delta)
+        except OSError:
+            pass
+        return found
+
+    def append_delta(self, watch_id, delta):
+        shared_files.append(self._delta_path(watch_id), json.dumps(delta) + '\n')
+
+    def append_events(self, found):
+        if found:
+            shared_files.append(self.events_path, ''.join(json.dumps(e) + '\n' for e in found))
+
+    def events(self, limit=100, watch_id=None):
+        """Most recent change events, newest first."""
+        found = []
+        try:
+            with open(self.events_path, 'r') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if watch_id is None or event.get('watch_id') == watch_id:
+                        found.append(event)
+        except OSError:
+            pass
+        return found[::-1][:limit]
+
+
+# --- scheduling ------------------------------------------------------------
+
+class Watcher:
+    """Checks due targets on a thread pool."""
+
+    def __init__(self, watchlist=None, workers=WORKERS):
+        self.watchlist = watchlist or Watchlist()
+        self.workers = workers
+
+    def check(self, entry):
+        """Re-collect one target and record what changed; returns the entry's new fields."""
+        target_type, target = entry['type'], entry['value']
+        results, recorder = pipeline.collect(target_type, target)
+        db = IntelDB.shared()
+        baseline = db.get_case(entry['baseline_case']) if entry.get('baseline_case') else None
+        fields = {'last_run': _now_iso(), 'runs': entry.get('runs', 0) + 1,
+                  'next_due': time.time() + entry['interval_s']}
+
+        if baseline is None:
+            case = pipeline.save_report(pipeline.new_case_id(), target_type, target, entry.get('investigator'), results,
+                                    recorder, notes=['Watch: baseline'],
+                                    watch={'watch_id': entry['id'], 'previous_case': None, 'events': []})
+            fields.update(baseline_case=case['case_id'], last_outcome='baseline')
+            return fields
+
+        recorded = [c for delta in self.watchlist.deltas(entry['id'], baseline['case_id']) for c in delta['changes']]
+        changes = diff(apply(baseline.get('results'), recorded), records.dump(results))
+        found = events(target_type, changes)
+        if found:
+            case = pipeline.save_report(pipeline.new_case_id(), target_type, target, entry.get('investigator'), results,
+                                    recorder, notes=[f"Watch: {e['event']} {e['detail'] or ''}".rstrip() for e in found],
+                                    watch={'watch_id': entry['id'], 'previous_case': baseline['case_id'],
+                                           'events': found, 'changes': len(changes)})
+            stamped = [dict(e, time=fields['last_run'], watch_id=entry['id'], target_type=target_type,
+                            target=target, case_id=case['case_id'], previous_case=baseline['case_id'])
+                       for e in found]
+            self.watchlist.append_events(stamped)
+            self._notify(stamped)
+            for e in found:
+                metrics.WATCH_EVENTS.inc(event=e['event'])
+                print(f"[watch] {entry['id']} {target_type} {target}: {e['event']} {e['detail'] or ''}")
+            fields.update(baseline_case=case['case_id'], last_outcome='changed', last_change=fields['last_run'])
+        elif changes:
+            self.watchlist.append_delta(entry['id'], {'time': fields['last_run'], 'baseline_case': baseline['case_id'],
+                                                      'changes': changes})
+            fields.update(last_outcome='delta')
+        else:
+            fields.update(last_outcome='unchanged')
+        return fields
+
+    def _notify(self, found):
+        if not WEBHOOK_URL:
+            return
+        try:
+            requests.post(WEBHOOK_URL, json={'events': found}, timeout=5)
+        except Exception as e:
+            print(f'[watch] Webhook failed: {e}')
+
+    def _check_safely(self, entry):
+        try:
+            fields = self.check(entry)
+        except Exception as e:
+            print(f"[watch] {entry['id']} {entry['type']} {entry['value']} failed: {e}")
+            # Retry on the next pass rather than a whole interval later
+            fields = {'last_run': _now_iso(), 'last_outcome': f'error: {e}',
+                      'next_due': time.time() + min(entry['interval_s'], 15 * 60)}
+        metrics.WATCH_CHECKS.inc(target_type=entry['type'], outcome=fields['last_outcome'].split(':')[0])
+        return fields
+
+    def run_due(self, now=None):
+        """Check every due target once; returns {watch_id: outcome}."""
+        due = self.watchlist.due(now)
+        if not due:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='watch') as ex:
+            updates = dict(zip([e['id'] for e in due], ex.map(self._check_safely, due)))
+        self.watchlist.update_many(updates)
+        return {watch_id: fields['last_outcome'] for watch_id, fields in updates.items()}
+
+    def run_forever(self):
+        print(f'[watch] Watching {len(self.watchlist.entries())} targets')
+        while True:
+            outcomes = self.run_due()
+            if outcomes:
+                print(f'[watch] Checked {len(outcomes)}: ' + ', '.join(
+                    f'{outcome} {count}' for outcome, count in Counter(outcomes.values()).items()))
+            next_due = self.watchlist.next_due()
+            wait = POLL_SECONDS if next_due is None else min(POLL_SECONDS, next_due - time.time())
+            time.sleep(max(1.0, wait))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch targets and record what changes between checks')
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help='Watch a target (or change its interval)')
+    add.add_argument('type', choices=WATCH_TYPES)
+    add.add_argument('value')
+    add.add_argument('--every', default=DEFAULT_INTERVAL, help='Interval, e.g. 30m, 6h, 1d (default %(default)s)')
+    add.add_argument('--investigator')
+    remove = sub.add_parser('remove', help='Stop watching a target')
+    remove.add_argument('watch_id')
+    sub.add_parser('list', help='Show watched targets')
+    run = sub.add_parser('run', help='Check targets as they fall due')
+    run.add_argument('--once', action='store_true', help='Check the due targets once and exit')
+    ev = sub.add_parser('events', help='Show recent change events')
+    ev.add_argument('--limit', type=int, default=20)
+    ev.add_argument('--watch-id')
+    args = parser.parse_args()
+
+    watchlist = Watchlist()
+    if args.command == 'add':
+        entry = watchlist.add(args.type, args.value, args.every, args.investigator)
+        print(f"[watch] {entry['id']}: {entry['type']} {entry['value']} every {entry['interval_s']}s")
+    elif args.command == 'remove':
+        print(f'[watch] Removed {args.watch_id}' if watchlist.remove(args.watch_id) else f'[watch] No such target {args.watch_id}')
+    elif args.command == 'list':
+        for e in watchlist.entries():
+            due = datetime.utcfromtimestamp(e['next_due']).isoformat() + 'Z' if e['next_due'] else 'now'
+            print(f"{e['id']}  {e['type']:<8} {e['value']:<30} every {e['interval_s']}s  due {due}  "
+                  f"last {e['last_outcome'] or '-'}  baseline {e['baseline_case'] or '-'}")
+    elif args.command == 'events':
+        for e in watchlist.events(args.limit, args.watch_id):
+            print(f"{e['time']}  {e['watch_id']}  {e['target_type']} {e['target']}: {e['event']} "
+                  f"{e.get('detail') or ''}  ({e['previous_case']} -> {e['case_id']})")
+    else:
+        watcher = Watcher(watchlist)
+        if args.once:
+            for watch_id, outcome in watcher.run_due().items():
+                print(f'[watch] {watch_id}: {outcome}')
+        else:
+            try:
+                watcher.run_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Production entry point for the IntelTrace web UI.
+
+``python ui_engine.py`` starts Flask's development server (single process,
+debugger on). For real use serve the WSGI ``app`` from this module instead:
+
+    python wsgi.py                                  # waitress, UI_THREADS threads
+    python wsgi.py --server gunicorn --workers 4 --threads 8
+    gunicorn --workers 4 --threads 8 --worker-class gthread wsgi:app
+
+Importing this module warms the process up before it takes traffic: the
+case indexes (entity graph, dashboard statistics) are loaded, every template
+is compiled, static assets are pre-compressed and the collectors are built
+(with ``COLLECTOR_WARM_UP=1`` they also connect to their hosts, see
+collectors.py). Each gunicorn worker does this once when it imports the
+module. Workers share cases, indexes and bulk-job state through the files
+under ``reports/`` (see shared_files.py), and with more than one worker
+``INTELTRACE_METRICS_DIR`` defaults to ``reports/_metrics`` so /metrics
+covers all of them.
+"""
+import os
+import sys
+import time
+import argparse
+from ui_engine import app
+from database import IntelDB
+import collectors
+
+HOST = os.getenv('UI_HOST', '127.0.0.1')
+PORT = int(os.getenv('UI_PORT', '5000'))
+SERVER = os.getenv('UI_SERVER', 'waitress')
+WORKERS = int(os.getenv('UI_WORKERS', '2'))
+THREADS = int(os.getenv('UI_THREADS', '8'))
+WARM_UP = os.getenv('UI_WARM_UP', '1') != '0'
+
+
+def warm_up():
+    """Load indexes and compile templates now rather than on the first requests."""
+    timings = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f'[wsgi] Warm-up step {name} failed: {e}')
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    timed('case_indexes', lambda: (IntelDB.shared().stats.refresh(), IntelDB.shared().graph.refresh()))
+    timed('templates', lambda: [app.jinja_env.get_template(name) for name in app.jinja_env.list_templates()
+                                if name.endswith('.html')])
+    timed('collectors', lambda: collectors.warm_up(connect=collectors.WARM_UP))
+    print(f"[wsgi] Warm-up in pid {os.getpid()}: "
+          + ', '.join(f'{name} {ms} ms' for name, ms in timings.items()))
+    return timings
+
+
+if WARM_UP and __name__ != '__main__':
+    warm_up()
+
+
+def _serve_waitress(args):
+    try:
+        import waitress
+    except ImportError:
+        sys.exit('[wsgi] waitress is not installed (pip install waitress)')
+    if args.workers > 1:
+        print('[wsgi] waitress serves from one process; use --server gunicorn for several workers')
+    if WARM_UP:
+        warm_up()
+    print(f'[wsgi] Serving on http://{args.host}:{args.port} with waitress ({args.threads} threads)')
+    waitress.serve(app, host=args.host, port=args.port, threads=args.threads, ident='IntelTrace')
+
+
+def _serve_gunicorn(args):
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        sys.exit('[wsgi] gunicorn is not installed (pip install gunicorn); it runs on Linux/macOS only')
+    env = dict(os.environ, UI_WARM_UP='1' if WARM_UP else '0')
+    if args.workers > 1:
+        env.setdefault('INTELTRACE_METRICS_DIR', os.path.abspath(os.path.join('reports', '_metrics')))
+    here = os.path.dirname(os.path.abspath(__file__))
+    argv = [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+            '--worker-class', 'gthread', '--bind', f'{args.host}:{args.port}', '--pythonpath', here,
+            '--chdir', os.getcwd()] + (['--access-logfile', '-'] if args.access_log else []) + ['wsgi:app']
+    print(f'[wsgi] Serving on http://{args.host}:{args.port} with gunicorn '
+          f'({args.workers} workers x {args.threads} threads)')
+    # Workers import this module themselves, so each one gets its own warmed-up state
+    os.execve(sys.executable, argv, env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the IntelTrace web UI with a production WSGI server')
+    parser.add_argument('--server', choices=('waitress', 'gunicorn'), default=SERVER)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Worker processes (gunicorn)')
+    parser.add_argument('--threads', type=int, default=THREADS, help='Threads per worker')
+    parser.add_argument('--access-log', action='store_true', help='Log every request (gunicorn)')
+    args = parser.parse_args()
+    if args.server == 'gunicorn':
+        _serve_gunicorn(args)
+    else:
+        _serve_waitress(args)
+
+
+if __name__ == '__main__':
+    main()